@@ -0,0 +1,14 @@
+"""ASGI variant of the backend (auth, buyer, seller and search).
+
+The business logic stays in be/model and is not duplicated: every model
+call runs in a greenlet (be/aio/bridge.py), and store.get_db_conn() returns
+an AsyncPGConnection (be/aio/db.py) whose execute / run_in_transaction
+hand each statement to psycopg's async driver on the event loop. A request
+waiting on Postgres therefore costs a suspended greenlet instead of a
+blocked thread, and one process can hold thousands of concurrent requests.
+
+    hypercorn be.aio.app:app --bind 127.0.0.1:5000 --workers 4
+
+Optional dependencies: quart, psycopg[pool] (psycopg 3) and greenlet
+(pip install quart "psycopg[binary,pool]" greenlet hypercorn).
+"""
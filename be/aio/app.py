@@ -0,0 +1,59 @@
+"""ASGI application: hypercorn be.aio.app:app (or uvicorn be.aio.app:app)."""
+import asyncio
+import logging
+import os
+
+from quart import Quart
+
+from be.aio import bridge
+from be.aio import db
+from be.aio import views
+from be.model import ledger
+from be.model import picture as picture_model
+from be.model import search as search_model
+from be.model import search_cache
+from be.model import store as store_mod
+
+app = Quart(__name__)
+app.register_blueprint(views.bp_auth)
+app.register_blueprint(views.bp_buyer)
+app.register_blueprint(views.bp_seller)
+app.register_blueprint(views.bp_search)
+
+_folder_task = None
+
+
+async def _fold_ledger(interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await bridge.run(ledger.SellerLedger().fold)
+        except Exception as e:
+            logging.error(f"seller ledger fold failed: {e}")
+
+
+def _prepare():
+    # 建表、迁移与索引检查沿用同步连接，完成后关闭，请求只走异步连接池
+    store_mod.init_db_connection()
+    search_model.ensure_search_index()
+    picture_model.extract_existing_pictures()
+    store_mod.close_db_connection()
+
+
+@app.before_serving
+async def startup():
+    global _folder_task
+    await asyncio.get_running_loop().run_in_executor(None, _prepare)
+    await db.open_async_db()
+    # 所有请求共用事件循环线程，等待同 key 查询的请求会阻塞领头请求
+    search_cache.cache.coalesce = False
+    _folder_task = asyncio.ensure_future(
+        _fold_ledger(float(os.environ.get("LEDGER_FOLD_INTERVAL", 1.0)))
+    )
+
+
+@app.after_serving
+async def shutdown():
+    if _folder_task is not None:
+        _folder_task.cancel()
+    await db.close_async_db()
@@ -0,0 +1,46 @@
+"""Run synchronous code on the event loop, awaiting from inside it.
+
+run(fn, *args) executes fn in a greenlet. When fn (or anything it calls)
+hits await_only(awaitable), the greenlet switches back to run(), which
+awaits the awaitable on the event loop and switches back in with the
+result (or the exception). This lets the blocking-style model code in
+be/model drive an async database driver unchanged.
+"""
+import sys
+
+try:
+    import greenlet
+except ImportError:
+    raise ImportError("be.aio requires the greenlet package")
+
+
+class _BridgeGreenlet(greenlet.greenlet):
+    def __init__(self, fn, driver):
+        greenlet.greenlet.__init__(self, fn, driver)
+        self.driver = driver
+
+
+def in_bridge() -> bool:
+    return isinstance(greenlet.getcurrent(), _BridgeGreenlet)
+
+
+def await_only(awaitable):
+    """Wait for awaitable from synchronous code running under run()."""
+    current = greenlet.getcurrent()
+    if not isinstance(current, _BridgeGreenlet):
+        raise RuntimeError("await_only() called outside of bridge.run()")
+    return current.driver.switch(awaitable)
+
+
+async def run(fn, *args, **kwargs):
+    """Call fn(*args, **kwargs) in a greenlet and return its result."""
+    context = _BridgeGreenlet(fn, greenlet.getcurrent())
+    result = context.switch(*args, **kwargs)
+    while not context.dead:
+        try:
+            value = await result
+        except BaseException:
+            result = context.throw(*sys.exc_info())
+        else:
+            result = context.switch(value)
+    return result
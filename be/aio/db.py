@@ -0,0 +1,226 @@
+"""psycopg 3 async pool behind the PostgreSQLConnection interface.
+
+AsyncPGConnection offers the same methods the models use on
+store.get_db_conn() (execute, get_cursor, run_in_transaction, commit,
+rollback), but must be called from code running under bridge.run(): each
+statement is awaited on the event loop through bridge.await_only().
+
+Like the threaded version, a request keeps one checked-out connection
+for the duration of a statement or transaction, keyed here by its
+greenlet instead of its thread. Cursors are client-side binding cursors
+(AsyncClientCursor), so the models' %s / %(name)s SQL runs unchanged;
+results are fetched eagerly so a cursor stays readable after its
+connection went back to the pool, as with psycopg2.
+"""
+import asyncio
+import logging
+import os
+import random
+from contextlib import contextmanager
+
+try:
+    import psycopg
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    raise ImportError("be.aio requires psycopg 3 with its pool (pip install \"psycopg[binary,pool]\")")
+
+import greenlet
+
+from be.aio.bridge import await_only
+from be.model import store as store_mod
+
+logger = logging.getLogger(__name__)
+
+
+class _Cursor:
+    """Synchronous facade over an AsyncClientCursor; rows are read on execute."""
+
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self._cursor = cursor
+        self._rows = []
+        self._pos = 0
+        self.rowcount = -1
+        self.description = None
+
+    async def _execute(self, query, params):
+        await self._cursor.execute(query, params)
+        self.rowcount = self._cursor.rowcount
+        self.description = self._cursor.description
+        self._rows = await self._cursor.fetchall() if self._cursor.description else []
+        self._pos = 0
+
+    def execute(self, query, params=None):
+        await_only(self._execute(query, params))
+        return self
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    async def _copy(self, sql, file):
+        async with self._cursor.copy(sql) as copy:
+            while True:
+                chunk = file.read(65536)
+                if not chunk:
+                    break
+                await copy.write(chunk)
+
+    def copy_expert(self, sql, file):
+        await_only(self._copy(sql, file))
+
+    def close(self):
+        await_only(self._cursor.close())
+
+
+class _Connection:
+    """The cursor.connection seen by transaction bodies."""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self):
+        return _Cursor(self, self.raw.cursor())
+
+    def commit(self):
+        await_only(self.raw.commit())
+
+    def rollback(self):
+        await_only(self.raw.rollback())
+
+
+class AsyncPGConnection:
+    def __init__(self, pool: AsyncConnectionPool):
+        self.pool = pool
+        # greenlet -> [连接, 嵌套深度]
+        self._held = {}
+
+    def _get_connection(self) -> _Connection:
+        me = greenlet.getcurrent()
+        held = self._held.get(me)
+        if held is None:
+            held = self._held[me] = [_Connection(await_only(self.pool.getconn())), 0]
+        return held[0]
+
+    def _release_connection(self):
+        me = greenlet.getcurrent()
+        held = self._held.get(me)
+        if held is None or held[1] > 0:
+            return
+        del self._held[me]
+        await_only(self.pool.putconn(held[0].raw))
+
+    @contextmanager
+    def get_cursor(self):
+        conn = self._get_connection()
+        held = self._held[greenlet.getcurrent()]
+        held[1] += 1
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Database error: {e}")
+            raise
+        finally:
+            cursor.close()
+            held[1] -= 1
+            self._release_connection()
+
+    def run_in_transaction(self, fn, max_attempts=None):
+        """Same contract as PostgreSQLConnection.run_in_transaction."""
+        if max_attempts is None:
+            max_attempts = int(os.environ.get('DB_TXN_MAX_ATTEMPTS', 5))
+        attempt = 1
+        while True:
+            try:
+                with self.get_cursor() as cursor:
+                    return fn(cursor)
+            except psycopg.Error as e:
+                if e.sqlstate not in store_mod.RETRYABLE_PGCODES or attempt >= max_attempts:
+                    raise
+                delay = min(0.5, 0.01 * (2 ** attempt))
+                logger.info(f"Retrying transaction (attempt {attempt}) after {e.sqlstate}")
+                await_only(asyncio.sleep(random.uniform(0, delay)))
+                attempt += 1
+
+    def execute(self, query, params=None):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            conn.commit()
+            return cursor
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Query failed: {query}, params: {params}, error: {e}")
+            raise
+        finally:
+            self._release_connection()
+
+    def commit(self):
+        held = self._held.get(greenlet.getcurrent())
+        if held is not None:
+            held[0].commit()
+            self._release_connection()
+
+    def rollback(self):
+        held = self._held.get(greenlet.getcurrent())
+        if held is not None:
+            held[0].rollback()
+            self._release_connection()
+
+    def pool_stats(self):
+        return self.pool.get_stats()
+
+    def close_all(self):
+        pass
+
+
+def _conninfo() -> str:
+    return psycopg.conninfo.make_conninfo(
+        host=os.environ.get('DB_HOST', "localhost"),
+        port=int(os.environ.get('DB_PORT', 5432)),
+        user=os.environ.get('DB_USER', "postgres"),
+        password=os.environ.get('DB_PASSWORD', "postgres"),
+        dbname=os.environ.get('DB_NAME', "bookstore"),
+    )
+
+
+async def open_async_db() -> AsyncPGConnection:
+    """Open the async pool and make it the connection every model uses.
+
+    Uses the DB_* variables of be/model/store.py; the pool bounds are
+    DB_POOL_MIN / DB_POOL_MAX like the threaded pool.
+    """
+    pool = AsyncConnectionPool(
+        _conninfo(),
+        min_size=int(os.environ.get('DB_POOL_MIN', 1)),
+        max_size=int(os.environ.get('DB_POOL_MAX', 32)),
+        timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        max_idle=float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+        kwargs={"cursor_factory": psycopg.AsyncClientCursor, "autocommit": False},
+        open=False,
+    )
+    await pool.open()
+    conn = AsyncPGConnection(pool)
+    store_mod.db_conn = conn
+    return conn
+
+
+async def close_async_db():
+    conn = store_mod.db_conn
+    if isinstance(conn, AsyncPGConnection):
+        store_mod.db_conn = None
+        await conn.pool.close()
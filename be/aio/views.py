@@ -0,0 +1,191 @@
+"""Async blueprints for auth, buyer, seller and search.
+
+Same URLs, request bodies and responses as be/view; every handler parses
+the request and hands the be/model call to bridge.run().
+"""
+import asyncio
+import json
+
+try:
+    from quart import Blueprint, request, jsonify
+except ImportError:
+    raise ImportError("be.aio requires the quart package")
+
+from be.aio.bridge import run
+from be.model import user
+from be.model.buyer import Buyer
+from be.model.seller import Seller, prepare_book
+from be.model.search import search_books_page
+from be.view.search import search_args, search_body
+
+bp_auth = Blueprint("auth", __name__, url_prefix="/auth")
+bp_buyer = Blueprint("buyer", __name__, url_prefix="/buyer")
+bp_seller = Blueprint("seller", __name__, url_prefix="/seller")
+bp_search = Blueprint("search", __name__, url_prefix="/search")
+
+
+async def _body() -> dict:
+    return await request.get_json(force=True, silent=True) or {}
+
+
+@bp_auth.route("/login", methods=["POST"])
+async def login():
+    body = await _body()
+    code, message, token = await run(
+        user.User().login, body.get("user_id", ""), body.get("password", ""), body.get("terminal", "")
+    )
+    return jsonify({"message": message, "token": token}), code
+
+
+@bp_auth.route("/logout", methods=["POST"])
+async def logout():
+    body = await _body()
+    code, message = await run(user.User().logout, body.get("user_id"), request.headers.get("token"))
+    return jsonify({"message": message}), code
+
+
+@bp_auth.route("/register", methods=["POST"])
+async def register():
+    body = await _body()
+    code, message = await run(user.User().register, body.get("user_id", ""), body.get("password", ""))
+    return jsonify({"message": message}), code
+
+
+@bp_auth.route("/unregister", methods=["POST"])
+async def unregister():
+    body = await _body()
+    code, message = await run(user.User().unregister, body.get("user_id", ""), body.get("password", ""))
+    return jsonify({"message": message}), code
+
+
+@bp_auth.route("/password", methods=["POST"])
+async def change_password():
+    body = await _body()
+    code, message = await run(
+        user.User().change_password,
+        body.get("user_id", ""), body.get("oldPassword", ""), body.get("newPassword", ""),
+    )
+    return jsonify({"message": message}), code
+
+
+@bp_buyer.route("/new_order", methods=["POST"])
+async def new_order():
+    body = await _body()
+    id_and_count = [(book.get("id"), book.get("count")) for book in body.get("books") or []]
+    code, message, order_id = await run(
+        Buyer().new_order, body.get("user_id"), body.get("store_id"), id_and_count
+    )
+    return jsonify({"message": message, "order_id": order_id}), code
+
+
+@bp_buyer.route("/payment", methods=["POST"])
+async def payment():
+    body = await _body()
+    code, message = await run(
+        Buyer().payment, body.get("user_id"), body.get("password"), body.get("order_id")
+    )
+    return jsonify({"message": message}), code
+
+
+@bp_buyer.route("/add_funds", methods=["POST"])
+async def add_funds():
+    body = await _body()
+    code, message = await run(
+        Buyer().add_funds, body.get("user_id"), body.get("password"), body.get("add_value")
+    )
+    return jsonify({"message": message}), code
+
+
+@bp_buyer.route("/query_orders", methods=["GET"])
+async def query_orders():
+    args = request.args
+    page_size = max(1, min(args.get("page_size", 50, type=int), 500))
+    code, message, orders, next_cursor = await run(
+        Buyer().query_orders_page,
+        args.get("user_id"), args.get("status"), args.get("start_time", type=int),
+        args.get("end_time", type=int), args.get("cursor"), page_size,
+    )
+    return jsonify({"message": message, "orders": orders, "next_cursor": next_cursor}), code
+
+
+@bp_buyer.route("/cancel_order", methods=["POST"])
+async def cancel_order():
+    body = await _body()
+    code, message = await run(Buyer().cancel_order, body.get("user_id"), body.get("order_id"))
+    return jsonify({"message": message}), code
+
+
+@bp_buyer.route("/receive", methods=["POST"])
+async def receive():
+    body = await _body()
+    code, message = await run(Buyer().receive_order, body.get("user_id"), body.get("order_id"))
+    return jsonify({"message": message}), code
+
+
+@bp_seller.route("/create_store", methods=["POST"])
+async def seller_create_store():
+    body = await _body()
+    code, message = await run(Seller().create_store, body.get("user_id"), body.get("store_id"))
+    return jsonify({"message": message}), code
+
+
+@bp_seller.route("/add_book", methods=["POST"])
+async def seller_add_book():
+    body = await _body()
+    book_info = body.get("book_info") or {}
+    book_json_str = json.dumps(book_info)
+    # 图片解码、哈希、写盘与分词会阻塞事件循环，放到线程池中执行；
+    # 失败时交给 add_book 重新计算，使错误码与检查顺序和同步版本一致
+    try:
+        prepared = await asyncio.to_thread(prepare_book, book_json_str)
+    except Exception:
+        prepared = None
+    code, message = await run(
+        Seller().add_book, body.get("user_id"), body.get("store_id"),
+        book_info.get("id"), book_json_str, body.get("stock_level", 0), prepared,
+    )
+    return jsonify({"message": message}), code
+
+
+@bp_seller.route("/add_books", methods=["POST"])
+async def seller_add_books():
+    body = await _body()
+    code, message, added, failed = await run(
+        Seller().add_books, body.get("user_id"), body.get("store_id"), body.get("books") or []
+    )
+    return jsonify({"message": message, "added": added, "failed": failed}), code
+
+
+@bp_seller.route("/add_stock_level", methods=["POST"])
+async def add_stock_level():
+    body = await _body()
+    code, message = await run(
+        Seller().add_stock_level, body.get("user_id"), body.get("store_id"),
+        body.get("book_id"), body.get("add_stock_level", 0),
+    )
+    return jsonify({"message": message}), code
+
+
+@bp_seller.route("/add_stock_levels", methods=["POST"])
+async def add_stock_levels():
+    body = await _body()
+    items = [(b.get("book_id"), b.get("add_stock_level")) if isinstance(b, dict) else None
+             for b in body.get("books") or []]
+    code, message, stock_levels, failed = await run(
+        Seller().add_stock_levels, body.get("user_id"), body.get("store_id"), items
+    )
+    return jsonify({"message": message, "stock_levels": stock_levels, "failed": failed}), code
+
+
+@bp_seller.route("/ship", methods=["POST"])
+async def ship():
+    body = await _body()
+    code, message = await run(Seller().ship_order, body.get("user_id"), body.get("order_id"))
+    return jsonify({"message": message}), code
+
+
+@bp_search.route("/", methods=["GET"])
+async def search():
+    kwargs = search_args(request.args)
+    code, message, results, info = await run(search_books_page, **kwargs)
+    return jsonify(search_body(kwargs, message, results, info)), code
@@ -1,4 +1,15 @@
+import argparse
 from be import serve
 
 if __name__ == "__main__":
-    serve.be_run()
+    parser = argparse.ArgumentParser(description="bookstore backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: BE_WORKERS or CPU count)")
+    parser.add_argument("--threads", type=int, default=None, help="threads per worker (default: BE_THREADS or 8)")
+    parser.add_argument("--dev", action="store_true", help="single-process development server")
+    args = parser.parse_args()
+    if args.dev:
+        serve.run_backend(args.host, args.port)
+    else:
+        serve.run_production(args.host, args.port, args.workers, args.threads)
@@ -1,9 +1,9 @@
 import uuid
-import json
 import logging
 import time
 from be.model import db_conn
 from be.model import error
+from be.model import pagination
 
 
 class Buyer(db_conn.DBConn):
@@ -15,63 +15,21 @@ class Buyer(db_conn.DBConn):
     ) -> (int, str, str):
         order_id = ""
         try:
-            if not self.user_id_exist(user_id):
-                return error.error_non_exist_user_id(user_id) + (order_id,)
-            if not self.store_id_exist(store_id):
-                return error.error_non_exist_store_id(store_id) + (order_id,)
-            uid = "{}_{}_{}".format(user_id, store_id, str(uuid.uuid1()))
-
-            # Collect all book details first
-            book_details = []
+            # 同一本书出现多次时合并数量，保持首次出现的顺序
+            counts = {}
             for book_id, count in id_and_count:
-                cursor = self.conn.execute(
-                    "SELECT book_id, stock_level, book_info FROM store "
-                    "WHERE store_id = %s AND book_id = %s;",
-                    (store_id, book_id),
-                )
-                row = cursor.fetchone()
-                if row is None:
-                    return error.error_non_exist_book_id(book_id) + (order_id,)
-
-                stock_level = row[1]
-                book_info = row[2]
-                # PostgreSQL JSONB 类型会自动返回字典，如果是字符串则需要转换
-                if isinstance(book_info, str):
-                    book_info_json = json.loads(book_info)
-                else:
-                    book_info_json = book_info
-                price = book_info_json.get("price")
-
-                if stock_level < count:
-                    return error.error_stock_level_low(book_id) + (order_id,)
+                counts[book_id] = counts.get(book_id, 0) + count
+            book_ids = list(counts.keys())
+            book_counts = list(counts.values())
+            uid = "{}_{}_{}".format(user_id, store_id, str(uuid.uuid1()))
 
-                cursor = self.conn.execute(
-                    "UPDATE store set stock_level = stock_level - %s "
-                    "WHERE store_id = %s and book_id = %s and stock_level >= %s; ",
-                    (count, store_id, book_id, count),
+            code, message = self.conn.run_in_transaction(
+                lambda cursor: self._new_order_txn(
+                    cursor, user_id, store_id, uid, book_ids, book_counts
                 )
-                if cursor.rowcount == 0:
-                    return error.error_stock_level_low(book_id) + (order_id,)
-
-                # Store book details for later insertion
-                book_details.append((book_id, count, price))
-
-            # Insert order record 
-            create_time = int(time.time())
-            self.conn.execute(
-                "INSERT INTO new_order(order_id, store_id, user_id, status, create_time) "
-                "VALUES(%s, %s, %s, %s, %s);",
-                (uid, store_id, user_id, "created", create_time),
             )
-
-            for book_id, count, price in book_details:
-                self.conn.execute(
-                    "INSERT INTO new_order_detail(order_id, book_id, count, price) "
-                    "VALUES(%s, %s, %s, %s);",
-                    (uid, book_id, count, price),
-                )
-
-            self.conn.commit()
+            if code != 200:
+                return code, message, order_id
             order_id = uid
         except Exception as e:
             logging.info("528, {}".format(str(e)))
@@ -82,163 +40,295 @@ class Buyer(db_conn.DBConn):
 
         return 200, "ok", order_id
 
-    def payment(self, user_id: str, password: str, order_id: str) -> (int, str):
-        conn = self.conn
-        try:
-            cursor = conn.execute(
-                "SELECT order_id, user_id, store_id FROM new_order WHERE order_id = %s",
-                (order_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return error.error_invalid_order_id(order_id)
-
-            order_id = row[0]
-            buyer_id = row[1]
-            store_id = row[2]
-
-            if buyer_id != user_id:
-                return error.error_authorization_fail()
-
-            cursor = conn.execute(
-                'SELECT balance, password FROM "user" WHERE user_id = %s;', (buyer_id,)
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return error.error_non_exist_user_id(buyer_id)
-            balance = row[0]
-            if password != row[1]:
-                return error.error_authorization_fail()
-
-            cursor = conn.execute(
-                "SELECT store_id, user_id FROM user_store WHERE store_id = %s;",
-                (store_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return error.error_non_exist_store_id(store_id)
-
-            seller_id = row[1]
-
-            if not self.user_id_exist(seller_id):
-                return error.error_non_exist_user_id(seller_id)
-
-            cursor = conn.execute(
-                "SELECT book_id, count, price FROM new_order_detail WHERE order_id = %s;",
-                (order_id,),
-            )
-            total_price = 0
-            for row in cursor:
-                count = row[1]
-                price = row[2]
-                total_price = total_price + price * count
-
-            if balance < total_price:
-                return error.error_not_sufficient_funds(order_id)
-
-            cursor = conn.execute(
-                'UPDATE "user" set balance = balance - %s '
-                'WHERE user_id = %s AND balance >= %s',
-                (total_price, buyer_id, total_price),
-            )
-            if cursor.rowcount == 0:
-                return error.error_not_sufficient_funds(order_id)
-
-            cursor = conn.execute(
-                'UPDATE "user" set balance = balance + %s '
-                'WHERE user_id = %s',
-                (total_price, seller_id),
-            )
+    def _new_order_txn(
+        self, cursor, user_id, store_id, order_id, book_ids, book_counts
+    ) -> (int, str):
+        cursor.execute(
+            'SELECT EXISTS(SELECT 1 FROM "user" WHERE user_id = %s), '
+            "(SELECT user_id FROM user_store WHERE store_id = %s);",
+            (user_id, store_id),
+        )
+        user_exist, seller_id = cursor.fetchone()
+        if not user_exist:
+            return error.error_non_exist_user_id(user_id)
+        if seller_id is None:
+            return error.error_non_exist_store_id(store_id)
+
+        # 一条语句完成：按 (store_id, book_id) 顺序加行锁，批量校验并扣减库存，
+        # 插入订单并多行插入订单明细。统一的加锁顺序避免并发下单互相死锁。
+        # 订单总价与卖家在下单时写入 new_order，付款时无需再扫描订单明细。
+        cursor.execute(
+            "WITH req AS ("
+            "    SELECT * FROM unnest(%s::text[], %s::int[]) AS r(book_id, count)"
+            "), lck AS ("
+            "    SELECT s.book_id, req.count FROM inventory s JOIN req ON s.book_id = req.book_id"
+            "    WHERE s.store_id = %s ORDER BY s.book_id FOR UPDATE OF s"
+            "), upd AS ("
+            "    UPDATE inventory s SET stock_level = s.stock_level - lck.count"
+            "    FROM lck"
+            "    WHERE s.store_id = %s AND s.book_id = lck.book_id"
+            "    AND s.stock_level >= lck.count"
+            "    RETURNING s.book_id, lck.count, s.price"
+            "), ord AS ("
+            "    INSERT INTO new_order(order_id, store_id, user_id, status, create_time,"
+            "                          total_price, seller_id)"
+            "    SELECT %s, %s, %s, 'created', %s,"
+            "           (SELECT COALESCE(SUM(upd.count * upd.price), 0) FROM upd), %s"
+            "    WHERE (SELECT count(*) FROM upd) = %s"
+            "    RETURNING order_id"
+            ") "
+            "INSERT INTO new_order_detail(order_id, book_id, count, price) "
+            "SELECT ord.order_id, upd.book_id, upd.count, upd.price FROM upd, ord "
+            "RETURNING book_id;",
+            (
+                book_ids, book_counts, store_id, store_id,
+                order_id, store_id, user_id, int(time.time()), seller_id, len(book_ids),
+            ),
+        )
+        if cursor.rowcount != len(book_ids):
+            cursor.connection.rollback()
+            return self._new_order_failure(cursor, store_id, book_ids, book_counts)
+        return 200, "ok"
 
-            if cursor.rowcount == 0:
-                return error.error_non_exist_user_id(seller_id)
+    @staticmethod
+    def _new_order_failure(cursor, store_id, book_ids, book_counts) -> (int, str):
+        # 仅在失败路径上诊断：按请求顺序找出第一本不存在或库存不足的书
+        cursor.execute(
+            "SELECT r.book_id, s.book_id IS NULL "
+            "FROM unnest(%s::text[], %s::int[]) WITH ORDINALITY AS r(book_id, count, n) "
+            "LEFT JOIN inventory s ON s.store_id = %s AND s.book_id = r.book_id "
+            "WHERE s.book_id IS NULL OR s.stock_level < r.count "
+            "ORDER BY r.n LIMIT 1;",
+            (book_ids, book_counts, store_id),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            # 诊断时库存已被其他事务补回，按库存不足处理让客户端重试
+            return error.error_stock_level_low(book_ids[0])
+        if row[1]:
+            return error.error_non_exist_book_id(row[0])
+        return error.error_stock_level_low(row[0])
 
-            # mark order as paid
-            pay_time = int(time.time())
-            cursor = conn.execute(
-                "UPDATE new_order SET status = %s, pay_time = %s WHERE order_id = %s",
-                ("paid", pay_time, order_id),
+    def payment(self, user_id: str, password: str, order_id: str) -> (int, str):
+        try:
+            return self.conn.run_in_transaction(
+                lambda cursor: self._payment_txn(cursor, user_id, password, order_id)
             )
-            if cursor.rowcount == 0:
-                return error.error_invalid_order_id(order_id)
-            conn.commit()
-
         except Exception as e:
             return 528, "{}".format(str(e))
 
         except BaseException as e:
             return 530, "{}".format(str(e))
 
-        return 200, "ok"
+    def _payment_txn(self, cursor, user_id, password, order_id) -> (int, str):
+        # 一条语句完成付款：锁订单、扣买家余额、向卖家流水追加一笔入账、
+        # status='created' 守卫下改为 paid。余额检查与扣款在同一个 UPDATE 中完成，
+        # 不存在先读后写的竞态；卖家入账只追加流水不更新卖家行，同一卖家的并发付款
+        # 互不阻塞，流水由 be.model.ledger 异步并入余额。
+        # 旧订单没有记录 total_price / seller_id 时回退到按明细与店铺计算。
+        cursor.execute(
+            "WITH o AS ("
+            "    SELECT n.order_id, n.user_id, n.store_id, n.status,"
+            "           COALESCE(n.total_price, (SELECT COALESCE(SUM(d.count * d.price), 0)"
+            "               FROM new_order_detail d WHERE d.order_id = n.order_id)) AS total,"
+            "           COALESCE(n.seller_id, (SELECT us.user_id FROM user_store us"
+            "               WHERE us.store_id = n.store_id)) AS seller_id"
+            "    FROM new_order n WHERE n.order_id = %(order_id)s FOR UPDATE OF n"
+            "), debit AS ("
+            '    UPDATE "user" u SET balance = u.balance'
+            "        - CASE WHEN o.seller_id = o.user_id THEN 0 ELSE o.total END"
+            "    FROM o"
+            "    WHERE u.user_id = o.user_id AND o.user_id = %(user_id)s"
+            "    AND o.status = 'created' AND u.password = %(password)s"
+            "    AND u.balance >= o.total"
+            '    AND EXISTS (SELECT 1 FROM "user" s WHERE s.user_id = o.seller_id)'
+            "    RETURNING u.user_id"
+            "), credit AS ("
+            "    INSERT INTO seller_ledger(user_id, order_id, amount)"
+            "    SELECT o.seller_id, o.order_id, o.total FROM o, debit"
+            "    WHERE o.seller_id <> o.user_id"
+            "    RETURNING entry_id"
+            "), paid AS ("
+            "    UPDATE new_order n SET status = 'paid', pay_time = %(pay_time)s"
+            "    FROM debit"
+            "    WHERE n.order_id = %(order_id)s AND n.status = 'created'"
+            "    RETURNING n.order_id"
+            ") "
+            "SELECT o.user_id, o.store_id, o.status, o.total, o.seller_id,"
+            "       b.password = %(password)s, b.balance,"
+            '       EXISTS (SELECT 1 FROM "user" s WHERE s.user_id = o.seller_id),'
+            "       o.seller_id = o.user_id,"
+            "       (SELECT count(*) FROM credit), (SELECT count(*) FROM paid) "
+            "FROM (SELECT 1) AS one "
+            "LEFT JOIN o ON TRUE "
+            'LEFT JOIN "user" b ON b.user_id = o.user_id;',
+            {
+                "order_id": order_id,
+                "user_id": user_id,
+                "password": password,
+                "pay_time": int(time.time()),
+            },
+        )
+        (buyer_id, store_id, status, total_price, seller_id, password_ok, balance,
+         seller_exist, self_sale, credited, paid) = cursor.fetchone()
+        if paid == 1 and (credited == 1 or self_sale):
+            return 200, "ok"
 
-    def query_orders(self, user_id: str):
+        cursor.connection.rollback()
+        if buyer_id is None:
+            return error.error_invalid_order_id(order_id)
+        if buyer_id != user_id:
+            return error.error_authorization_fail()
+        if balance is None:
+            return error.error_non_exist_user_id(buyer_id)
+        if not password_ok:
+            return error.error_authorization_fail()
+        if seller_id is None:
+            return error.error_non_exist_store_id(store_id)
+        if not seller_exist:
+            return error.error_non_exist_user_id(seller_id)
+        if status != "created":
+            return error.error_and_message(530, "order cannot be paid in status {}".format(status))
+        if balance < total_price:
+            return error.error_not_sufficient_funds(order_id)
+        return error.error_non_exist_user_id(seller_id)
+
+    def query_orders(
+        self,
+        user_id: str,
+        status: str = None,
+        start_time: int = None,
+        end_time: int = None,
+        cursor: str = None,
+        limit: int = None,
+    ):
+        code, message, orders, _ = self.query_orders_page(
+            user_id, status, start_time, end_time, cursor, limit
+        )
+        return code, message, orders
+
+    def query_orders_page(
+        self,
+        user_id: str,
+        status: str = None,
+        start_time: int = None,
+        end_time: int = None,
+        cursor: str = None,
+        limit: int = None,
+    ):
+        """按 (create_time, order_id) 倒序的键集分页查询订单，一次查询带出订单明细。
+
+        status 过滤订单状态，[start_time, end_time) 过滤下单时间；
+        cursor 为上一页返回的 next_cursor，limit 为空时返回全部订单。
+        返回 (code, message, orders, next_cursor)，没有下一页时 next_cursor 为 None。
+        """
         try:
-            cursor = self.conn.execute(
-                "SELECT order_id, store_id, status, create_time, pay_time, ship_time, receive_time FROM new_order WHERE user_id = %s",
-                (user_id,),
-            )
-            orders = []
-            for row in cursor:
-                order_id = row[0]
-                details_cursor = self.conn.execute(
-                    "SELECT book_id, count, price FROM new_order_detail WHERE order_id = %s",
-                    (order_id,),
-                )
-                details = [dict(book_id=r[0], count=r[1], price=r[2]) for r in details_cursor]
-                orders.append(
-                    {
-                        "order_id": order_id,
-                        "store_id": row[1],
-                        "status": row[2],
-                        "create_time": row[3],
-                        "pay_time": row[4],
-                        "ship_time": row[5],
-                        "receive_time": row[6],
-                        "details": details,
-                    }
+            where = ["o.user_id = %s"]
+            params = [user_id]
+            if status:
+                where.append("o.status = %s")
+                params.append(status)
+            if start_time is not None:
+                where.append("o.create_time >= %s")
+                params.append(int(start_time))
+            if end_time is not None:
+                where.append("o.create_time < %s")
+                params.append(int(end_time))
+            if cursor:
+                # 排序键 (create_time, order_id)，create_time 可能为空
+                key = pagination.decode_cursor(
+                    cursor, (pagination.NUMBER + pagination.NULL, pagination.STRING)
                 )
-            return 200, "ok", orders
+                if key is None:
+                    return error.error_invalid_cursor(cursor) + ([], None)
+                where.append("(o.create_time, o.order_id) < (%s, %s)")
+                params.extend(key)
+            sql = (
+                "SELECT o.order_id, o.store_id, o.status, o.create_time, o.pay_time, "
+                "o.ship_time, o.receive_time, o.total_price, "
+                "COALESCE((SELECT json_agg(json_build_object("
+                "'book_id', d.book_id, 'count', d.count, 'price', d.price) ORDER BY d.book_id) "
+                "FROM new_order_detail d WHERE d.order_id = o.order_id), '[]'::json) "
+                "FROM new_order o WHERE " + " AND ".join(where) + " "
+                "ORDER BY o.create_time DESC NULLS LAST, o.order_id DESC"
+            )
+            if limit is not None:
+                sql += " LIMIT %s"
+                params.append(int(limit) + 1)
+            rows = self.conn.execute(sql, params).fetchall()
+
+            next_cursor = None
+            if limit is not None and len(rows) > int(limit):
+                rows = rows[: int(limit)]
+                next_cursor = pagination.encode_cursor((rows[-1][3], rows[-1][0]))
+            orders = [
+                {
+                    "order_id": row[0],
+                    "store_id": row[1],
+                    "status": row[2],
+                    "create_time": row[3],
+                    "pay_time": row[4],
+                    "ship_time": row[5],
+                    "receive_time": row[6],
+                    "total_price": row[7],
+                    "details": row[8],
+                }
+                for row in rows
+            ]
+            return 200, "ok", orders, next_cursor
         except Exception as e:
-            return 528, "{}".format(str(e)), []
+            return 528, "{}".format(str(e)), [], None
 
     def cancel_order(self, user_id: str, order_id: str) -> (int, str):
         try:
-            cursor = self.conn.execute(
-                "SELECT order_id, user_id, store_id, status FROM new_order WHERE order_id = %s",
-                (order_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                return error.error_invalid_order_id(order_id)
-            if row[1] != user_id:
-                return error.error_authorization_fail()
-            status = row[3]
-            if status != "created":
-                # only allow cancel before payment
-                return error.error_and_message(530, "order cannot be canceled in status {}".format(status))
-
-            # restore stock levels
-            cursor = self.conn.execute(
-                "SELECT book_id, count FROM new_order_detail WHERE order_id = %s",
-                (order_id,),
+            return self.conn.run_in_transaction(
+                lambda cursor: self._cancel_order_txn(cursor, user_id, order_id)
             )
-            for r in cursor:
-                book_id = r[0]
-                count = r[1]
-                self.conn.execute(
-                    "UPDATE store SET stock_level = stock_level + %s WHERE book_id = %s AND store_id = %s",
-                    (count, book_id, row[2]),
-                )
-
-            self.conn.execute("DELETE FROM new_order_detail WHERE order_id = %s", (order_id,))
-            self.conn.execute("DELETE FROM new_order WHERE order_id = %s", (order_id,))
-            self.conn.commit()
-            return 200, "ok"
         except Exception as e:
             return 528, "{}".format(str(e))
         except BaseException as e:
             return 530, "{}".format(str(e))
 
+    def _cancel_order_txn(self, cursor, user_id, order_id) -> (int, str):
+        # 先锁订单行，避免与并发的付款交错
+        cursor.execute(
+            "SELECT order_id, user_id, store_id, status FROM new_order "
+            "WHERE order_id = %s FOR UPDATE",
+            (order_id,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return error.error_invalid_order_id(order_id)
+        if row[1] != user_id:
+            return error.error_authorization_fail()
+        status = row[3]
+        if status != "created":
+            # only allow cancel before payment
+            return error.error_and_message(530, "order cannot be canceled in status {}".format(status))
+
+        self._restore_stock_and_delete(cursor, [order_id])
+        return 200, "ok"
+
+    @staticmethod
+    def _restore_stock_and_delete(cursor, order_ids):
+        # 归还库存：按 (store_id, book_id) 顺序加行锁，与 new_order 的加锁顺序一致
+        cursor.execute(
+            "WITH d AS ("
+            "    SELECT o.store_id, d.book_id, SUM(d.count) AS count"
+            "    FROM new_order_detail d JOIN new_order o ON o.order_id = d.order_id"
+            "    WHERE d.order_id = ANY(%s) GROUP BY o.store_id, d.book_id"
+            "), lck AS ("
+            "    SELECT s.store_id, s.book_id, d.count FROM inventory s"
+            "    JOIN d ON s.store_id = d.store_id AND s.book_id = d.book_id"
+            "    ORDER BY s.store_id, s.book_id FOR UPDATE OF s"
+            ") "
+            "UPDATE inventory s SET stock_level = s.stock_level + lck.count FROM lck "
+            "WHERE s.store_id = lck.store_id AND s.book_id = lck.book_id",
+            (order_ids,),
+        )
+        cursor.execute("DELETE FROM new_order_detail WHERE order_id = ANY(%s)", (order_ids,))
+        cursor.execute("DELETE FROM new_order WHERE order_id = ANY(%s)", (order_ids,))
+
     def receive_order(self, user_id: str, order_id: str) -> (int, str):
         try:
             cursor = self.conn.execute(
@@ -296,35 +386,23 @@ class Buyer(db_conn.DBConn):
         try:
             now = int(time.time())
             cutoff = now - int(timeout_seconds)
-            cursor = self.conn.execute(
-                "SELECT order_id, store_id FROM new_order WHERE status = %s AND create_time <= %s",
-                ("created", cutoff),
+            cancelled = self.conn.run_in_transaction(
+                lambda cursor: self._auto_cancel_txn(cursor, cutoff)
             )
-            orders = [(r[0], r[1]) for r in cursor]
-            cancelled = 0
-            for order_id, store_id in orders:
-                # restore stock
-                details_cursor = self.conn.execute(
-                    "SELECT book_id, count FROM new_order_detail WHERE order_id = %s",
-                    (order_id,),
-                )
-                for r in details_cursor:
-                    book_id = r[0]
-                    count = r[1]
-                    self.conn.execute(
-                        "UPDATE store SET stock_level = stock_level + %s WHERE book_id = %s AND store_id = %s",
-                        (count, book_id, store_id),
-                    )
-
-                self.conn.execute("DELETE FROM new_order_detail WHERE order_id = %s", (order_id,))
-                self.conn.execute("DELETE FROM new_order WHERE order_id = %s", (order_id,))
-                cancelled += 1
-
-            if cancelled > 0:
-                self.conn.commit()
-
             return 200, "ok", cancelled
         except Exception as e:
             return 528, "{}".format(str(e)), 0
         except BaseException as e:
             return 530, "{}".format(str(e)), 0
+
+    def _auto_cancel_txn(self, cursor, cutoff) -> int:
+        # 跳过正被付款或取消锁住的订单，下一轮再处理
+        cursor.execute(
+            "SELECT order_id FROM new_order WHERE status = %s AND create_time <= %s "
+            "ORDER BY order_id FOR UPDATE SKIP LOCKED",
+            ("created", cutoff),
+        )
+        order_ids = [r[0] for r in cursor.fetchall()]
+        if order_ids:
+            self._restore_stock_and_delete(cursor, order_ids)
+        return len(order_ids)
@@ -0,0 +1,221 @@
+"""Bulk import of the scraped SQLite book database into the catalog.
+
+fe/data/scraper.py produces book.db / book_lx.db. This module loads such a
+file straight into the book table (and, with store_id, into that store's
+inventory) without going through HTTP add_book:
+
+ - rows are streamed from SQLite in id order by a generator, batch_size
+   rows at a time (keyset on id, no OFFSET scans);
+ - a process pool turns each batch into CSV: tags are split, the cover
+   picture is written to the picture store (be/model/picture.py) and
+   replaced by its id, and the search vector is built;
+ - several writer threads COPY the CSV into a temporary table over their
+   own pooled connections and move it into book / inventory with
+   INSERT ... ON CONFLICT DO NOTHING, so re-importing a batch is harmless;
+ - the id of the last batch below which everything has been written is
+   kept in catalog_import, and an interrupted import resumes after it.
+
+    python -m be.model.catalog_import fe/data/book_lx.db --workers 4 --connections 4
+
+Search results cached by a running backend (be/model/search_cache.py)
+pick the imported books up when their entries expire.
+"""
+import argparse
+import collections
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from be.model import picture
+from be.model import search
+from be.model import store as store_mod
+
+COLUMNS = [
+    "id", "title", "author", "publisher", "original_title", "translator",
+    "pub_year", "pages", "price", "currency_unit", "binding", "isbn",
+    "author_intro", "book_intro", "content", "tags",
+]
+
+
+def read_batches(path: str, after: str = "", batch_size: int = 1000, limit: int = None):
+    """Yield lists of SQLite rows with id > after, in id order."""
+    conn = sqlite3.connect(path)
+    try:
+        sent = 0
+        while limit is None or sent < limit:
+            size = batch_size if limit is None else min(batch_size, limit - sent)
+            rows = conn.execute(
+                "SELECT {}, picture FROM book WHERE id > ? ORDER BY id LIMIT ?".format(", ".join(COLUMNS)),
+                (after, size),
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+            sent += len(rows)
+            after = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def to_book_info(row) -> dict:
+    """book_info document of one SQLite row, in the shape add_book stores."""
+    book_info = dict(zip(COLUMNS, row))
+    book_info["tags"] = [t for t in (book_info["tags"] or "").split("\n") if t.strip() != ""]
+    data = row[len(COLUMNS)]
+    book_info["pictures"] = [picture.get_picture_store().put(data)] if data else []
+    return book_info
+
+
+def transform_batch(rows):
+    """Runs in a pool process: rows -> (CSV of book_id, book_info, search_vector, price; count; last id)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        book_info = to_book_info(row)
+        writer.writerow((
+            book_info["id"], json.dumps(book_info),
+            search.build_search_vector(book_info) or None, book_info["price"],
+        ))
+    return buf.getvalue(), len(rows), rows[-1][0]
+
+
+def _copy_batch(cursor, data, store_id, stock_level):
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS import_book ("
+        "    book_id TEXT, book_info JSONB, search_vector TSVECTOR, price INTEGER"
+        ") ON COMMIT DELETE ROWS;"
+    )
+    cursor.copy_expert("COPY import_book FROM STDIN WITH (FORMAT csv)", io.StringIO(data))
+    cursor.execute(
+        "INSERT INTO book (book_id, book_info, search_vector) "
+        "SELECT book_id, book_info, search_vector FROM import_book ORDER BY book_id "
+        "ON CONFLICT (book_id) DO NOTHING;"
+    )
+    inserted = cursor.rowcount
+    if store_id is not None:
+        cursor.execute(
+            "INSERT INTO inventory (store_id, book_id, price, stock_level) "
+            "SELECT %s, book_id, price, %s FROM import_book ORDER BY book_id "
+            "ON CONFLICT (store_id, book_id) DO NOTHING;",
+            (store_id, stock_level),
+        )
+    return inserted
+
+
+def _progress(conn, source: str):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS catalog_import ("
+        "    source TEXT PRIMARY KEY, last_id TEXT NOT NULL, imported BIGINT NOT NULL DEFAULT 0,"
+        "    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+        ");"
+    )
+    row = conn.execute(
+        "SELECT last_id, imported FROM catalog_import WHERE source = %s;", (source,)
+    ).fetchone()
+    return row if row is not None else ("", 0)
+
+
+def _save_progress(conn, source: str, last_id: str, imported: int):
+    conn.execute(
+        "INSERT INTO catalog_import (source, last_id, imported) VALUES (%s, %s, %s) "
+        "ON CONFLICT (source) DO UPDATE SET last_id = EXCLUDED.last_id, "
+        "imported = EXCLUDED.imported, updated_at = CURRENT_TIMESTAMP;",
+        (source, last_id, imported),
+    )
+
+
+def import_catalog(path: str, workers: int = None, connections: int = 4, batch_size: int = 1000,
+                   store_id: str = None, stock_level: int = 0, restart: bool = False,
+                   limit: int = None) -> dict:
+    """Import the SQLite book database at path; returns counters of this run.
+
+    Requires init_db_connection(). With store_id (an existing store) every
+    imported book is also put into that store's inventory at its list price.
+    """
+    conn = store_mod.get_db_conn()
+    source = os.path.abspath(path)
+    if store_id is not None and conn.execute(
+        "SELECT 1 FROM user_store WHERE store_id = %s;", (store_id,)
+    ).fetchone() is None:
+        raise ValueError("non exist store id {}".format(store_id))
+    # 向量按当前分词器构建，与服务端保持一致
+    search.ensure_search_index()
+
+    # _progress 同时建好进度表，--restart 时也要先调用
+    last_id, imported = _progress(conn, source)
+    if restart:
+        last_id, imported = "", 0
+    if last_id:
+        logging.info(f"resuming import of {source} after book {last_id} ({imported} rows done)")
+
+    workers = workers or os.cpu_count() or 1
+    # 在途批次有上限，SQLite 读取不会跑到处理和写入前面太多
+    window = 2 * max(workers, connections)
+    pending = collections.deque()
+    rows = 0
+    inserted = 0
+    started = time.monotonic()
+
+    def write(transformed):
+        data, count, batch_last = transformed.result()
+        done = conn.run_in_transaction(lambda cursor: _copy_batch(cursor, data, store_id, stock_level))
+        return done, count, batch_last
+
+    def finish_oldest():
+        # 按读取顺序确认批次，last_id 之前的批次都已写入
+        nonlocal rows, inserted, last_id
+        done, count, batch_last = pending.popleft().result()
+        rows += count
+        inserted += done
+        last_id = batch_last
+        _save_progress(conn, source, last_id, imported + rows)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as procs, \
+            ThreadPoolExecutor(max_workers=connections) as writers:
+        for batch in read_batches(path, last_id, batch_size, limit):
+            if len(pending) >= window:
+                finish_oldest()
+            pending.append(writers.submit(write, procs.submit(transform_batch, batch)))
+        while pending:
+            finish_oldest()
+
+    elapsed = time.monotonic() - started
+    return {
+        "rows": rows,
+        "inserted": inserted,
+        "last_id": last_id,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="SQLite file produced by fe/data/scraper.py")
+    parser.add_argument("--workers", type=int, default=None, help="transform processes (default: CPU count)")
+    parser.add_argument("--connections", type=int, default=4, help="concurrent COPY writers")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--store-id", default=None, help="also stock the books in this existing store")
+    parser.add_argument("--stock-level", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None, help="import at most this many rows")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    args = parser.parse_args()
+
+    store_mod.init_db_connection()
+    result = import_catalog(
+        args.path, workers=args.workers, connections=args.connections, batch_size=args.batch_size,
+        store_id=args.store_id, stock_level=args.stock_level, restart=args.restart, limit=args.limit,
+    )
+    print("{rows} rows read, {inserted} new books, {seconds:.1f}s, {rows_per_second:.0f} rows/s, "
+          "last id {last_id}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,7 @@ class DBConn:
     def book_id_exist(self, store_id, book_id):
         try:
             cursor = self.conn.execute(
-                "SELECT book_id FROM store WHERE store_id = %s AND book_id = %s;",
+                "SELECT book_id FROM inventory WHERE store_id = %s AND book_id = %s;",
                 (store_id, book_id),
             )
             row = cursor.fetchone()
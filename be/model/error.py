@@ -9,8 +9,8 @@ error_code = {
     517: "stock level low, book id {}",
     518: "invalid order id {}",
     519: "not sufficient funds, order id {}",
-    520: "",
-    521: "",
+    520: "invalid pagination cursor {}",
+    521: "invalid book info {}",
     522: "",
     523: "",
     524: "",
@@ -57,6 +57,14 @@ def error_not_sufficient_funds(order_id):
     return 519, error_code[518].format(order_id)
 
 
+def error_invalid_cursor(cursor):
+    return 520, error_code[520].format(cursor)
+
+
+def error_invalid_book_info(reason):
+    return 521, error_code[521].format(reason)
+
+
 def error_authorization_fail():
     return 401, error_code[401]
 
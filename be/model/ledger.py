@@ -0,0 +1,163 @@
+"""Append-only seller ledger.
+
+Buyer.payment no longer updates the seller's "user" row; it appends one
+seller_ledger entry per paid order. Entries are folded into
+"user".balance in batches by fold(), which a background thread started
+with start_folder() runs periodically, so concurrent payments to the same
+seller never wait on that seller's row lock.
+
+The amount a seller owns is balance + the sum of unfolded entries
+(see SellerLedger.balance). Credits become spendable by the seller once
+they are folded.
+"""
+import os
+import threading
+import logging
+from be.model import db_conn
+from be.model import store as store_mod
+
+
+class SellerLedger(db_conn.DBConn):
+    def __init__(self):
+        db_conn.DBConn.__init__(self)
+
+    def balance(self, user_id: str):
+        """Effective balance: folded balance plus unfolded ledger credits."""
+        cursor = self.conn.execute(
+            'SELECT u.balance + COALESCE((SELECT SUM(l.amount) FROM seller_ledger l '
+            "WHERE l.user_id = u.user_id AND NOT l.folded), 0) "
+            'FROM "user" u WHERE u.user_id = %s;',
+            (user_id,),
+        )
+        row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def fold(self, batch_size: int = 10000) -> int:
+        """Fold up to batch_size unfolded entries into seller balances.
+
+        Each seller row is updated once per batch instead of once per payment.
+        Returns the number of entries folded.
+        """
+        return self.conn.run_in_transaction(
+            lambda cursor: self._fold_txn(cursor, batch_size)
+        )
+
+    @staticmethod
+    def _fold_txn(cursor, batch_size) -> int:
+        # 卖家行按 user_id 顺序加锁，多个 fold 并发执行时不会互相死锁；
+        # 已注销用户的流水保持未并入状态，由一致性校验报告
+        cursor.execute(
+            "WITH f AS ("
+            "    UPDATE seller_ledger SET folded = TRUE"
+            "    WHERE entry_id IN ("
+            "        SELECT l.entry_id FROM seller_ledger l"
+            '        WHERE NOT l.folded AND EXISTS (SELECT 1 FROM "user" u WHERE u.user_id = l.user_id)'
+            "        ORDER BY l.entry_id LIMIT %s FOR UPDATE SKIP LOCKED"
+            "    )"
+            "    RETURNING user_id, amount"
+            "), s AS ("
+            "    SELECT user_id, SUM(amount) AS amount, count(*) AS n FROM f GROUP BY user_id"
+            "), lck AS ("
+            '    SELECT u.user_id, s.amount, s.n FROM "user" u JOIN s ON u.user_id = s.user_id'
+            "    ORDER BY u.user_id FOR UPDATE OF u"
+            ") "
+            'UPDATE "user" u SET balance = u.balance + lck.amount, '
+            "ledger_folded = u.ledger_folded + lck.amount "
+            "FROM lck WHERE u.user_id = lck.user_id "
+            "RETURNING lck.n;",
+            (batch_size,),
+        )
+        return sum(r[0] for r in cursor.fetchall())
+
+    def check_consistency(self) -> (bool, [dict]):
+        """Verify ledger totals against balances and orders.
+
+        Reports:
+         - users whose ledger_folded differs from the sum of their folded entries
+         - entries whose order is missing, unpaid, sold by someone else or
+           whose amount differs from the order total
+         - orders credited more than once
+        """
+        problems = []
+        cursor = self.conn.execute(
+            "SELECT u.user_id, u.ledger_folded, COALESCE(l.amount, 0) "
+            'FROM "user" u LEFT JOIN ('
+            "    SELECT user_id, SUM(amount) AS amount FROM seller_ledger"
+            "    WHERE folded GROUP BY user_id"
+            ") l ON l.user_id = u.user_id "
+            "WHERE u.ledger_folded <> COALESCE(l.amount, 0);"
+        )
+        for user_id, folded, ledger_sum in cursor.fetchall():
+            problems.append({
+                "type": "folded_total_mismatch",
+                "user_id": user_id,
+                "ledger_folded": folded,
+                "ledger_sum": ledger_sum,
+            })
+
+        cursor = self.conn.execute(
+            "SELECT l.entry_id, l.order_id, l.user_id, l.amount, o.status, o.seller_id, "
+            "COALESCE(o.total_price, (SELECT SUM(d.count * d.price) FROM new_order_detail d "
+            "WHERE d.order_id = o.order_id)) "
+            "FROM seller_ledger l LEFT JOIN new_order o ON o.order_id = l.order_id "
+            "WHERE o.order_id IS NULL OR o.status = 'created' "
+            "OR l.user_id IS DISTINCT FROM COALESCE(o.seller_id, l.user_id) "
+            "OR l.amount IS DISTINCT FROM COALESCE(o.total_price, (SELECT SUM(d.count * d.price) "
+            "FROM new_order_detail d WHERE d.order_id = o.order_id));"
+        )
+        for entry_id, order_id, user_id, amount, status, seller_id, total in cursor.fetchall():
+            problems.append({
+                "type": "entry_order_mismatch",
+                "entry_id": entry_id,
+                "order_id": order_id,
+                "user_id": user_id,
+                "amount": amount,
+                "order_status": status,
+                "order_seller_id": seller_id,
+                "order_total": total,
+            })
+
+        cursor = self.conn.execute(
+            "SELECT order_id, count(*) FROM seller_ledger GROUP BY order_id HAVING count(*) > 1;"
+        )
+        for order_id, n in cursor.fetchall():
+            problems.append({"type": "duplicate_credit", "order_id": order_id, "entries": n})
+
+        return len(problems) == 0, problems
+
+
+_folder = None
+_folder_lock = threading.Lock()
+
+
+def start_folder(interval: float = None) -> threading.Thread:
+    """Start the background thread that folds the ledger every interval seconds."""
+    global _folder
+    if interval is None:
+        interval = float(os.environ.get("LEDGER_FOLD_INTERVAL", 1.0))
+    with _folder_lock:
+        if _folder is not None and _folder.is_alive():
+            return _folder
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                if store_mod.get_db_conn() is None:
+                    continue
+                try:
+                    SellerLedger().fold()
+                except Exception as e:
+                    logging.error(f"seller ledger fold failed: {e}")
+
+        _folder = threading.Thread(target=run, name="ledger-folder", daemon=True)
+        _folder.stop = stop
+        _folder.start()
+        return _folder
+
+
+def stop_folder():
+    global _folder
+    with _folder_lock:
+        if _folder is not None:
+            _folder.stop.set()
+            _folder = None
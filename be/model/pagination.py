@@ -0,0 +1,48 @@
+"""Opaque keyset-pagination cursors.
+
+A cursor is the sort key of the last row of a page, JSON encoded and
+base64url wrapped so clients treat it as an opaque token.
+"""
+import base64
+import json
+import math
+
+# decode_cursor 中每个键元素允许的类型（JSON 解码后的 Python 类型）
+NUMBER = (int, float)
+STRING = (str,)
+NULL = (type(None),)
+
+# 游标中的数字会与 real 列比较（搜索的 ts_rank），超出 real 范围时 SQL 报错
+_REAL_MAX = 3.4e38
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, kinds):
+    """Return the decoded key as a list, or None if the token is malformed.
+
+    kinds has one entry per key element: the types it may have, built from
+    NUMBER, STRING and NULL (e.g. (NUMBER + NULL, STRING)). Forged cursors
+    are rejected here rather than failing later in SQL.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(kinds):
+        return None
+    for value, types in zip(values, kinds):
+        # bool 是 int 的子类，但不是合法的键
+        if isinstance(value, bool) or not isinstance(value, types):
+            return None
+        if isinstance(value, float) and not (math.isfinite(value) and abs(value) <= _REAL_MAX):
+            return None
+        if isinstance(value, int) and abs(value) > _REAL_MAX:
+            return None
+        if isinstance(value, str) and "\x00" in value:
+            return None
+    return values
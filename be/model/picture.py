@@ -0,0 +1,156 @@
+"""Content-addressed picture store on local disk.
+
+Seller.add_book receives cover pictures as base64 strings inside
+book_info. They are decoded once, written to disk under their SHA-256
+(identical pictures are stored once, however many books or copies refer
+to them) and replaced in book_info by that id, so book documents, search
+results and orders never carry picture bytes. Pictures are served by
+/picture/<id> (be/view/picture.py).
+
+Files live in PICTURE_DIR (default be/data/pictures), as <id[:2]>/<id[2:]>.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from be.model import store as store_mod
+
+_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_MAGIC = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def is_picture_id(value) -> bool:
+    return isinstance(value, str) and _ID_RE.match(value) is not None
+
+
+class PictureStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, picture_id: str) -> str:
+        return os.path.join(self.root, picture_id[:2], picture_id[2:])
+
+    def put(self, data: bytes) -> str:
+        """Store data and return its id; existing pictures are not rewritten."""
+        picture_id = hashlib.sha256(data).hexdigest()
+        path = self.path(picture_id)
+        if os.path.exists(path):
+            return picture_id
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再原子改名，并发写入同一图片时读者不会看到半个文件
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return picture_id
+
+    def find(self, picture_id: str):
+        """Path of a stored picture, or None if the id is invalid or unknown."""
+        if not is_picture_id(picture_id):
+            return None
+        path = self.path(picture_id)
+        return path if os.path.isfile(path) else None
+
+    def extract(self, book_info: dict) -> dict:
+        """Return book_info with base64 pictures replaced by picture ids.
+
+        Entries that already are ids of stored pictures are kept as they are.
+        Raises ValueError for ids of pictures that are not stored and for
+        entries that are not base64.
+        """
+        pictures = book_info.get("pictures")
+        if not pictures:
+            return book_info
+        ids = []
+        for picture in pictures:
+            if is_picture_id(picture):
+                # 64 位十六进制串也是合法的 base64，不能当作图片内容解码
+                if self.find(picture) is None:
+                    raise ValueError("unknown picture id {}".format(picture))
+                ids.append(picture)
+            else:
+                ids.append(self.put(base64.b64decode(picture, validate=True)))
+        return dict(book_info, pictures=ids)
+
+
+def guess_mimetype(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(12)
+    for magic, mimetype in _MAGIC:
+        if head.startswith(magic):
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_picture_store() -> PictureStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            default = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "pictures")
+            _store = PictureStore(os.environ.get("PICTURE_DIR", default))
+        return _store
+
+
+def extract_existing_pictures(batch_size: int = 100) -> int:
+    """Move base64 pictures of books added before the picture store to disk.
+
+    Returns the number of books rewritten.
+    """
+    conn = store_mod.get_db_conn()
+    pictures = get_picture_store()
+    last = ""
+    done = 0
+    while True:
+        cursor = conn.execute(
+            "SELECT book_id, book_info->'pictures' FROM book "
+            "WHERE book_id > %s AND jsonb_typeof(book_info->'pictures') = 'array' "
+            "AND EXISTS (SELECT 1 FROM jsonb_array_elements_text(book_info->'pictures') p "
+            "            WHERE p !~ '^[0-9a-f]{64}$') "
+            "ORDER BY book_id LIMIT %s",
+            (last, batch_size),
+        )
+        rows = cursor.fetchall()
+        conn.commit()
+        if not rows:
+            break
+        for book_id, book_pictures in rows:
+            if isinstance(book_pictures, str):
+                book_pictures = json.loads(book_pictures)
+            try:
+                ids = pictures.extract({"pictures": book_pictures})["pictures"]
+            except (ValueError, TypeError) as e:
+                logging.error(f"book {book_id} has an invalid picture: {e}")
+                continue
+            conn.execute(
+                "UPDATE book SET book_info = jsonb_set(book_info, '{pictures}', %s::jsonb) "
+                "WHERE book_id = %s",
+                (json.dumps(ids), book_id),
+            )
+            conn.commit()
+            done += 1
+        last = rows[-1][0]
+    if done:
+        logging.info(f"moved pictures of {done} books to {pictures.root}")
+    return done
@@ -1,54 +1,288 @@
-"""Search helper using PostgreSQL text search.
+"""Search helper using PostgreSQL full-text search.
 
 Functions:
  - search_books(q, fields=None, store_id=None, page=1, page_size=10)
+ - search_books_page(...): same with cursor pagination and estimated totals
+ - build_search_vector(book_info): tsvector text stored by Seller.add_book
+ - ensure_search_index(): rebuild vectors when the tokenizer changed and
+   build the missing ones
 
-Uses PostgreSQL LIKE search against the store table with book_info JSON field.
+Each catalog book carries a weighted tsvector (book.search_vector, GIN
+indexed); searches run over the store view, one row per store carrying
+the book. Documents and queries are tokenized in Python by
+be/model/tokenizer.py, which segments CJK text, and passed to PostgreSQL
+as tsvector / tsquery literals so no text-search parser is involved.
+Field restriction maps every searchable field to its weight and is
+applied with tsquery weight labels, so one vector and one index serve
+every combination of fields. Results are ranked with ts_rank.
 """
+import logging
+import os
+from psycopg2 import extras
+from be.model import error
+from be.model import search_cache
 from be.model import store as store_mod
-from be.model import db_conn
+from be.model.pagination import encode_cursor, decode_cursor, NUMBER, STRING, NULL
+from be.model.tokenizer import get_tokenizer
 import json
-import math
 
+# 可搜索字段及其在 search_vector 中的权重
+FIELD_WEIGHTS = {
+    "title": "A",
+    "author": "B",
+    "tags": "C",
+    "book_intro": "D",
+    "content": "D",
+}
 
-def search_books(q: str, fields=None, store_id: str = None, page: int = 1, page_size: int = 10):
+# tsvector 中位置的上限，超过的位置会被 PostgreSQL 截断为该值
+_MAX_POSITION = 16383
+
+
+def _quote(token: str) -> str:
+    return "'" + token.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _field_text(book_info: dict, field: str) -> str:
+    value = book_info.get(field)
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value)
+
+
+def build_search_vector(book_info: dict) -> str:
+    """Build the tsvector text for a book, or '' if it has no searchable words."""
+    tokenizer = get_tokenizer()
+    positions = {}
+    pos = 0
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenizer.index_tokens(_field_text(book_info, field)):
+            pos = min(pos + 1, _MAX_POSITION)
+            positions.setdefault(token, []).append("{}{}".format(pos, weight))
+    # PostgreSQL 每个词最多保留 256 个位置
+    return " ".join(
+        "{}:{}".format(_quote(token), ",".join(p[:256])) for token, p in positions.items()
+    )
+
+
+def build_tsquery(q: str, fields=None) -> str:
+    """Turn a keyword string into a tsquery text, or '' if it has no words.
+
+    Every term must match (AND). Words and single CJK characters are matched
+    as prefixes, CJK bigrams exactly. When fields is given, matches are
+    restricted to the weights of those fields.
+    """
+    terms = get_tokenizer().query_terms(q)
+    if not terms:
+        return ""
+    weights = ""
+    if fields:
+        weights = "".join(sorted({FIELD_WEIGHTS[f] for f in fields if f in FIELD_WEIGHTS}))
+    seen = set()
+    parts = []
+    for token, prefix in terms:
+        if token in seen:
+            continue
+        seen.add(token)
+        label = ("*" if prefix else "") + weights
+        parts.append(_quote(token) + (":" + label if label else ""))
+    return " & ".join(parts)
+
+
+def reindex_search_vectors(batch_size: int = 500, missing_only: bool = False) -> int:
+    """Recompute search_vector of every catalog book with the current tokenizer.
+
+    With missing_only, only books whose vector is NULL: rows written with
+    plain SQL, which the book trigger marks that way.
+    """
+    conn = store_mod.get_db_conn()
+    last = ""
+    done = 0
+    missing = " AND search_vector IS NULL" if missing_only else ""
+    while True:
+        cursor = conn.execute(
+            "SELECT book_id, book_info - 'pictures' FROM book "
+            "WHERE book_id > %s" + missing + " ORDER BY book_id LIMIT %s",
+            (last, batch_size),
+        )
+        rows = cursor.fetchall()
+        conn.commit()
+        if not rows:
+            return done
+        values = []
+        for book_id, book_info in rows:
+            if isinstance(book_info, str):
+                book_info = json.loads(book_info)
+            values.append((book_id, build_search_vector(book_info or {})))
+        with conn.get_cursor() as cur:
+            extras.execute_values(
+                cur,
+                "UPDATE book b SET search_vector = v.vec::tsvector "
+                "FROM (VALUES %s) AS v(book_id, vec) WHERE b.book_id = v.book_id",
+                values,
+            )
+        done += len(rows)
+        last = rows[-1][0]
+
+
+def ensure_search_index():
+    """Rebuild search vectors if they were not built by the current tokenizer.
+
+    Otherwise only build the vectors that are missing.
+    """
+    conn = store_mod.get_db_conn()
+    name = get_tokenizer().name
+    cursor = conn.execute("SELECT value FROM search_meta WHERE key = 'tokenizer'")
+    row = cursor.fetchone()
+    conn.commit()
+    if row is not None and row[0] == name:
+        n = reindex_search_vectors(missing_only=True)
+        if n:
+            logging.info(f"search vectors built for {n} rows")
+        return
+    n = reindex_search_vectors()
+    conn.execute(
+        "INSERT INTO search_meta (key, value) VALUES ('tokenizer', %s) "
+        "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
+        (name,),
+    )
+    conn.commit()
+    logging.info(f"search vectors rebuilt with tokenizer {name}: {n} rows")
+
+
+def _estimate_total(conn, where_clause, params, cap):
+    """Exact count up to cap, the planner's row estimate beyond it.
+
+    Returns (total, is_estimate). The capped count stops scanning after
+    cap + 1 rows, so its cost does not grow with the size of the result.
+    """
+    cursor = conn.execute(
+        f'SELECT count(*) FROM (SELECT 1 FROM store WHERE {where_clause} LIMIT %s) t',
+        params + [cap + 1],
+    )
+    n = cursor.fetchone()[0]
+    if n <= cap:
+        return n, False
+    cursor = conn.execute(f'EXPLAIN (FORMAT JSON) SELECT 1 FROM store WHERE {where_clause}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(int(plan[0]["Plan"]["Plan Rows"]), cap + 1), True
+
+
+def search_books_page(q: str, fields=None, store_id: str = None, page: int = 1, page_size: int = 10,
+                      cursor: str = None, total_mode: str = None, filters: dict = None):
     """Search books in PostgreSQL.
     Parameters:
     - q: keyword string
-    - fields: list of fields to search
+    - fields: list of fields to search (title, author, tags, book_intro, content)
     - store_id: if provided, restrict to books available in that store
-    - page/page_size: pagination
+    - page/page_size: offset pagination, ignored when cursor is given
+    - cursor: next_cursor of the previous page (keyset pagination)
+    - total_mode: 'exact' (COUNT(*)), 'estimate' (exact up to SEARCH_COUNT_CAP,
+      planner estimate beyond) or 'none'. Defaults to 'exact' for page
+      requests and 'estimate' for cursor requests.
+    - filters: optional min_price / max_price (store price), tags (list, all
+      must match), author, isbn; matched on typed, indexed columns
+
+    Returns (code, message, results, info) where info holds total,
+    total_is_estimate, has_more and next_cursor.
     """
+    # 结果按规范化的查询参数缓存，店铺写入时失效（见 be/model/search_cache.py）
+    key = search_cache.make_key(q, fields, store_id, page, page_size, cursor, total_mode, filters)
+    return search_cache.cache.get_or_compute(
+        key,
+        lambda: _search_books_page(q, fields, store_id, page, page_size, cursor, total_mode, filters or {}),
+        cacheable=lambda result: result[0] == 200,
+    )
+
+
+# 过滤条件 -> 作用在 store 视图类型列上的 SQL
+FILTERS = {
+    "min_price": "price >= %s",
+    "max_price": "price <= %s",
+    "tags": "tags @> %s::text[]",
+    "author": "author = %s",
+    "isbn": "isbn = %s",
+}
+
+
+def _search_books_page(q, fields, store_id, page, page_size, cursor, total_mode, filters):
     try:
         conn = store_mod.get_db_conn()
-        
+
         # Build WHERE clauses
         where_clauses = []
         params = []
-        
+
         if store_id:
             where_clauses.append('store_id = %s')
             params.append(store_id)
-        
-        if q:
-            # Search in book_info JSON and other fields
-            like_q = f'%{q}%'
-            where_clauses.append('(book_info::text ILIKE %s OR book_info::text ILIKE %s OR book_info::text ILIKE %s)')
-            params.extend([like_q, like_q, like_q])
-        
+
+        tsquery = build_tsquery(q, fields)
+        if tsquery:
+            where_clauses.append("search_vector @@ %s::tsquery")
+            params.append(tsquery)
+
+        for name, condition in FILTERS.items():
+            value = filters.get(name)
+            if value is not None and value != []:
+                where_clauses.append(condition)
+                params.append(list(value) if name == "tags" else value)
+
         where_clause = ' AND '.join(f'({w})' for w in where_clauses) if where_clauses else '1=1'
-        
-        # Get total count
-        count_sql = f'SELECT COUNT(*) FROM store WHERE {where_clause}'
-        cursor = conn.execute(count_sql, params)
-        total = cursor.fetchone()[0]
-        
-        # Get paginated results
-        offset = (page - 1) * page_size
-        sql = f'SELECT book_info FROM store WHERE {where_clause} LIMIT %s OFFSET %s'
-        cursor = conn.execute(sql, params + [page_size, offset])
-        rows = cursor.fetchall()
-        
+
+        if total_mode is None:
+            total_mode = 'estimate' if cursor else 'exact'
+        if total_mode == 'exact':
+            cur = conn.execute(f'SELECT COUNT(*) FROM store WHERE {where_clause}', params)
+            total, is_estimate = cur.fetchone()[0], False
+        elif total_mode == 'estimate':
+            cap = int(os.environ.get('SEARCH_COUNT_CAP', 1000))
+            total, is_estimate = _estimate_total(conn, where_clause, params, cap)
+        else:
+            total, is_estimate = None, True
+
+        # 排序键 (rank DESC, store_id, book_id) 唯一，游标记录上一页最后一行的排序键
+        if tsquery:
+            rank = "ts_rank(search_vector, %s::tsquery)"
+            rank_params = [tsquery]
+        else:
+            rank = "NULL::real"
+            rank_params = []
+        page_clauses = [where_clause]
+        page_params = list(params)
+        offset = 0
+        if cursor:
+            key = decode_cursor(cursor, (NUMBER + NULL, STRING, STRING))
+            if key is None:
+                return error.error_invalid_cursor(cursor) + ([], {})
+            if tsquery:
+                page_clauses.append(
+                    f"({rank} < %s::real OR ({rank} = %s::real AND (store_id, book_id) > (%s, %s)))"
+                )
+                page_params += rank_params + [key[0]] + rank_params + [key[0], key[1], key[2]]
+            else:
+                page_clauses.append("(store_id, book_id) > (%s, %s)")
+                page_params += [key[1], key[2]]
+        else:
+            offset = (page - 1) * page_size
+
+        # Get one page, best matches first; one extra row tells whether there is more
+        order_by = f"{rank} DESC, store_id, book_id" if tsquery else "store_id, book_id"
+        sql = (
+            f'SELECT book_info, {rank}, store_id, book_id FROM store '
+            f'WHERE {" AND ".join(page_clauses)} ORDER BY {order_by} LIMIT %s OFFSET %s'
+        )
+        cur = conn.execute(
+            sql, rank_params + page_params + (rank_params if tsquery else []) + [page_size + 1, offset]
+        )
+        rows = cur.fetchall()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
         results = []
         for row in rows:
             try:
@@ -59,9 +293,23 @@ def search_books(q: str, fields=None, store_id: str = None, page: int = 1, page_
                 results.append(book_info)
             except Exception:
                 results.append({})
-        
-        return 200, 'ok', results, total
-    
+
+        next_cursor = encode_cursor(rows[-1][1:]) if has_more else None
+        info = {
+            'total': total,
+            'total_is_estimate': is_estimate,
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+        }
+        return 200, 'ok', results, info
+
     except Exception as e:
-        return 528, f'Search failed: {str(e)}', [], 0
+        return 528, f'Search failed: {str(e)}', [], {}
 
+
+def search_books(q: str, fields=None, store_id: str = None, page: int = 1, page_size: int = 10):
+    """Offset-paginated search with an exact total: (code, message, results, total)."""
+    code, message, results, info = search_books_page(
+        q, fields=fields, store_id=store_id, page=page, page_size=page_size, total_mode='exact'
+    )
+    return code, message, results, info.get('total', 0)
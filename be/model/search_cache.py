@@ -0,0 +1,208 @@
+"""In-process cache for /search results.
+
+Entries are kept in LRU order, expire after a TTL and are bounded both in
+number and in (approximate) bytes. Keys are normalized search arguments,
+so "Python" and "  python " share an entry.
+
+Writes invalidate per store: Seller.add_book and stock changes call
+invalidate(store_id), which drops that store's entries and every search
+not restricted to a store. A generation counter per store makes sure a
+query that was running while the store changed never stores its (possibly
+stale) result.
+
+Concurrent misses on the same key are coalesced: one thread runs the
+query, the others wait for its result (single flight). Setting coalesce
+to False turns this off; the ASGI app (be/aio) does so because its
+requests share one thread and a waiting request would block the leader.
+
+The cache lives in one process; with several worker processes each has
+its own, and the TTL bounds how long another worker can serve results
+from before a write.
+
+Configuration (environment variables):
+ - SEARCH_CACHE_SIZE: max entries, 0 disables the cache (default 1024)
+ - SEARCH_CACHE_BYTES: max total size of cached results (default 64 MiB)
+ - SEARCH_CACHE_TTL: seconds an entry stays valid (default 30)
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(q, fields, store_id, page, page_size, cursor=None, total_mode=None, filters=None):
+    """Normalize search arguments into a cache key."""
+    q = " ".join((q or "").lower().split())
+    fields = tuple(sorted(set(fields))) if fields else ()
+    position = ("cursor", cursor) if cursor else ("page", page)
+    filters = tuple(sorted(
+        (name, tuple(sorted(set(value))) if isinstance(value, (list, tuple)) else value)
+        for name, value in (filters or {}).items() if value is not None
+    ))
+    return q, fields, store_id or None, position, page_size, total_mode, filters
+
+
+class _Flight:
+    __slots__ = ("done", "value")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class SearchCache:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=30.0, coalesce=True):
+        self.max_entries = max_entries
+        self.coalesce = coalesce
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._by_store = {}
+        self._store_gen = {}
+        self._global_gen = 0
+        self._epoch = 0
+        self._flights = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _generation(self, store_id):
+        if store_id is None:
+            return self._epoch, self._global_gen
+        return self._epoch, self._store_gen.get(store_id, 0)
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._by_store.get(key[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_store[key[2]]
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            self._remove(key)
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, now):
+        try:
+            size = len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, now + self.ttl, size)
+        self._bytes += size
+        self._by_store.setdefault(key[2], set()).add(key)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """Return the cached value for key, computing it at most once at a time.
+
+        compute() runs without the lock held; its result is cached only if
+        cacheable(result) is true and the store was not invalidated meanwhile.
+        """
+        if not self.enabled:
+            return compute()
+        store_id = key[2]
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry is not None:
+                self._hits += 1
+                return entry[0]
+            flight = self._flights.get(key) if self.coalesce else None
+            if flight is None:
+                self._misses += 1
+                flight = _Flight()
+                if self.coalesce:
+                    self._flights[key] = flight
+                leader = True
+                generation = self._generation(store_id)
+            else:
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.value is not None:
+                return flight.value
+            # 领头线程失败（抛出异常），各自重新查询
+            return compute()
+
+        value = None
+        try:
+            value = compute()
+            return value
+        finally:
+            with self._lock:
+                if value is not None and cacheable(value) and generation == self._generation(store_id):
+                    self._store(key, value, time.monotonic())
+                flight.value = value
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def invalidate(self, store_id):
+        """Drop entries of store_id and every search not restricted to a store."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._invalidations += 1
+            self._global_gen += 1
+            self._store_gen[store_id] = self._store_gen.get(store_id, 0) + 1
+            for sid in (store_id, None):
+                for key in list(self._by_store.get(sid, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_store.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "in_flight": len(self._flights),
+            }
+
+
+cache = SearchCache(
+    max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", 1024)),
+    max_bytes=int(os.environ.get("SEARCH_CACHE_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", 30.0)),
+)
@@ -1,20 +1,31 @@
 from be.model import error
 from be.model import db_conn
-import threading
+from be.model import picture
+from be.model import search
+from be.model import search_cache
+import csv
+import io
+import json
 import logging
 
-# 全局店铺创建锁，防止并发创建相同店铺导致的竞态条件
-_store_locks = {}
-_store_locks_lock = threading.Lock()
 
+def _price(book_info: dict):
+    """图书价格（整数），缺失或不是数字时返回 None"""
+    try:
+        return int(book_info.get("price"))
+    except (TypeError, ValueError):
+        return None
 
-def _get_store_lock(store_id: str) -> threading.RLock:
-    """获取店铺特定的锁，用于防止并发创建同一店铺"""
-    with _store_locks_lock:
-        if store_id not in _store_locks:
-            _store_locks[store_id] = threading.RLock()
-        return _store_locks[store_id]
 
+def prepare_book(book_json_str: str):
+    """上架前不访问数据库的准备工作，返回 (book_info, book_json_str, search_vector)。
+
+    图片以内容哈希存入磁盘（见 be/model/picture.py），book_info 中只保留图片 id；
+    检索向量按应用层分词器生成（中文按二元组切分）。
+    这些都是 CPU 与磁盘操作，异步服务在线程池中先行调用，再把结果交给 add_book。
+    """
+    book_info = picture.get_picture_store().extract(json.loads(book_json_str))
+    return book_info, json.dumps(book_info), search.build_search_vector(book_info)
 
 
 class Seller(db_conn.DBConn):
@@ -28,7 +39,9 @@ class Seller(db_conn.DBConn):
         book_id: str,
         book_json_str: str,
         stock_level: int,
+        prepared=None,
     ):
+        """prepared 为 prepare_book(book_json_str) 的结果，缺省时在这里计算"""
         try:
             if not self.user_id_exist(user_id):
                 return error.error_non_exist_user_id(user_id)
@@ -37,18 +50,139 @@ class Seller(db_conn.DBConn):
             if self.book_id_exist(store_id, book_id):
                 return error.error_exist_book_id(book_id)
 
+            if prepared is None:
+                try:
+                    prepared = prepare_book(book_json_str)
+                except (ValueError, TypeError) as e:
+                    # 与 add_books 相同：图片不是 base64 或引用了不存在的图片 id
+                    return error.error_invalid_book_info("pictures: {}".format(e))
+            book_info, book_json_str, search_vector = prepared
+            # 图书文档只在目录表 book 中保存一份，多个店铺共享；店铺只记录价格与库存
             self.conn.execute(
-                "INSERT into store(store_id, book_id, book_info, stock_level)"
+                "WITH b AS ("
+                "    INSERT INTO book(book_id, book_info, search_vector)"
+                "    VALUES (%s, %s, %s::tsvector) ON CONFLICT (book_id) DO NOTHING"
+                ") "
+                "INSERT INTO inventory(store_id, book_id, price, stock_level)"
                 "VALUES (%s, %s, %s, %s)",
-                (store_id, book_id, book_json_str, stock_level),
+                (
+                    book_id, book_json_str, search_vector,
+                    store_id, book_id, _price(book_info), stock_level,
+                ),
             )
             self.conn.commit()
+            search_cache.cache.invalidate(store_id)
         except Exception as e:
             return 528, "{}".format(str(e))
         except BaseException as e:
             return 530, "{}".format(str(e))
         return 200, "ok"
 
+    def add_books(self, user_id: str, store_id: str, items, batch_size: int = 1000):
+        """批量上架图书。
+
+        items 为 {"book_info": {...}, "stock_level": n} 的可迭代对象，可以是流式读取的生成器。
+        卖家与店铺只校验一次；每 batch_size 本经 COPY 写入临时表，再一次性插入 book 与 inventory。
+        返回 (code, message, added, failures)，failures 为逐条失败的
+        {"index", "book_id", "code", "message"}：已存在或批内重复的图书为 516，书籍信息无效为 521。
+        """
+        added = 0
+        failures = []
+        try:
+            if not self.user_id_exist(user_id):
+                return error.error_non_exist_user_id(user_id) + (0, [])
+            if not self.store_id_exist(store_id):
+                return error.error_non_exist_store_id(store_id) + (0, [])
+
+            seen = set()
+            batch = []
+            for index, item in enumerate(items):
+                row = self._bulk_row(index, item, seen, failures)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    added += self._ingest(store_id, batch, failures)
+                    batch = []
+            if batch:
+                added += self._ingest(store_id, batch, failures)
+        except Exception as e:
+            return 528, "{}".format(str(e)), added, failures
+        except BaseException as e:
+            return 530, "{}".format(str(e)), added, failures
+        finally:
+            if added:
+                search_cache.cache.invalidate(store_id)
+        return 200, "ok", added, failures
+
+    @staticmethod
+    def _bulk_row(index, item, seen, failures):
+        def fail(book_id, code_message):
+            failures.append({
+                "index": index, "book_id": book_id,
+                "code": code_message[0], "message": code_message[1],
+            })
+
+        book_info = item.get("book_info") if isinstance(item, dict) else None
+        book_id = book_info.get("id") if isinstance(book_info, dict) else None
+        if not isinstance(book_id, str) or not book_id:
+            fail(book_id, error.error_invalid_book_info("missing book_info.id"))
+            return None
+        stock_level = item.get("stock_level", 0)
+        if not isinstance(stock_level, int) or isinstance(stock_level, bool):
+            fail(book_id, error.error_invalid_book_info("stock_level must be an integer"))
+            return None
+        if book_id in seen:
+            fail(book_id, error.error_exist_book_id(book_id))
+            return None
+        seen.add(book_id)
+        try:
+            book_info = picture.get_picture_store().extract(book_info)
+        except (ValueError, TypeError) as e:
+            fail(book_id, error.error_invalid_book_info("pictures: {}".format(e)))
+            return None
+        return (
+            index, book_id, json.dumps(book_info), search.build_search_vector(book_info),
+            _price(book_info), stock_level,
+        )
+
+    def _ingest(self, store_id, rows, failures) -> int:
+        inserted = self.conn.run_in_transaction(lambda cursor: self._copy_batch(cursor, store_id, rows))
+        for index, book_id, *_ in rows:
+            if book_id not in inserted:
+                code, message = error.error_exist_book_id(book_id)
+                failures.append({"index": index, "book_id": book_id, "code": code, "message": message})
+        return len(inserted)
+
+    @staticmethod
+    def _copy_batch(cursor, store_id, rows) -> set:
+        # 临时表随连接存在，每次提交后清空；COPY 一次传完整批数据，
+        # 再用两条 INSERT ... SELECT 写入目录与库存，冲突的行在库存插入时被跳过
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS bulk_book ("
+            "    book_id TEXT, book_info JSONB, search_vector TSVECTOR,"
+            "    price INTEGER, stock_level INTEGER"
+            ") ON COMMIT DELETE ROWS;"
+        )
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for _, book_id, book_json, vector, price, stock_level in rows:
+            writer.writerow((book_id, book_json, vector or None, price, stock_level))
+        buf.seek(0)
+        cursor.copy_expert("COPY bulk_book FROM STDIN WITH (FORMAT csv)", buf)
+        cursor.execute(
+            "INSERT INTO book (book_id, book_info, search_vector) "
+            "SELECT book_id, book_info, search_vector FROM bulk_book ORDER BY book_id "
+            "ON CONFLICT (book_id) DO NOTHING;"
+        )
+        cursor.execute(
+            "INSERT INTO inventory (store_id, book_id, price, stock_level) "
+            "SELECT %s, book_id, price, stock_level FROM bulk_book ORDER BY book_id "
+            "ON CONFLICT (store_id, book_id) DO NOTHING RETURNING book_id;",
+            (store_id,),
+        )
+        return {r[0] for r in cursor.fetchall()}
+
     def add_stock_level(
         self, user_id: str, store_id: str, book_id: str, add_stock_level: int
     ):
@@ -61,41 +195,120 @@ class Seller(db_conn.DBConn):
                 return error.error_non_exist_book_id(book_id)
 
             self.conn.execute(
-                "UPDATE store SET stock_level = stock_level + %s "
+                "UPDATE inventory SET stock_level = stock_level + %s "
                 "WHERE store_id = %s AND book_id = %s",
                 (add_stock_level, store_id, book_id),
             )
             self.conn.commit()
+            search_cache.cache.invalidate(store_id)
         except Exception as e:
             return 528, "{}".format(str(e))
         except BaseException as e:
             return 530, "{}".format(str(e))
         return 200, "ok"
 
+    def add_stock_levels(self, user_id: str, store_id: str, items):
+        """批量调整库存，items 为 (book_id, delta) 序列，delta 可为负数。
+
+        同一本书出现多次时增量相加；所有调整在一条语句中完成。
+        返回 (code, message, stock_levels, failures)：stock_levels 为 {book_id: 调整后库存}，
+        failures 为逐条失败的 {"index", "book_id", "code", "message"}，
+        图书不在店铺中为 515，调整后库存小于 0 为 517（该书不做调整），格式错误为 521。
+        """
+        try:
+            if not self.user_id_exist(user_id):
+                return error.error_non_exist_user_id(user_id) + ({}, [])
+            if not self.store_id_exist(store_id):
+                return error.error_non_exist_store_id(store_id) + ({}, [])
+
+            failures = []
+            book_ids, deltas, indexes = [], [], {}
+
+            def fail(index, book_id, code_message):
+                failures.append({
+                    "index": index, "book_id": book_id,
+                    "code": code_message[0], "message": code_message[1],
+                })
+
+            for index, item in enumerate(items):
+                book_id, delta = item if isinstance(item, (list, tuple)) and len(item) == 2 else (None, None)
+                if not isinstance(book_id, str) or not isinstance(delta, int) or isinstance(delta, bool):
+                    fail(index, book_id, error.error_invalid_book_info("book_id and integer delta required"))
+                    continue
+                book_ids.append(book_id)
+                deltas.append(delta)
+                indexes.setdefault(book_id, []).append(index)
+
+            rows = []
+            if book_ids:
+                rows = self.conn.run_in_transaction(
+                    lambda cursor: self._adjust_stock(cursor, store_id, book_ids, deltas)
+                )
+
+            stock_levels = {}
+            found = set()
+            for book_id, stock_level in rows:
+                found.add(book_id)
+                if stock_level is None:
+                    for index in indexes[book_id]:
+                        fail(index, book_id, error.error_stock_level_low(book_id))
+                else:
+                    stock_levels[book_id] = stock_level
+            for book_id, book_indexes in indexes.items():
+                if book_id not in found:
+                    for index in book_indexes:
+                        fail(index, book_id, error.error_non_exist_book_id(book_id))
+            failures.sort(key=lambda f: f["index"])
+            if stock_levels:
+                search_cache.cache.invalidate(store_id)
+        except Exception as e:
+            return 528, "{}".format(str(e)), {}, []
+        except BaseException as e:
+            return 530, "{}".format(str(e)), {}, []
+        return 200, "ok", stock_levels, failures
+
+    @staticmethod
+    def _adjust_stock(cursor, store_id, book_ids, deltas):
+        # 与 Buyer._new_order_txn 相同的加锁顺序（按 book_id），避免与下单互相死锁；
+        # 结果中 stock_level 为 NULL 的行表示库存不足未调整，不出现的 book_id 不在店铺中
+        cursor.execute(
+            "WITH req AS ("
+            "    SELECT book_id, sum(delta)::int AS delta"
+            "    FROM unnest(%s::text[], %s::int[]) AS r(book_id, delta) GROUP BY book_id"
+            "), lck AS ("
+            "    SELECT s.book_id, req.delta FROM inventory s JOIN req ON s.book_id = req.book_id"
+            "    WHERE s.store_id = %s ORDER BY s.book_id FOR UPDATE OF s"
+            "), upd AS ("
+            "    UPDATE inventory s SET stock_level = s.stock_level + lck.delta FROM lck"
+            "    WHERE s.store_id = %s AND s.book_id = lck.book_id"
+            "      AND s.stock_level + lck.delta >= 0"
+            "    RETURNING s.book_id, s.stock_level"
+            ") "
+            "SELECT lck.book_id, upd.stock_level FROM lck LEFT JOIN upd ON upd.book_id = lck.book_id",
+            (book_ids, deltas, store_id, store_id),
+        )
+        return cursor.fetchall()
+
     def create_store(self, user_id: str, store_id: str) -> (int, str):
-        # 使用店铺特定的锁，防止并发创建同一店铺
-        store_lock = _get_store_lock(store_id)
-        with store_lock:
-            # 在锁内，再检查一次店铺是否已存在（double-check pattern）
-            if self.store_id_exist(store_id):
+        try:
+            if not self.user_id_exist(user_id):
+                return error.error_non_exist_user_id(user_id)
+            # store_id 是主键：并发创建同一店铺时只有一个 INSERT 写入，其余的 rowcount 为 0。
+            # 预派生模式下请求分布在多个工作进程（be/prefork.py），进程内的锁无法互斥，只能依靠数据库约束
+            cursor = self.conn.execute(
+                "INSERT INTO user_store(store_id, user_id) VALUES (%s, %s) "
+                "ON CONFLICT (store_id) DO NOTHING;",
+                (store_id, user_id),
+            )
+            if cursor.rowcount == 0:
                 return error.error_exist_store_id(store_id)
-            
-            try:
-                if not self.user_id_exist(user_id):
-                    return error.error_non_exist_user_id(user_id)
-                
-                self.conn.execute(
-                    "INSERT into user_store(store_id, user_id)" "VALUES (%s, %s)",
-                    (store_id, user_id),
-                )
-                self.conn.commit()
-            except Exception as e:
-                logging.error(f"Create store failed for store {store_id}: {e}")
-                return 528, "{}".format(str(e))
-            except BaseException as e:
-                logging.error(f"Create store failed (BaseException) for store {store_id}: {e}")
-                return 530, "{}".format(str(e))
-            return 200, "ok"
+        except Exception as e:
+            logging.error(f"Create store failed for store {store_id}: {e}")
+            return 528, "{}".format(str(e))
+        except BaseException as e:
+            logging.error(f"Create store failed (BaseException) for store {store_id}: {e}")
+            return 530, "{}".format(str(e))
+        return 200, "ok"
 
     def ship_order(self, user_id: str, order_id: str) -> (int, str):
         try:
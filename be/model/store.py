@@ -1,7 +1,12 @@
 # be/model/store.py
 import os
+import time
+import random
 import threading
+import collections
 import psycopg2
+from psycopg2 import errorcodes
+from psycopg2 import extensions
 from psycopg2 import sql
 from contextlib import contextmanager
 import logging
@@ -13,6 +18,265 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# 死锁与序列化失败可以整体重放事务
+RETRYABLE_PGCODES = frozenset(
+    (errorcodes.DEADLOCK_DETECTED, errorcodes.SERIALIZATION_FAILURE)
+)
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's checkout timeout."""
+
+
+class ConnectionPool:
+    """有界连接池：checkout/checkin 语义、空闲回收、陈旧连接探活、耗尽时限时等待。
+
+    - min_size/max_size: 常驻连接数下限与打开连接数上限
+    - timeout: 连接耗尽时 getconn 最长等待秒数，超时抛出 PoolTimeout
+    - idle_timeout: 空闲超过该秒数的连接会被回收（保留 min_size 个）
+    - probe_interval: 空闲超过该秒数的连接在借出前先执行 SELECT 1 探活
+    """
+
+    def __init__(self, connect, min_size=1, max_size=32, timeout=30.0,
+                 idle_timeout=300.0, probe_interval=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"invalid pool size min={min_size} max={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.probe_interval = probe_interval
+
+        # 空闲连接按 (conn, 归还时间, 代数) 存放；后进先出，让冷连接自然老化被回收
+        self._idle = collections.deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._size = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._generation = 0
+        # 借出连接 id -> 借出时的代数；reset 之后旧代连接归还时直接关闭
+        self._checked_out = {}
+        self._closed = False
+
+        self._checkouts = 0
+        self._wait_count = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._reaped = 0
+        self._probe_failures = 0
+
+        self._reaper_stop = threading.Event()
+        self._reaper = None
+
+    def open(self):
+        """预先建立 min_size 个连接并启动后台回收线程。"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+                generation = self._generation
+            conn = self._new_connection()
+            with self._cond:
+                self._idle.append((conn, time.monotonic(), generation))
+                self._cond.notify()
+        self._start_reaper()
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"no connection available within {self.timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+                    if self._closed:
+                        raise psycopg2.InterfaceError("connection pool is closed")
+                if self._idle:
+                    conn, idle_since, generation = self._idle.pop()
+                    fresh = False
+                else:
+                    self._size += 1
+                    conn, idle_since, generation = None, None, self._generation
+                    fresh = True
+                self._in_use += 1
+
+            if fresh:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(conn, idle_since):
+                self._discard(conn, in_use=True)
+                continue
+
+            with self._cond:
+                self._checked_out[id(conn)] = generation
+                self._checkouts += 1
+                if waited:
+                    elapsed = time.monotonic() - start
+                    self._wait_count += 1
+                    self._wait_time += elapsed
+                    self._max_wait_time = max(self._max_wait_time, elapsed)
+            return conn
+
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+        with self._cond:
+            if id(conn) not in self._checked_out:
+                raise psycopg2.InterfaceError("connection was not checked out from this pool")
+            generation = self._checked_out.pop(id(conn))
+            stale = generation != self._generation
+            if close or conn.closed or stale or self._closed:
+                discard = True
+            else:
+                discard = False
+                self._in_use -= 1
+                self._idle.append((conn, time.monotonic(), generation))
+                self._cond.notify()
+        if discard:
+            self._discard(conn, in_use=True)
+
+    def reap(self):
+        """关闭空闲过久的连接，至少保留 min_size 个。返回回收数量。"""
+        now = time.monotonic()
+        victims = []
+        with self._cond:
+            # 最老的空闲连接在队首
+            while (self._idle and self._size - len(victims) > self.min_size
+                   and now - self._idle[0][1] >= self.idle_timeout):
+                victims.append(self._idle.popleft()[0])
+            self._size -= len(victims)
+            self._reaped += len(victims)
+            if victims:
+                self._cond.notify_all()
+        for conn in victims:
+            self._close_quietly(conn)
+        return len(victims)
+
+    def reset(self):
+        """关闭全部空闲连接；正在使用的连接在归还时关闭。"""
+        with self._cond:
+            self._generation += 1
+            victims = [item[0] for item in self._idle]
+            self._idle.clear()
+            self._size -= len(victims)
+            self._discarded += len(victims)
+            self._cond.notify_all()
+        for conn in victims:
+            self._close_quietly(conn)
+
+    def close(self):
+        self._reaper_stop.set()
+        with self._cond:
+            self._closed = True
+        self.reset()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "wait_count": self._wait_count,
+                "wait_time_total": self._wait_time,
+                "wait_time_max": self._max_wait_time,
+                "wait_time_avg": self._wait_time / self._wait_count if self._wait_count else 0.0,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "reaped": self._reaped,
+                "probe_failures": self._probe_failures,
+            }
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_usable(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.probe_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Discarding stale pooled connection: {e}")
+            with self._cond:
+                self._probe_failures += 1
+            return False
+
+    def _discard(self, conn, in_use=False):
+        with self._cond:
+            self._size -= 1
+            if in_use:
+                self._in_use -= 1
+            self._discarded += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+        interval = max(1.0, min(self.idle_timeout, self.probe_interval) / 2)
+
+        def run():
+            while not self._reaper_stop.wait(interval):
+                try:
+                    self.reap()
+                except Exception as e:
+                    logger.error(f"Connection pool reaper failed: {e}")
+
+        self._reaper = threading.Thread(target=run, name="db-pool-reaper", daemon=True)
+        self._reaper.start()
+
+
 class PostgreSQLConnection:
     
     def __init__(self, db_host="localhost", db_port=5432, db_user="postgres", 
@@ -23,33 +287,52 @@ class PostgreSQLConnection:
         self.db_user = os.environ.get('DB_USER', db_user)
         self.db_password = os.environ.get('DB_PASSWORD', db_password)
         self.db_name = os.environ.get('DB_NAME', db_name)
-        self.conn_pool = {}
-        self.pool_lock = threading.Lock()
+        self.pool = ConnectionPool(
+            self._connect,
+            min_size=int(os.environ.get('DB_POOL_MIN', 1)),
+            max_size=int(os.environ.get('DB_POOL_MAX', 32)),
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            idle_timeout=float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300)),
+            probe_interval=float(os.environ.get('DB_POOL_PROBE_INTERVAL', 30)),
+        )
+        # 每个线程在一次语句 / 事务期间独占一个借出的连接
+        self._local = threading.local()
         # self._init_database() # Defer initialization
-    
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(
+                host=self.db_host,
+                port=self.db_port,
+                user=self.db_user,
+                password=self.db_password,
+                database=self.db_name
+            )
+        except psycopg2.Error as e:
+            logger.error(f"Failed to connect to database: {e}")
+            raise
+        # 设置自动提交为 False，需要手动 commit
+        conn.autocommit = False
+        return conn
+
     def _get_connection(self):
-        thread_id = threading.get_ident()
-        if thread_id not in self.conn_pool:
-            try:
-                conn = psycopg2.connect(
-                    host=self.db_host,
-                    port=self.db_port,
-                    user=self.db_user,
-                    password=self.db_password,
-                    database=self.db_name
-                )
-                # 设置自动提交为 False，需要手动 commit
-                conn.autocommit = False
-                self.conn_pool[thread_id] = conn
-                logger.info(f"Created new connection for thread {thread_id}")
-            except psycopg2.Error as e:
-                logger.error(f"Failed to connect to database: {e}")
-                raise
-        return self.conn_pool[thread_id]
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self.pool.getconn()
+            self._local.conn = conn
+        return conn
+
+    def _release_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "depth", 0) > 0:
+            return
+        self._local.conn = None
+        self.pool.putconn(conn)
     
     @contextmanager
     def get_cursor(self):
         conn = self._get_connection()
+        self._local.depth = getattr(self._local, "depth", 0) + 1
         cursor = conn.cursor()
         try:
             yield cursor
@@ -60,7 +343,30 @@ class PostgreSQLConnection:
             raise
         finally:
             cursor.close()
+            self._local.depth -= 1
+            self._release_connection()
     
+    def run_in_transaction(self, fn, max_attempts=None):
+        """在一个事务中执行 fn(cursor) 并提交，返回 fn 的返回值。
+
+        遇到死锁或序列化失败时回滚并整体重放，采用带随机抖动的指数退避，
+        最多尝试 max_attempts 次（默认取 DB_TXN_MAX_ATTEMPTS，缺省 5 次）。
+        """
+        if max_attempts is None:
+            max_attempts = int(os.environ.get('DB_TXN_MAX_ATTEMPTS', 5))
+        attempt = 1
+        while True:
+            try:
+                with self.get_cursor() as cursor:
+                    return fn(cursor)
+            except psycopg2.Error as e:
+                if e.pgcode not in RETRYABLE_PGCODES or attempt >= max_attempts:
+                    raise
+                delay = min(0.5, 0.01 * (2 ** attempt))
+                logger.info(f"Retrying transaction (attempt {attempt}) after {e.pgcode}")
+                time.sleep(random.uniform(0, delay))
+                attempt += 1
+
     def execute(self, query, params=None):
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -72,6 +378,9 @@ class PostgreSQLConnection:
             conn.rollback()
             logger.error(f"Query failed: {query}, params: {params}, error: {e}")
             raise
+        finally:
+            # 结果已缓存在客户端游标中，连接可以立即归还
+            self._release_connection()
     
     def _init_database(self):
         try:
@@ -106,6 +415,8 @@ class PostgreSQLConnection:
             )
             actual_conn.autocommit = True
             cursor = actual_conn.cursor()
+            # 多个工作进程同时启动时串行执行建表与迁移，锁随连接关闭释放
+            cursor.execute("SELECT pg_advisory_lock(hashtext('bookstore_init_database'));")
             
             # 创建用户表
             cursor.execute("""
@@ -128,17 +439,37 @@ class PostgreSQLConnection:
                 );
             """)
             
-            # 创建店铺表
+            # 图书目录表：每本书的文档只保存一份，由所有上架该书的店铺共享
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS store (
-                    store_id TEXT NOT NULL REFERENCES user_store(store_id),
-                    book_id TEXT NOT NULL,
+                CREATE TABLE IF NOT EXISTS book (
+                    book_id TEXT PRIMARY KEY,
                     book_info JSONB NOT NULL,
+                    search_vector TSVECTOR,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+
+            # 店铺库存表：只保存店铺自己的价格与库存
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS inventory (
+                    store_id TEXT NOT NULL REFERENCES user_store(store_id),
+                    book_id TEXT NOT NULL REFERENCES book(book_id),
+                    price INTEGER,
                     stock_level INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     PRIMARY KEY(store_id, book_id)
                 );
             """)
+            # 库存更新只改 stock_level（不在任何索引中），预留页内空间让更新走 HOT，
+            # 新版本元组写在同一页且无需更新索引；更频繁地触发 autovacuum 回收旧版本
+            cursor.execute(
+                "ALTER TABLE inventory SET (fillfactor = %s, "
+                "autovacuum_vacuum_scale_factor = 0.05, autovacuum_analyze_scale_factor = 0.05);",
+                (int(os.environ.get("INVENTORY_FILLFACTOR", 70)),),
+            )
+            self._migrate_store_table(cursor)
+            self._init_book_columns(cursor)
+            self._init_search_vector(cursor)
+            self._init_store_view(cursor)
             
             # 创建订单表
             cursor.execute("""
@@ -151,9 +482,14 @@ class PostgreSQLConnection:
                     pay_time INTEGER,
                     ship_time INTEGER,
                     receive_time INTEGER,
+                    total_price INTEGER,
+                    seller_id TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
             """)
+            # 旧库升级：下单时记录订单总价与卖家，付款时不再重新计算
+            cursor.execute("ALTER TABLE new_order ADD COLUMN IF NOT EXISTS total_price INTEGER;")
+            cursor.execute("ALTER TABLE new_order ADD COLUMN IF NOT EXISTS seller_id TEXT;")
             
             # 创建订单详情表
             cursor.execute("""
@@ -166,12 +502,42 @@ class PostgreSQLConnection:
                 );
             """)
             
+            # 卖家入账流水：付款只追加记录，由 be.model.ledger 批量并入卖家余额
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS seller_ledger (
+                    entry_id BIGSERIAL PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    order_id TEXT NOT NULL,
+                    amount INTEGER NOT NULL,
+                    folded BOOLEAN NOT NULL DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            # 已并入余额的流水累计额，用于一致性校验
+            cursor.execute('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS ledger_folded BIGINT NOT NULL DEFAULT 0;')
+
             # 创建索引以提高查询性能
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_store_user_id ON user_store(user_id);")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_store_store_id ON store(store_id);")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_new_order_user_id ON new_order(user_id);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_book_id ON inventory(book_id);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_search_vector ON book USING GIN(search_vector);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_title ON book(title);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_author ON book(author);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_isbn ON book(isbn);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_pub_year ON book(pub_year);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_tags ON book USING GIN(tags);")
+            # 价格区间过滤；库存更新不改 price，仍然是 HOT 更新
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_store_price ON inventory(store_id, price);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_inventory_price ON inventory(price);")
+            # 买家订单键集分页（同时覆盖按 user_id 的查询）：WHERE user_id = ? ORDER BY create_time DESC, order_id DESC
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_new_order_user_time "
+                "ON new_order(user_id, create_time DESC NULLS LAST, order_id DESC);"
+            )
+            cursor.execute("DROP INDEX IF EXISTS idx_new_order_user_id;")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_new_order_store_id ON new_order(store_id);")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_new_order_detail_order_id ON new_order_detail(order_id);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_seller_ledger_unfolded ON seller_ledger(user_id) WHERE NOT folded;")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_seller_ledger_order_id ON seller_ledger(order_id);")
             
             cursor.close()
             actual_conn.close()
@@ -184,22 +550,176 @@ class PostgreSQLConnection:
             logger.error(f"Database initialization failed: {e}")
             raise
     
+    @staticmethod
+    def _migrate_store_table(cursor):
+        # 旧库升级：原 store 表每个店铺各存一份完整的 book_info。
+        # 按 book_id 去重写入 book（保留最早上架的文档），价格与库存写入 inventory，
+        # 然后删除旧表，由同名视图替代（见 _init_store_view）。
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('store');")
+        row = cursor.fetchone()
+        if row is None or row[0] != "r":
+            return
+        cursor.execute("BEGIN;")
+        try:
+            cursor.execute("LOCK TABLE store IN ACCESS EXCLUSIVE MODE;")
+            cursor.execute("ALTER TABLE store ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;")
+            cursor.execute("""
+                INSERT INTO book (book_id, book_info, search_vector)
+                SELECT DISTINCT ON (book_id) book_id, book_info, search_vector FROM store
+                ORDER BY book_id, created_at
+                ON CONFLICT (book_id) DO NOTHING;
+            """)
+            cursor.execute("""
+                INSERT INTO inventory (store_id, book_id, price, stock_level)
+                SELECT store_id, book_id,
+                       CASE WHEN book_info->>'price' ~ '^-?[0-9]+$' THEN (book_info->>'price')::int END,
+                       stock_level
+                FROM store
+                ON CONFLICT (store_id, book_id) DO NOTHING;
+            """)
+            cursor.execute("DROP TABLE store;")
+            cursor.execute("DROP FUNCTION IF EXISTS store_search_vector_update();")
+            cursor.execute("COMMIT;")
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK;")
+            raise
+        logger.info("Migrated store table into book and inventory.")
+
+    @staticmethod
+    def _init_book_columns(cursor):
+        # 常用于过滤的字段从 book_info 派生为带类型的生成列，插入（含直接 SQL 与批量导入）时
+        # 由数据库计算，查询过滤与建索引不必再解析 JSONB
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION book_pub_year(s TEXT) RETURNS INTEGER AS $$
+                SELECT substring(s FROM '^\\s*([0-9]{4})')::int;
+            $$ LANGUAGE sql IMMUTABLE;
+        """)
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION book_tags(t JSONB) RETURNS TEXT[] AS $$
+                SELECT CASE jsonb_typeof(t)
+                    WHEN 'array' THEN ARRAY(SELECT jsonb_array_elements_text(t))
+                    WHEN 'string' THEN array_remove(string_to_array(t #>> '{}', E'\\n'), '')
+                    ELSE '{}'::text[]
+                END;
+            $$ LANGUAGE sql IMMUTABLE;
+        """)
+        for column, expression in (
+            ("title TEXT", "book_info->>'title'"),
+            ("author TEXT", "book_info->>'author'"),
+            ("isbn TEXT", "book_info->>'isbn'"),
+            ("pub_year INTEGER", "book_pub_year(book_info->>'pub_year')"),
+            ("tags TEXT[]", "book_tags(book_info->'tags')"),
+        ):
+            cursor.execute(
+                f"ALTER TABLE book ADD COLUMN IF NOT EXISTS {column} GENERATED ALWAYS AS ({expression}) STORED;"
+            )
+
+    @staticmethod
+    def _init_store_view(cursor):
+        # store 保留为 book 与 inventory 的视图，兼容按旧表结构读写的 SQL（测试、脚本）；
+        # 对视图的写入由 INSTEAD OF 触发器转给两张表。应用代码直接读写 inventory。
+        # 视图中的 book_info 以店铺自己的价格覆盖目录中的 price。
+        cursor.execute("""
+            CREATE OR REPLACE VIEW store AS
+            SELECT i.store_id, i.book_id,
+                   CASE WHEN i.price IS NULL THEN b.book_info
+                        ELSE b.book_info || jsonb_build_object('price', i.price) END AS book_info,
+                   i.stock_level, i.price, b.search_vector,
+                   b.title, b.author, b.isbn, b.pub_year, b.tags
+            FROM inventory i JOIN book b ON b.book_id = i.book_id;
+        """)
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION store_view_write() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO book (book_id, book_info) VALUES (NEW.book_id, NEW.book_info)
+                    ON CONFLICT (book_id) DO NOTHING;
+                    INSERT INTO inventory (store_id, book_id, price, stock_level)
+                    VALUES (NEW.store_id, NEW.book_id,
+                            COALESCE(NEW.price, CASE WHEN NEW.book_info->>'price' ~ '^-?[0-9]+$'
+                                                     THEN (NEW.book_info->>'price')::int END),
+                            COALESCE(NEW.stock_level, 0));
+                    RETURN NEW;
+                ELSIF TG_OP = 'UPDATE' THEN
+                    UPDATE inventory SET stock_level = NEW.stock_level, price = NEW.price
+                    WHERE store_id = OLD.store_id AND book_id = OLD.book_id;
+                    RETURN NEW;
+                ELSE
+                    DELETE FROM inventory WHERE store_id = OLD.store_id AND book_id = OLD.book_id;
+                    RETURN OLD;
+                END IF;
+            END
+            $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_store_view_write ON store;")
+        cursor.execute("""
+            CREATE TRIGGER trg_store_view_write
+            INSTEAD OF INSERT OR UPDATE OR DELETE ON store
+            FOR EACH ROW EXECUTE FUNCTION store_view_write();
+        """)
+
+    @staticmethod
+    def _init_search_vector(cursor):
+        # 全文检索向量由应用层分词生成（见 be/model/tokenizer.py），库存更新不受影响。
+        # 字段权重：title=A, author=B, tags=C, book_intro/content=D，
+        # 查询时用 tsquery 的权重限定实现按字段搜索（见 be/model/search.py）。
+        # 数据库里没有对应的分词器，触发器不生成向量：绕过应用层写入（或改动了检索字段却没有给出新向量）
+        # 的行置为 NULL，由 search.ensure_search_index() 在启动和导入时按当前分词器补建
+        cursor.execute("""
+            CREATE OR REPLACE FUNCTION book_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE'
+                   AND NEW.search_vector IS NOT DISTINCT FROM OLD.search_vector
+                   AND (NEW.book_info->'title' IS DISTINCT FROM OLD.book_info->'title'
+                        OR NEW.book_info->'author' IS DISTINCT FROM OLD.book_info->'author'
+                        OR NEW.book_info->'tags' IS DISTINCT FROM OLD.book_info->'tags'
+                        OR NEW.book_info->'book_intro' IS DISTINCT FROM OLD.book_info->'book_intro'
+                        OR NEW.book_info->'content' IS DISTINCT FROM OLD.book_info->'content') THEN
+                    NEW.search_vector := NULL;
+                END IF;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS trg_book_search_vector ON book;")
+        cursor.execute("""
+            CREATE TRIGGER trg_book_search_vector
+            BEFORE UPDATE OF book_info ON book
+            FOR EACH ROW EXECUTE FUNCTION book_search_vector_update();
+        """)
+        # 待补建的行很少，部分索引让补建不必扫描整张表
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_book_search_pending ON book(book_id) WHERE search_vector IS NULL;"
+        )
+        # 记录生成 search_vector 所用的分词器，分词器变化时由 search.ensure_search_index() 重建
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS search_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
     def commit(self):
-        conn = self._get_connection()
-        conn.commit()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.commit()
+            self._release_connection()
     
     def rollback(self):
-        conn = self._get_connection()
-        conn.rollback()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.rollback()
+            self._release_connection()
+
+    def pool_stats(self):
+        return self.pool.stats()
     
     def close_all(self):
-        with self.pool_lock:
-            for conn in self.conn_pool.values():
-                try:
-                    conn.close()
-                except:
-                    pass
-            self.conn_pool.clear()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "depth", 0) == 0:
+            self._local.conn = None
+            self.pool.putconn(conn, close=True)
+        self.pool.reset()
 
 
 # 全局数据库连接实例
@@ -214,7 +734,29 @@ def init_db_connection():
         if db_conn is None:
             db_conn = PostgreSQLConnection()
             db_conn._init_database()
+            db_conn.pool.open()
             logger.info("Database connection initialized.")
 
+def open_db_connection():
+    """只建立本进程的连接池，不执行建表与迁移。
+
+    用于 fork 出的工作进程：数据库已由主进程 init_db_connection() 初始化过。
+    """
+    global db_conn
+    with db_conn_lock:
+        if db_conn is None:
+            db_conn = PostgreSQLConnection()
+            db_conn.pool.open()
+
+
+def close_db_connection():
+    """关闭连接池；主进程在 fork 之前调用，工作进程不会继承父进程的连接。"""
+    global db_conn
+    with db_conn_lock:
+        if db_conn is not None:
+            db_conn.pool.close()
+            db_conn = None
+
+
 def get_db_conn():
     return db_conn
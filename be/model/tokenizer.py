@@ -0,0 +1,109 @@
+"""Tokenizers for book search.
+
+PostgreSQL's text-search parsers do not segment CJK text (and, depending
+on the database locale, may drop CJK characters altogether), so search
+vectors and queries are tokenized in Python and handed to PostgreSQL as
+ready-made tsvector / tsquery values (see be/model/search.py).
+
+The same tokenizer must be used at index time (Seller.add_book) and at
+query time. It is chosen with the SEARCH_TOKENIZER environment variable:
+ - "bigram" (default): overlapping character bigrams for CJK runs, plus
+   the last character of each run so single-character queries still hit;
+   lower-cased words for everything else.
+ - "jieba": dictionary segmentation with jieba (optional dependency).
+Changing tokenizer requires rebuilding vectors with
+be.model.search.reindex_search_vectors().
+"""
+import abc
+import os
+import re
+import threading
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_RUN_RE = re.compile("([{0}]+)|([^\\W_{0}]+)".format(_CJK))
+
+
+class Tokenizer(abc.ABC):
+    name = "base"
+
+    @abc.abstractmethod
+    def index_tokens(self, text: str) -> [str]:
+        """Tokens of a document, in order (duplicates kept for positions)."""
+
+    @abc.abstractmethod
+    def query_terms(self, text: str) -> [(str, bool)]:
+        """(token, is_prefix) pairs that must all match for a query."""
+
+
+class BigramTokenizer(Tokenizer):
+    name = "bigram"
+
+    def index_tokens(self, text: str) -> [str]:
+        tokens = []
+        for cjk, word in _RUN_RE.findall((text or "").lower()):
+            if word:
+                tokens.append(word)
+            elif len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+                tokens.append(cjk[-1])
+        return tokens
+
+    def query_terms(self, text: str) -> [(str, bool)]:
+        terms = []
+        for cjk, word in _RUN_RE.findall((text or "").lower()):
+            if word:
+                terms.append((word, True))
+            elif len(cjk) == 1:
+                # 单字查询：匹配以该字开头的二元组或词尾单字
+                terms.append((cjk, True))
+            else:
+                terms.extend((cjk[i:i + 2], False) for i in range(len(cjk) - 1))
+        return terms
+
+
+class JiebaTokenizer(Tokenizer):
+    name = "jieba"
+
+    def __init__(self):
+        try:
+            import jieba
+        except ImportError:
+            raise ImportError("SEARCH_TOKENIZER=jieba requires the jieba package")
+        self._jieba = jieba
+
+    def _segments(self, text, cut):
+        for cjk, word in _RUN_RE.findall((text or "").lower()):
+            if word:
+                yield word, True
+            else:
+                for seg in cut(cjk):
+                    if seg.strip():
+                        yield seg, False
+
+    def index_tokens(self, text: str) -> [str]:
+        return [t for t, _ in self._segments(text, self._jieba.cut_for_search)]
+
+    def query_terms(self, text: str) -> [(str, bool)]:
+        return list(self._segments(text, self._jieba.cut))
+
+
+_TOKENIZERS = {
+    "bigram": BigramTokenizer,
+    "jieba": JiebaTokenizer,
+}
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> Tokenizer:
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            name = os.environ.get("SEARCH_TOKENIZER", "bigram")
+            if name not in _TOKENIZERS:
+                raise ValueError("unknown SEARCH_TOKENIZER {}".format(name))
+            _tokenizer = _TOKENIZERS[name]()
+        return _tokenizer
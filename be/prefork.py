@@ -0,0 +1,286 @@
+"""Pre-fork WSGI server.
+
+The master process binds the listening socket, runs the one-time setup
+and forks `workers` processes that all accept on that socket. Each worker
+serves requests from a bounded pool of `threads` threads and opens its
+own database pool after the fork (be/serve.py passes that as
+on_worker_start). Workers that die are restarted.
+
+SIGTERM or SIGINT to the master drains: every worker stops accepting,
+finishes the requests it has, closes its database pool and exits. Workers
+still busy after `graceful_timeout` seconds are killed.
+
+This module relies on Werkzeug details that are not a stable API, so
+production mode needs the exact pin in requirements.txt (Werkzeug==2.0.0):
+BaseWSGIServer's `fd` argument for the shared listening socket,
+WSGIRequestHandler.make_environ for the client socket, and the private
+`werkzeug.wsgi._RangeWrapper` to send Range responses with sendfile.
+Without _RangeWrapper, Range responses are still correct but go out chunk
+by chunk; fe/test/test_picture.py checks that it is found.
+"""
+import io
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug import wsgi as _wsgi
+from werkzeug.wsgi import FileWrapper
+
+logger = logging.getLogger(__name__)
+
+_STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+_SOCKET_KEY = "be.client_socket"
+# werkzeug 未公开的 Range 包装类；没有时 Range 响应按普通方式逐块发送
+_RangeWrapper = getattr(_wsgi, "_RangeWrapper", None)
+
+
+def _file_range(app_iter, headers):
+    """(file, offset, length) if app_iter only streams a slice of a real file."""
+    # send_file 返回 FileWrapper；Range 请求时外面再包一层 _RangeWrapper（已解析好起点）
+    offset = None
+    if _RangeWrapper is not None and isinstance(app_iter, _RangeWrapper):
+        offset = app_iter.start_byte
+        app_iter = app_iter.iterable
+    if not isinstance(app_iter, FileWrapper):
+        return None
+    length = next((v for k, v in headers if k.lower() == "content-length"), None)
+    try:
+        app_iter.file.fileno()
+        if offset is None:
+            offset = app_iter.file.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    if length is None:
+        return None
+    return app_iter.file, offset, int(length)
+
+
+def sendfile_app(app):
+    """Wrap app so file responses (whole or Range) go out with socket.sendfile.
+
+    Needs SendfileRequestHandler, which puts the client socket in the
+    environ; other responses pass through unchanged.
+    """
+
+    def wrapped(environ, start_response):
+        sock = environ.get(_SOCKET_KEY)
+        if sock is None:
+            return app(environ, start_response)
+        started = {}
+
+        def capture(status, headers, exc_info=None):
+            started["headers"] = headers
+            started["write"] = start_response(status, headers, exc_info)
+            return started["write"]
+
+        app_iter = app(environ, capture)
+        found = _file_range(app_iter, started.get("headers", ()))
+        if found is None:
+            return app_iter
+        file, offset, length = found
+        try:
+            # 写入空数据只发送状态行与响应头，正文由内核从文件直接拷贝到套接字
+            started["write"](b"")
+            if length:
+                sock.sendfile(file, offset, length)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        return []
+
+    return wrapped
+
+
+class SendfileRequestHandler(WSGIRequestHandler):
+    """Request handler that exposes the client socket to sendfile_app."""
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ[_SOCKET_KEY] = self.connection
+        return environ
+
+
+class _RequestHandler(SendfileRequestHandler):
+    # keep-alive，但空闲连接最多占住工作线程 2 秒
+    protocol_version = "HTTP/1.1"
+    timeout = 2
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        # 所有线程都在忙时不再保持连接，把线程让给排队中的新连接
+        if self.server.saturated():
+            self.close_connection = True
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """BaseWSGIServer whose requests run on a fixed-size thread pool.
+
+    A connection is only accepted while a pool thread is free. Otherwise
+    it stays in the listen backlog, where an idle sibling worker can
+    accept it.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=8, fd=None, multiprocess=False):
+        super().__init__(host, port, sendfile_app(app), handler=_RequestHandler, fd=fd)
+        self.multiprocess = multiprocess
+        self.threads = threads
+        self._slots = threading.Semaphore(threads)
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+        # 多个 worker 共享监听套接字，select 之后连接可能已被别的 worker 取走；
+        # 非阻塞 accept 此时返回而不是一直阻塞（也就收不到 shutdown）
+        self.socket.setblocking(False)
+
+    def saturated(self) -> bool:
+        return self._busy >= self.threads
+
+    def get_request(self):
+        # 没有空闲线程时不 accept；OSError 让 serve_forever 回到 select，期间仍会检查 shutdown
+        if not self._slots.acquire(timeout=0.5):
+            raise OSError("no free request thread")
+        try:
+            request = super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._busy_lock:
+            self._busy += 1
+        return request
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._busy_lock:
+                self._busy -= 1
+            self._slots.release()
+
+    def server_close(self):
+        # 先停止接受新连接，再等待已接受的请求处理完
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def bind(host: str, port: int, backlog: int = 1024) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve_worker(sock, host, app, threads, multiprocess, on_worker_start, worker_no):
+    server = PooledWSGIServer(host, sock.getsockname()[1], app, threads=threads,
+                              fd=sock.fileno(), multiprocess=multiprocess)
+
+    def drain(signum, frame):
+        # serve_forever 运行在主线程，shutdown 必须由其他线程调用
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    # 终端的 Ctrl-C 同时发给整个进程组，由主进程统一转为 SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if on_worker_start is not None:
+        on_worker_start(worker_no)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def run(app, host="127.0.0.1", port=5000, workers=2, threads=8, graceful_timeout=30.0,
+        on_worker_start=None, on_worker_exit=None):
+    """Serve app with pre-forked workers until SIGTERM/SIGINT; blocks in the master.
+
+    on_worker_start(worker_no) runs in each worker after the fork and before
+    it accepts requests; on_worker_exit(worker_no) after it has drained.
+    worker_no is stable across restarts, in range(workers).
+    """
+    sock = bind(host, port)
+    children = {}
+    stopping = threading.Event()
+
+    def spawn(worker_no):
+        # fork 期间屏蔽信号：子进程在换掉主进程的 stop 之前不能执行它
+        signal.pthread_sigmask(signal.SIG_BLOCK, _STOP_SIGNALS)
+        try:
+            pid = os.fork()
+        except BaseException:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _STOP_SIGNALS)
+            raise
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _STOP_SIGNALS)
+            code = 0
+            try:
+                _serve_worker(sock, host, app, threads, workers > 1, on_worker_start, worker_no)
+                if on_worker_exit is not None:
+                    on_worker_exit(worker_no)
+            except BaseException:
+                logger.exception(f"worker {worker_no} failed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = worker_no
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, _STOP_SIGNALS)
+
+    def kill_all():
+        for pid in list(children):
+            _kill(pid, signal.SIGKILL)
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            for pid in list(children):
+                _kill(pid, signal.SIGTERM)
+            timer = threading.Timer(graceful_timeout, kill_all)
+            timer.daemon = True
+            timer.start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker_no in range(workers):
+        spawn(worker_no)
+    logger.info(f"serving on {host}:{sock.getsockname()[1]} with {workers} workers x {threads} threads")
+
+    while children:
+        # 阻塞等待子进程退出；超时未退出的由 stop 启动的定时器 SIGKILL
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        worker_no = children.pop(pid, None)
+        if worker_no is not None and not stopping.is_set():
+            logger.error(f"worker {worker_no} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(0.5)
+            spawn(worker_no)
+    sock.close()
+
+
+def _kill(pid, sig):
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def request_stop():
+    """From inside a worker: ask the master to drain and stop all workers."""
+    _kill(os.getppid(), signal.SIGTERM)
@@ -1,22 +1,37 @@
 import logging
 import os
+import threading
 from flask import Flask
 from flask import Blueprint
-from flask import request
+from werkzeug.serving import make_server
+from be import prefork
 from be.view import auth
 from be.view import seller
 from be.view import buyer
 from be.view import search
+from be.view import debug
+from be.view import picture
 from be.model.store import init_db_connection, init_completed_event
+from be.model.store import open_db_connection, close_db_connection
+from be.model import ledger
+from be.model import search as search_model
+from be.model import picture as picture_model
 
 bp_shutdown = Blueprint("shutdown", __name__)
 
+# 开发模式下的服务器实例；多进程模式下为 None
+_server = None
+_prefork = False
+
 
 def shutdown_server():
-    func = request.environ.get("werkzeug.server.shutdown")
-    if func is None:
+    if _prefork:
+        prefork.request_stop()
+        return
+    if _server is None:
         raise RuntimeError("Not running with the Werkzeug Server")
-    func()
+    # shutdown 会等待 serve_forever 退出，不能在处理本请求的线程里同步调用
+    threading.Thread(target=_server.shutdown, daemon=True).start()
 
 
 @bp_shutdown.route("/shutdown")
@@ -25,9 +40,57 @@ def shutdown():
     return "Server shutting down..."
 
 
-def run_backend():
+def _prepare():
     init_db_connection()
-    app.run()
+    search_model.ensure_search_index()
+    picture_model.extract_existing_pictures()
+
+
+def run_backend(host="127.0.0.1", port=5000):
+    """单进程开发服务器，测试在后台线程中运行它。"""
+    global _server
+    _prepare()
+    ledger.start_folder()
+    _server = make_server(host, port, prefork.sendfile_app(app), threaded=True,
+                          request_handler=prefork.SendfileRequestHandler)
+    try:
+        _server.serve_forever()
+    finally:
+        _server.server_close()
+
+
+def _worker_start(worker_no):
+    open_db_connection()
+    # 卖家流水只需一个进程合并
+    if worker_no == 0:
+        ledger.start_folder()
+
+
+def _worker_exit(worker_no):
+    ledger.stop_folder()
+    close_db_connection()
+
+
+def run_production(host="127.0.0.1", port=5000, workers=None, threads=None):
+    """多进程服务：主进程完成建表、迁移与索引检查后 fork 出工作进程。
+
+    workers / threads 缺省取环境变量 BE_WORKERS（CPU 核数）与 BE_THREADS（8），
+    SIGTERM 后等待各进程处理完已接受的请求，最长 BE_GRACEFUL_TIMEOUT 秒（30）。
+    """
+    global _prefork
+    if debug.bp_debug.name in app.blueprints:
+        raise RuntimeError("BE_DEBUG_ENDPOINTS must not be set in production")
+    workers = workers or int(os.environ.get("BE_WORKERS", os.cpu_count() or 1))
+    threads = threads or int(os.environ.get("BE_THREADS", 8))
+    _prepare()
+    # 连接不能跨 fork 共享，工作进程各自建立连接池
+    close_db_connection()
+    _prefork = True
+    prefork.run(
+        app, host, port, workers=workers, threads=threads,
+        graceful_timeout=float(os.environ.get("BE_GRACEFUL_TIMEOUT", 30)),
+        on_worker_start=_worker_start, on_worker_exit=_worker_exit,
+    )
 
 
 app = Flask(__name__)
@@ -36,6 +99,10 @@ app.register_blueprint(auth.bp_auth)
 app.register_blueprint(seller.bp_seller)
 app.register_blueprint(buyer.bp_buyer)
 app.register_blueprint(search.bp_search)
+app.register_blueprint(picture.bp_picture)
+# /debug/* 不做鉴权（可以查任意用户的余额），只在测试与本地开发时打开
+if os.environ.get("BE_DEBUG_ENDPOINTS") == "1":
+    app.register_blueprint(debug.bp_debug)
 
 logging.basicConfig(level=logging.ERROR)
 handler = logging.StreamHandler()
@@ -45,9 +45,17 @@ def add_funds():
 @bp_buyer.route("/query_orders", methods=["GET"])
 def query_orders():
     user_id: str = request.args.get("user_id")
+    status: str = request.args.get("status")
+    start_time = request.args.get("start_time", type=int)
+    end_time = request.args.get("end_time", type=int)
+    cursor: str = request.args.get("cursor")
+    page_size = request.args.get("page_size", 50, type=int)
+    page_size = max(1, min(page_size, 500))
     b = Buyer()
-    code, message, orders = b.query_orders(user_id)
-    return jsonify({"message": message, "orders": orders}), code
+    code, message, orders, next_cursor = b.query_orders_page(
+        user_id, status, start_time, end_time, cursor, page_size
+    )
+    return jsonify({"message": message, "orders": orders, "next_cursor": next_cursor}), code
 
 
 @bp_buyer.route("/cancel_order", methods=["POST"])
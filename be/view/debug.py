@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from be.model import db_conn
 from be.model import store as model_store
+from be.model import ledger
+from be.model import search_cache
 
 bp_debug = Blueprint("debug", __name__, url_prefix="/debug")
 
@@ -15,10 +17,28 @@ def user_balance():
     user_id = request.args.get("user_id")
     if not user_id:
         return jsonify({"message": "user_id required"}), 400
-    # sqlite connection used by the app is created in be.model.store.get_db_conn()
-    conn = model_store.get_db_conn()
-    cursor = conn.execute('SELECT balance FROM "user" WHERE user_id = %s', (user_id,))
-    row = cursor.fetchone()
-    if row is None:
+    # 包含尚未并入余额的卖家流水入账
+    balance = ledger.SellerLedger().balance(user_id)
+    if balance is None:
         return jsonify({"message": "user not found"}), 404
-    return jsonify({"balance": row[0]}), 200
+    return jsonify({"balance": balance}), 200
+
+
+@bp_debug.route("/pool_stats", methods=["GET"])
+def pool_stats():
+    """Return connection pool statistics (in use, idle, waiters, wait time)."""
+    conn = model_store.get_db_conn()
+    return jsonify(conn.pool_stats()), 200
+
+
+@bp_debug.route("/ledger_check", methods=["GET"])
+def ledger_check():
+    """Verify seller ledger totals against balances and paid orders."""
+    ok, problems = ledger.SellerLedger().check_consistency()
+    return jsonify({"ok": ok, "problems": problems}), 200
+
+
+@bp_debug.route("/search_cache_stats", methods=["GET"])
+def search_cache_stats():
+    """Return search cache counters (hits, misses, evictions, size)."""
+    return jsonify(search_cache.cache.stats()), 200
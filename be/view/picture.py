@@ -0,0 +1,27 @@
+from flask import Blueprint
+from flask import jsonify
+from flask import send_file
+from be.model import picture
+
+bp_picture = Blueprint("picture", __name__, url_prefix="/picture")
+
+# 图片 id 即内容哈希，同一 id 的内容永不改变
+_MAX_AGE = 365 * 24 * 3600
+
+
+@bp_picture.route("/<picture_id>", methods=["GET"])
+def get_picture(picture_id):
+    path = picture.get_picture_store().find(picture_id)
+    if path is None:
+        return jsonify({"message": "picture not found"}), 404
+    # conditional=True 处理 If-None-Match / Range；be/prefork.py 的 sendfile_app
+    # 把文件内容（包括 Range 部分）交给 socket.sendfile 发送
+    response = send_file(
+        path,
+        mimetype=picture.guess_mimetype(path),
+        conditional=True,
+        etag=picture_id,
+        max_age=_MAX_AGE,
+    )
+    response.cache_control.immutable = True
+    return response
@@ -1,24 +1,69 @@
 from flask import Blueprint, request, jsonify
-from be.model.search import search_books
+from be.model.search import search_books_page
 
 bp_search = Blueprint("search", __name__, url_prefix="/search")
 
 
-@bp_search.route("/", methods=["GET"])
-def search():
-    q = request.args.get("q", "")
-    fields = request.args.get("fields")
+def _int_arg(args, name):
+    try:
+        return int(args[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def search_args(args) -> dict:
+    """把查询参数解析为 search_books_page 的关键字参数，be/aio 的异步视图共用。"""
+    q = args.get("q", "")
+    fields = args.get("fields")
     if fields:
         fields = [f.strip() for f in fields.split(",") if f.strip()]
-    store_id = request.args.get("store_id")
+    store_id = args.get("store_id")
     try:
-        page = int(request.args.get("page", 1))
+        page = int(args.get("page", 1))
     except Exception:
         page = 1
     try:
-        page_size = int(request.args.get("page_size", 10))
+        page_size = int(args.get("page_size", 10))
     except Exception:
         page_size = 10
 
-    code, message, results, total = search_books(q, fields=fields, store_id=store_id, page=page, page_size=page_size)
-    return jsonify({"message": message, "results": results, "total": total, "page": page, "page_size": page_size}), code
+    # 传入上一页返回的 next_cursor 时按键集翻页，page 被忽略
+    cursor = args.get("cursor") or None
+    total_mode = args.get("total")
+    if total_mode not in ("exact", "estimate", "none"):
+        total_mode = None
+
+    filters = {
+        "min_price": _int_arg(args, "min_price"),
+        "max_price": _int_arg(args, "max_price"),
+        "author": args.get("author") or None,
+        "isbn": args.get("isbn") or None,
+    }
+    tags = args.get("tags")
+    if tags:
+        filters["tags"] = [t.strip() for t in tags.split(",") if t.strip()]
+
+    return {
+        "q": q, "fields": fields, "store_id": store_id, "page": page, "page_size": page_size,
+        "cursor": cursor, "total_mode": total_mode, "filters": filters,
+    }
+
+
+def search_body(kwargs, message, results, info) -> dict:
+    return {
+        "message": message,
+        "results": results,
+        "total": info.get("total", 0),
+        "total_is_estimate": info.get("total_is_estimate", False),
+        "has_more": info.get("has_more", False),
+        "next_cursor": info.get("next_cursor"),
+        "page": kwargs["page"],
+        "page_size": kwargs["page_size"],
+    }
+
+
+@bp_search.route("/", methods=["GET"])
+def search():
+    kwargs = search_args(request.args)
+    code, message, results, info = search_books_page(**kwargs)
+    return jsonify(search_body(kwargs, message, results, info)), code
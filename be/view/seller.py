@@ -31,6 +31,36 @@ def seller_add_book():
     return jsonify({"message": message}), code
 
 
+def _ndjson_items(stream):
+    # 逐行解析，边读边入库；无法解析的行交给 Seller.add_books 记为该条失败
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+@bp_seller.route("/add_books", methods=["POST"])
+def seller_add_books():
+    if request.mimetype == "application/x-ndjson":
+        user_id: str = request.args.get("user_id")
+        store_id: str = request.args.get("store_id")
+        items = _ndjson_items(request.stream)
+    else:
+        body = request.get_json(silent=True) or {}
+        user_id: str = body.get("user_id")
+        store_id: str = body.get("store_id")
+        items = body.get("books") or []
+
+    s = seller.Seller()
+    code, message, added, failed = s.add_books(user_id, store_id, items)
+
+    return jsonify({"message": message, "added": added, "failed": failed}), code
+
+
 @bp_seller.route("/add_stock_level", methods=["POST"])
 def add_stock_level():
     user_id: str = request.json.get("user_id")
@@ -44,6 +74,21 @@ def add_stock_level():
     return jsonify({"message": message}), code
 
 
+@bp_seller.route("/add_stock_levels", methods=["POST"])
+def add_stock_levels():
+    user_id: str = request.json.get("user_id")
+    store_id: str = request.json.get("store_id")
+    books: list = request.json.get("books") or []
+
+    s = seller.Seller()
+    code, message, stock_levels, failed = s.add_stock_levels(
+        user_id, store_id,
+        [(b.get("book_id"), b.get("add_stock_level")) if isinstance(b, dict) else None for b in books],
+    )
+
+    return jsonify({"message": message, "stock_levels": stock_levels, "failed": failed}), code
+
+
 @bp_seller.route("/ship", methods=["POST"])
 def ship():
     user_id: str = request.json.get("user_id")
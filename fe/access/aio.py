@@ -0,0 +1,208 @@
+"""asyncio variants of Auth, Buyer, Seller and Search for high-concurrency load.
+
+Same methods and return values as fe/access/auth.py, buyer.py, seller.py
+and search.py, as coroutines over one shared aiohttp.ClientSession
+(optional dependency). Buyer and Seller log in with
+`await Buyer.create(...)`, or reuse a token from an existing login.
+"""
+from urllib.parse import urljoin
+
+try:
+    import aiohttp
+except ImportError:
+    raise ImportError("fe.access.aio requires the aiohttp package")
+
+from fe import conf
+from fe.access import book
+
+
+def new_session(pool_size: int = None, keep_alive: bool = None) -> aiohttp.ClientSession:
+    """ClientSession with at most pool_size connections (conf.HTTP_Pool_Size).
+
+    Must be created inside the running event loop.
+    """
+    if pool_size is None:
+        pool_size = conf.HTTP_Pool_Size
+    if keep_alive is None:
+        keep_alive = conf.HTTP_Keep_Alive
+    connector = aiohttp.TCPConnector(limit=pool_size, force_close=not keep_alive)
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def _post(session, url, json, headers=None):
+    async with session.post(url, json=json, headers=headers) as r:
+        return r.status, await r.json(content_type=None)
+
+
+async def _get(session, url, params, headers=None):
+    async with session.get(url, params=params, headers=headers) as r:
+        return r.status, await r.json(content_type=None)
+
+
+class Auth:
+    def __init__(self, url_prefix, session: aiohttp.ClientSession):
+        self.url_prefix = urljoin(url_prefix, "auth/")
+        self.session = session
+
+    async def login(self, user_id: str, password: str, terminal: str) -> (int, str):
+        json = {"user_id": user_id, "password": password, "terminal": terminal}
+        status, body = await _post(self.session, urljoin(self.url_prefix, "login"), json)
+        return status, body.get("token")
+
+    async def register(self, user_id: str, password: str) -> int:
+        json = {"user_id": user_id, "password": password}
+        status, _ = await _post(self.session, urljoin(self.url_prefix, "register"), json)
+        return status
+
+    async def password(self, user_id: str, old_password: str, new_password: str) -> int:
+        json = {"user_id": user_id, "oldPassword": old_password, "newPassword": new_password}
+        status, _ = await _post(self.session, urljoin(self.url_prefix, "password"), json)
+        return status
+
+    async def logout(self, user_id: str, token: str) -> int:
+        json = {"user_id": user_id}
+        status, _ = await _post(self.session, urljoin(self.url_prefix, "logout"), json, {"token": token})
+        return status
+
+    async def unregister(self, user_id: str, password: str) -> int:
+        json = {"user_id": user_id, "password": password}
+        status, _ = await _post(self.session, urljoin(self.url_prefix, "unregister"), json)
+        return status
+
+
+class Buyer:
+    def __init__(self, url_prefix, user_id, password, session: aiohttp.ClientSession, token: str = ""):
+        self.url_prefix = urljoin(url_prefix, "buyer/")
+        self.user_id = user_id
+        self.password = password
+        self.token = token
+        self.terminal = "my terminal"
+        self.session = session
+        self.auth = Auth(url_prefix, session)
+
+    @classmethod
+    async def create(cls, url_prefix, user_id, password, session: aiohttp.ClientSession):
+        buyer = cls(url_prefix, user_id, password, session)
+        code, buyer.token = await buyer.auth.login(user_id, password, buyer.terminal)
+        assert code == 200
+        return buyer
+
+    async def _post(self, path, json):
+        return await _post(self.session, urljoin(self.url_prefix, path), json, {"token": self.token})
+
+    async def new_order(self, store_id: str, book_id_and_count: [(str, int)]) -> (int, str):
+        books = [{"id": book_id, "count": count} for book_id, count in book_id_and_count]
+        json = {"user_id": self.user_id, "store_id": store_id, "books": books}
+        status, body = await self._post("new_order", json)
+        return status, body.get("order_id")
+
+    async def payment(self, order_id: str) -> int:
+        json = {"user_id": self.user_id, "password": self.password, "order_id": order_id}
+        status, _ = await self._post("payment", json)
+        return status
+
+    async def add_funds(self, add_value: str) -> int:
+        json = {"user_id": self.user_id, "password": self.password, "add_value": add_value}
+        status, _ = await self._post("add_funds", json)
+        return status
+
+    async def query_orders(self, status: str = None, cursor: str = None, page_size: int = 50) -> (int, list, str):
+        # aiohttp 只接受字符串类型的查询参数
+        params = {"user_id": self.user_id, "page_size": str(page_size)}
+        if status:
+            params["status"] = status
+        if cursor:
+            params["cursor"] = cursor
+        code, body = await _get(self.session, urljoin(self.url_prefix, "query_orders"), params,
+                                {"token": self.token})
+        return code, body.get("orders", []), body.get("next_cursor")
+
+    async def cancel_order(self, order_id: str) -> int:
+        status, _ = await self._post("cancel_order", {"user_id": self.user_id, "order_id": order_id})
+        return status
+
+    async def receive_order(self, order_id: str) -> int:
+        status, _ = await self._post("receive", {"user_id": self.user_id, "order_id": order_id})
+        return status
+
+
+class Seller:
+    def __init__(self, url_prefix, seller_id: str, password: str, session: aiohttp.ClientSession,
+                 token: str = ""):
+        self.url_prefix = urljoin(url_prefix, "seller/")
+        self.seller_id = seller_id
+        self.password = password
+        self.token = token
+        self.terminal = "my terminal"
+        self.session = session
+        self.auth = Auth(url_prefix, session)
+
+    @classmethod
+    async def create(cls, url_prefix, seller_id, password, session: aiohttp.ClientSession):
+        seller = cls(url_prefix, seller_id, password, session)
+        code, seller.token = await seller.auth.login(seller_id, password, seller.terminal)
+        assert code == 200
+        return seller
+
+    async def _post(self, path, json):
+        return await _post(self.session, urljoin(self.url_prefix, path), json, {"token": self.token})
+
+    async def create_store(self, store_id) -> int:
+        status, _ = await self._post("create_store", {"user_id": self.seller_id, "store_id": store_id})
+        return status
+
+    async def add_book(self, store_id: str, stock_level: int, book_info: book.Book) -> int:
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "book_info": book_info.to_dict(),
+            "stock_level": stock_level,
+        }
+        status, _ = await self._post("add_book", json)
+        return status
+
+    async def add_books(self, store_id: str, stock_level: int, books) -> (int, list):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "books": [{"book_info": b.to_dict(), "stock_level": stock_level} for b in books],
+        }
+        status, body = await self._post("add_books", json)
+        return status, body.get("failed", [])
+
+    async def add_stock_level(self, seller_id: str, store_id: str, book_id: str, add_stock_num: int) -> int:
+        json = {
+            "user_id": seller_id,
+            "store_id": store_id,
+            "book_id": book_id,
+            "add_stock_level": add_stock_num,
+        }
+        status, _ = await self._post("add_stock_level", json)
+        return status
+
+    async def add_stock_levels(self, store_id: str, deltas) -> (int, dict, list):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "books": [{"book_id": book_id, "add_stock_level": n} for book_id, n in deltas],
+        }
+        status, body = await self._post("add_stock_levels", json)
+        return status, body.get("stock_levels", {}), body.get("failed", [])
+
+    async def ship_order(self, order_id: str) -> int:
+        status, _ = await self._post("ship", {"user_id": self.seller_id, "order_id": order_id})
+        return status
+
+
+class Search:
+    def __init__(self, url_prefix, session: aiohttp.ClientSession):
+        self.url = urljoin(url_prefix, "search/")
+        self.session = session
+
+    async def search(self, q: str, store_id: str = None, page_size: int = 10, **params) -> (int, dict):
+        """GET /search/；params 为其余查询参数（fields、cursor、min_price、tags 等）。"""
+        params.update(q=q, page_size=page_size)
+        if store_id:
+            params["store_id"] = store_id
+        params = {k: v if isinstance(v, str) else str(v) for k, v in params.items()}
+        return await _get(self.session, self.url, params)
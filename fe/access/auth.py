@@ -1,21 +1,23 @@
 import requests
 from urllib.parse import urljoin
+from fe.access.client import new_session
 
 
 class Auth:
-    def __init__(self, url_prefix):
+    def __init__(self, url_prefix, session: requests.Session = None):
         self.url_prefix = urljoin(url_prefix, "auth/")
+        self.session = session if session is not None else new_session()
 
     def login(self, user_id: str, password: str, terminal: str) -> (int, str):
         json = {"user_id": user_id, "password": password, "terminal": terminal}
         url = urljoin(self.url_prefix, "login")
-        r = requests.post(url, json=json)
+        r = self.session.post(url, json=json)
         return r.status_code, r.json().get("token")
 
     def register(self, user_id: str, password: str) -> int:
         json = {"user_id": user_id, "password": password}
         url = urljoin(self.url_prefix, "register")
-        r = requests.post(url, json=json)
+        r = self.session.post(url, json=json)
         return r.status_code
 
     def password(self, user_id: str, old_password: str, new_password: str) -> int:
@@ -25,18 +27,18 @@ class Auth:
             "newPassword": new_password,
         }
         url = urljoin(self.url_prefix, "password")
-        r = requests.post(url, json=json)
+        r = self.session.post(url, json=json)
         return r.status_code
 
     def logout(self, user_id: str, token: str) -> int:
         json = {"user_id": user_id}
         headers = {"token": token}
         url = urljoin(self.url_prefix, "logout")
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
         return r.status_code
 
     def unregister(self, user_id: str, password: str) -> int:
         json = {"user_id": user_id, "password": password}
         url = urljoin(self.url_prefix, "unregister")
-        r = requests.post(url, json=json)
+        r = self.session.post(url, json=json)
         return r.status_code
@@ -2,10 +2,17 @@ import os
 import sqlite3 as sqlite
 import random
 import base64
+import threading
 import simplejson as json
 
 
 class Book:
+    __slots__ = (
+        "id", "title", "author", "publisher", "original_title", "translator",
+        "pub_year", "pages", "price", "currency_unit", "binding", "isbn",
+        "author_intro", "book_intro", "content", "tags", "pictures",
+    )
+
     id: str
     title: str
     author: str
@@ -28,6 +35,14 @@ class Book:
         self.tags = []
         self.pictures = []
 
+    def to_dict(self) -> dict:
+        """book_info 文档：只包含已赋值的字段"""
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+
+# 与 __slots__ 前 15 个字段一一对应的 SQLite 列，其后是 tags 与 picture
+_COLUMNS = Book.__slots__[:15]
+
 
 class BookDB:
     def __init__(self, large: bool = False):
@@ -38,60 +53,56 @@ class BookDB:
             self.book_db = self.db_l
         else:
             self.book_db = self.db_s
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # 只读连接在第一次使用时打开并一直复用
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite.connect(
+                    "file:{}?mode=ro".format(self.book_db), uri=True, check_same_thread=False
+                )
+            return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
     def get_book_count(self):
-        conn = sqlite.connect(self.book_db)
-        cursor = conn.execute("SELECT count(id) FROM book")
+        cursor = self._connection().execute("SELECT count(id) FROM book")
         row = cursor.fetchone()
         return row[0]
 
-    def get_book_info(self, start, size) -> [Book]:
-        books = []
-        conn = sqlite.connect(self.book_db)
-        cursor = conn.execute(
-            "SELECT id, title, author, "
-            "publisher, original_title, "
-            "translator, pub_year, pages, "
-            "price, currency_unit, binding, "
-            "isbn, author_intro, book_intro, "
-            "content, tags, picture FROM book ORDER BY id "
-            "LIMIT ? OFFSET ?",
+    def iter_books(self, start: int = 0, size: int = -1, pictures: bool = True):
+        """逐本产出 Book，不把整批结果读入内存。
+
+        size 为 -1 时读到末尾；pictures=False 时不读取图片列。
+        每本书随机附带 0~9 份封面，base64 只编码一次，各份共用同一个字符串。
+        """
+        cursor = self._connection().execute(
+            "SELECT {}, tags, {} FROM book ORDER BY id LIMIT ? OFFSET ?".format(
+                ", ".join(_COLUMNS), "picture" if pictures else "NULL"
+            ),
             (size, start),
         )
         for row in cursor:
             book = Book()
-            book.id = row[0]
-            book.title = row[1]
-            book.author = row[2]
-            book.publisher = row[3]
-            book.original_title = row[4]
-            book.translator = row[5]
-            book.pub_year = row[6]
-            book.pages = row[7]
-            book.price = row[8]
-
-            book.currency_unit = row[9]
-            book.binding = row[10]
-            book.isbn = row[11]
-            book.author_intro = row[12]
-            book.book_intro = row[13]
-            book.content = row[14]
+            for name, value in zip(_COLUMNS, row):
+                setattr(book, name, value)
             tags = row[15]
-
             picture = row[16]
 
             for tag in tags.split("\n"):
                 if tag.strip() != "":
                     book.tags.append(tag)
-            for i in range(0, random.randint(0, 9)):
-                if picture is not None:
-                    encode_str = base64.b64encode(picture).decode("utf-8")
-                    book.pictures.append(encode_str)
-            books.append(book)
-            # print(tags.decode('utf-8'))
-
-            # print(book.tags, len(book.picture))
-            # print(book)
-            # print(tags)
-
-        return books
+            copies = random.randint(0, 9)
+            if picture is not None and copies:
+                encode_str = base64.b64encode(picture).decode("utf-8")
+                book.pictures = [encode_str] * copies
+            yield book
+
+    def get_book_info(self, start, size) -> [Book]:
+        return list(self.iter_books(start, size))
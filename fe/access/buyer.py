@@ -2,16 +2,22 @@ import requests
 import simplejson
 from urllib.parse import urljoin
 from fe.access.auth import Auth
+from fe.access.client import new_session
 
 
 class Buyer:
-    def __init__(self, url_prefix, user_id, password):
+    def __init__(self, url_prefix, user_id, password, session: requests.Session = None, token: str = None):
         self.url_prefix = urljoin(url_prefix, "buyer/")
         self.user_id = user_id
         self.password = password
         self.token = ""
         self.terminal = "my terminal"
-        self.auth = Auth(url_prefix)
+        self.session = session if session is not None else new_session()
+        self.auth = Auth(url_prefix, self.session)
+        # 传入已有的 token 时不再登录：再次登录会使该用户之前的 token 失效
+        if token is not None:
+            self.token = token
+            return
         code, self.token = self.auth.login(self.user_id, self.password, self.terminal)
         assert code == 200
 
@@ -23,7 +29,7 @@ class Buyer:
         # print(simplejson.dumps(json))
         url = urljoin(self.url_prefix, "new_order")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
         response_json = r.json()
         return r.status_code, response_json.get("order_id")
 
@@ -35,7 +41,7 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "payment")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_funds(self, add_value: str) -> int:
@@ -46,5 +52,31 @@ class Buyer:
         }
         url = urljoin(self.url_prefix, "add_funds")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
+        return r.status_code
+
+    def query_orders(self, status: str = None, cursor: str = None, page_size: int = 50) -> (int, list, str):
+        params = {"user_id": self.user_id, "page_size": page_size}
+        if status:
+            params["status"] = status
+        if cursor:
+            params["cursor"] = cursor
+        url = urljoin(self.url_prefix, "query_orders")
+        headers = {"token": self.token}
+        r = self.session.get(url, headers=headers, params=params)
+        body = r.json()
+        return r.status_code, body.get("orders", []), body.get("next_cursor")
+
+    def cancel_order(self, order_id: str) -> int:
+        json = {"user_id": self.user_id, "order_id": order_id}
+        url = urljoin(self.url_prefix, "cancel_order")
+        headers = {"token": self.token}
+        r = self.session.post(url, headers=headers, json=json)
+        return r.status_code
+
+    def receive_order(self, order_id: str) -> int:
+        json = {"user_id": self.user_id, "order_id": order_id}
+        url = urljoin(self.url_prefix, "receive")
+        headers = {"token": self.token}
+        r = self.session.post(url, headers=headers, json=json)
         return r.status_code
@@ -0,0 +1,22 @@
+import requests
+from requests.adapters import HTTPAdapter
+from fe import conf
+
+
+def new_session(pool_size: int = None, keep_alive: bool = None) -> requests.Session:
+    """带连接池的 requests 会话，同一客户端的请求复用 keep-alive 连接。
+
+    pool_size / keep_alive 缺省取 conf.HTTP_Pool_Size / conf.HTTP_Keep_Alive；
+    keep_alive=False 时每个请求带 Connection: close，相当于每次新建连接。
+    """
+    if pool_size is None:
+        pool_size = conf.HTTP_Pool_Size
+    if keep_alive is None:
+        keep_alive = conf.HTTP_Keep_Alive
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
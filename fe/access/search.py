@@ -0,0 +1,17 @@
+import requests
+from urllib.parse import urljoin
+from fe.access.client import new_session
+
+
+class Search:
+    def __init__(self, url_prefix, session: requests.Session = None):
+        self.url = urljoin(url_prefix, "search/")
+        self.session = session if session is not None else new_session()
+
+    def search(self, q: str, store_id: str = None, page_size: int = 10, **params) -> (int, dict):
+        """GET /search/；params 为其余查询参数（fields、cursor、min_price、tags 等）。"""
+        params.update(q=q, page_size=page_size)
+        if store_id:
+            params["store_id"] = store_id
+        r = self.session.get(self.url, params=params)
+        return r.status_code, r.json()
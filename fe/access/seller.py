@@ -2,15 +2,22 @@ import requests
 from urllib.parse import urljoin
 from fe.access import book
 from fe.access.auth import Auth
+from fe.access.client import new_session
 
 
 class Seller:
-    def __init__(self, url_prefix, seller_id: str, password: str):
+    def __init__(self, url_prefix, seller_id: str, password: str, session: requests.Session = None,
+                 token: str = None):
         self.url_prefix = urljoin(url_prefix, "seller/")
         self.seller_id = seller_id
         self.password = password
         self.terminal = "my terminal"
-        self.auth = Auth(url_prefix)
+        self.session = session if session is not None else new_session()
+        self.auth = Auth(url_prefix, self.session)
+        # 传入已有的 token 时不再登录：再次登录会使该用户之前的 token 失效
+        if token is not None:
+            self.token = token
+            return
         code, self.token = self.auth.login(self.seller_id, self.password, self.terminal)
         assert code == 200
 
@@ -22,22 +29,34 @@ class Seller:
       
         url = urljoin(self.url_prefix, "create_store")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
         return r.status_code
 
     def add_book(self, store_id: str, stock_level: int, book_info: book.Book) -> int:
         json = {
             "user_id": self.seller_id,
             "store_id": store_id,
-            "book_info": book_info.__dict__,
+            "book_info": book_info.to_dict(),
             "stock_level": stock_level,
         }
       
         url = urljoin(self.url_prefix, "add_book")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
         return r.status_code
 
+    def add_books(self, store_id: str, stock_level: int, books) -> (int, list):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "books": [{"book_info": b.to_dict(), "stock_level": stock_level} for b in books],
+        }
+
+        url = urljoin(self.url_prefix, "add_books")
+        headers = {"token": self.token}
+        r = self.session.post(url, headers=headers, json=json)
+        return r.status_code, r.json().get("failed", [])
+
     def add_stock_level(
         self, seller_id: str, store_id: str, book_id: str, add_stock_num: int
     ) -> int:
@@ -50,5 +69,25 @@ class Seller:
    
         url = urljoin(self.url_prefix, "add_stock_level")
         headers = {"token": self.token}
-        r = requests.post(url, headers=headers, json=json)
+        r = self.session.post(url, headers=headers, json=json)
+        return r.status_code
+
+    def add_stock_levels(self, store_id: str, deltas) -> (int, dict, list):
+        json = {
+            "user_id": self.seller_id,
+            "store_id": store_id,
+            "books": [{"book_id": book_id, "add_stock_level": n} for book_id, n in deltas],
+        }
+
+        url = urljoin(self.url_prefix, "add_stock_levels")
+        headers = {"token": self.token}
+        r = self.session.post(url, headers=headers, json=json)
+        body = r.json()
+        return r.status_code, body.get("stock_levels", {}), body.get("failed", [])
+
+    def ship_order(self, order_id: str) -> int:
+        json = {"user_id": self.seller_id, "order_id": order_id}
+        url = urljoin(self.url_prefix, "ship")
+        headers = {"token": self.token}
+        r = self.session.post(url, headers=headers, json=json)
         return r.status_code
@@ -0,0 +1,185 @@
+"""Table bloat and stock-update throughput: wide store rows vs. inventory.
+
+Loads the same books into scratch tables of three layouts and runs the
+stock-decrement statement of Buyer.new_order against each from several
+threads for a fixed time:
+
+ - wide:      the old store row, book_info JSONB + search_vector (GIN
+              indexed) next to stock_level, fillfactor 100
+ - inventory: (store_id, book_id, price, stock_level), fillfactor 100
+ - inventory: the same with fillfactor 70 (the schema default)
+ - inventory: fillfactor 70 with the schema's autovacuum settings
+
+Autovacuum is disabled on the first three scratch tables so growth is
+comparable; the last one shows what autovacuum (scale factor 0.05, as set
+by be/model/store.py) reclaims during the run.
+Reported per layout: transactions per second, share of HOT updates, heap
+and index size before/after, and dead tuples left behind.
+
+    python -m fe.bench.inventory_bloat --books 500 --threads 8 --seconds 30
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from psycopg2 import extras
+
+from be.model import store as store_mod
+from be.model.search import build_search_vector
+from fe.access.book import BookDB
+
+# (布局, fillfactor, 是否按 schema 的设置开启 autovacuum)
+LAYOUTS = [("wide", 100, False), ("inventory", 100, False), ("inventory", 70, False), ("inventory", 70, True)]
+AUTOVACUUM = "autovacuum_vacuum_scale_factor = 0.05, autovacuum_analyze_scale_factor = 0.05"
+STORE_ID = "bench_hot_store"
+
+
+def _create(cursor, table, layout, fillfactor, autovacuum):
+    cursor.execute(f"DROP TABLE IF EXISTS {table};")
+    vacuum = AUTOVACUUM if autovacuum else "autovacuum_enabled = false"
+    if layout == "wide":
+        cursor.execute(
+            f"CREATE TABLE {table} ("
+            "    store_id TEXT NOT NULL, book_id TEXT NOT NULL, book_info JSONB NOT NULL,"
+            "    stock_level INTEGER DEFAULT 0, search_vector TSVECTOR,"
+            "    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY(store_id, book_id)"
+            f") WITH (fillfactor = {fillfactor}, {vacuum});"
+        )
+        cursor.execute(f"CREATE INDEX ON {table} USING GIN(search_vector);")
+    else:
+        cursor.execute(
+            f"CREATE TABLE {table} ("
+            "    store_id TEXT NOT NULL, book_id TEXT NOT NULL, price INTEGER,"
+            "    stock_level INTEGER DEFAULT 0, PRIMARY KEY(store_id, book_id)"
+            f") WITH (fillfactor = {fillfactor}, {vacuum});"
+        )
+        cursor.execute(f"CREATE INDEX ON {table}(book_id);")
+
+
+def _load(cursor, table, layout, books, stock):
+    if layout == "wide":
+        rows = [
+            (STORE_ID, b.id, json.dumps(b.to_dict()), stock, build_search_vector(b.to_dict()))
+            for b in books
+        ]
+        extras.execute_values(
+            cursor,
+            f"INSERT INTO {table} (store_id, book_id, book_info, stock_level, search_vector) VALUES %s",
+            rows,
+            template="(%s, %s, %s, %s, %s::tsvector)",
+        )
+    else:
+        rows = [(STORE_ID, b.id, b.price, stock) for b in books]
+        extras.execute_values(
+            cursor, f"INSERT INTO {table} (store_id, book_id, price, stock_level) VALUES %s", rows
+        )
+    cursor.execute(f"ANALYZE {table};")
+
+
+def _sizes(conn, table):
+    cursor = conn.execute(
+        "SELECT pg_relation_size(%s), pg_indexes_size(%s), "
+        "       COALESCE(n_tup_upd, 0), COALESCE(n_tup_hot_upd, 0), COALESCE(n_dead_tup, 0) "
+        "FROM pg_stat_user_tables WHERE relname = %s;",
+        (table, table, table),
+    )
+    row = cursor.fetchone()
+    conn.commit()
+    return row
+
+
+def _decrement(cursor, table, book_ids, counts):
+    # 与 Buyer._new_order_txn 相同的加锁顺序与扣减语句
+    cursor.execute(
+        "WITH req AS ("
+        "    SELECT * FROM unnest(%s::text[], %s::int[]) AS r(book_id, count)"
+        "), lck AS ("
+        f"    SELECT s.book_id, req.count FROM {table} s JOIN req ON s.book_id = req.book_id"
+        "    WHERE s.store_id = %s ORDER BY s.book_id FOR UPDATE OF s"
+        ") "
+        f"UPDATE {table} s SET stock_level = s.stock_level - lck.count FROM lck "
+        "WHERE s.store_id = %s AND s.book_id = lck.book_id AND s.stock_level >= lck.count",
+        (book_ids, counts, STORE_ID, STORE_ID),
+    )
+
+
+def run_layout(conn, layout, fillfactor, autovacuum, books, args):
+    table = f"bench_hot_{layout}_{fillfactor}" + ("_av" if autovacuum else "")
+    with conn.get_cursor() as cursor:
+        _create(cursor, table, layout, fillfactor, autovacuum)
+        _load(cursor, table, layout, books, 10 ** 9)
+    time.sleep(1)  # 等待统计信息刷新
+    heap_before, index_before, upd_before, hot_before, _ = _sizes(conn, table)
+
+    book_ids = [b.id for b in books]
+    done = []
+    stop = time.monotonic() + args.seconds
+
+    def worker(no):
+        rnd = random.Random(no)
+        n = 0
+        while time.monotonic() < stop:
+            basket = rnd.sample(book_ids, min(args.basket, len(book_ids)))
+            counts = [rnd.randint(1, 3) for _ in basket]
+            conn.run_in_transaction(lambda c: _decrement(c, table, basket, counts))
+            n += 1
+        done.append(n)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    time.sleep(1)
+    heap_after, index_after, upd_after, hot_after, dead = _sizes(conn, table)
+
+    if not args.keep:
+        with conn.get_cursor() as cursor:
+            cursor.execute(f"DROP TABLE {table};")
+
+    updates = upd_after - upd_before
+    return {
+        "layout": f"{layout} ff={fillfactor}" + (" av" if autovacuum else ""),
+        "tps": sum(done) / elapsed,
+        "hot_ratio": (hot_after - hot_before) / updates if updates else 0.0,
+        "heap_before": heap_before,
+        "heap_after": heap_after,
+        "index_before": index_before,
+        "index_after": index_after,
+        "dead": dead,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--basket", type=int, default=3, help="books per order")
+    parser.add_argument("--large", action="store_true", help="use book_lx.db")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch tables")
+    args = parser.parse_args()
+
+    store_mod.init_db_connection()
+    conn = store_mod.get_db_conn()
+    books = BookDB(args.large).get_book_info(0, args.books)
+
+    def mb(n):
+        return n / 1024 / 1024
+
+    print("{:<18} {:>9} {:>6} {:>19} {:>19} {:>9}".format(
+        "layout", "txn/s", "HOT", "heap MB before/after", "index MB before/after", "dead"))
+    for layout, fillfactor, autovacuum in LAYOUTS:
+        r = run_layout(conn, layout, fillfactor, autovacuum, books, args)
+        print("{:<18} {:>9.1f} {:>6.1%} {:>9.2f}/{:<9.2f} {:>9.2f}/{:<9.2f} {:>9}".format(
+            r["layout"], r["tps"], r["hot_ratio"],
+            mb(r["heap_before"]), mb(r["heap_after"]),
+            mb(r["index_before"]), mb(r["index_after"]), r["dead"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Open-loop (constant arrival rate) order benchmark.
+
+    python -m fe.bench.open_loop --rate 200 [--seconds 30] [--arrival fixed]
+    python -m fe.bench.open_loop --sweep 100,200,400,800 [--processes 4] [--json out.json]
+
+The sessions of fe/bench/run.py are closed-loop: a session sends its next
+request only after the previous response came back. An overloaded server
+therefore slows the client down, and the queueing delay never shows up in
+the measured latency (coordinated omission). Here send times are fixed up
+front at the target rate, with exponential (Poisson) or fixed gaps, and
+each order is sent on schedule whether or not earlier ones have finished.
+new_order latency is measured from the intended send time. A successful
+order is then paid, and payment is timed from when its new_order returned.
+
+--sweep runs each rate in turn and reports the knee: the highest rate
+whose p99 stays within --knee-factor times the p99 at the lowest rate and
+that still completes --min-achieved of the target throughput.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fe import conf
+from fe.bench import stats as bench_stats
+from fe.bench.stats import CONNECTION_ERROR
+from fe.bench.run import spawn
+from fe.bench.session import async_buyer
+from fe.bench.workload import Payment, Workload
+
+
+def arrivals(rate: float, seconds: float, arrival: str = "poisson", rng: random.Random = None) -> list:
+    """Intended send times, as offsets in seconds from the start."""
+    if arrival == "fixed":
+        return [i / rate for i in range(math.ceil(rate * seconds))]
+    if rng is None:
+        rng = random.Random()
+    offsets = []
+    t = rng.expovariate(rate)
+    while t < seconds:
+        offsets.append(t)
+        t += rng.expovariate(rate)
+    return offsets
+
+
+def run_open_loop(wl: Workload, rate: float, seconds: float, arrival: str = "poisson",
+                  mode: str = None, threads: int = None, ready=None) -> dict:
+    """Send orders at rate per second for seconds; returns a run_sessions-style result.
+
+    The orders are generated before ready is waited on. In thread mode at
+    most threads (conf.Open_Loop_Threads) requests are in flight, in
+    asyncio mode at most conf.HTTP_Pool_Size; requests beyond that wait,
+    and the wait counts towards their latency.
+    """
+    if mode is None:
+        mode = conf.Client_Mode
+    offsets = arrivals(rate, seconds, arrival)
+    orders = [wl.get_new_order() for _ in offsets]
+    if ready is not None:
+        ready.wait()
+
+    if mode == "asyncio":
+        all_stats, start, end, lag = asyncio.run(_run_async(orders, offsets))
+    else:
+        all_stats, start, end, lag = _run_threads(wl, orders, offsets, threads or conf.Open_Loop_Threads)
+
+    stats = bench_stats.merge(all_stats)
+    result = bench_stats.counters(stats)
+    result.update(start=start, end=end, max_send_lag=lag, stats=stats)
+    return result
+
+
+def _run_threads(wl, orders, offsets, threads):
+    local = threading.local()
+    all_stats = []
+    lock = threading.Lock()
+
+    def my_stats():
+        # 每个线程写自己的 BenchStats，只有登记时加锁
+        s = getattr(local, "stats", None)
+        if s is None:
+            s = local.stats = bench_stats.BenchStats(conf.Stat_Interval)
+            with lock:
+                all_stats.append(s)
+        return s
+
+    def transaction(order, intended):
+        # 订单在主线程生成；发送时换成本线程的 Buyer（共用登录 token），requests 会话不跨线程
+        buyer = wl.get_buyer(order.buyer.user_id, order.buyer.password)
+        try:
+            code, order_id = buyer.new_order(order.store_id, order.book_id_and_count)
+        except Exception:
+            code, order_id = CONNECTION_ERROR, None
+        sent = time.time()
+        my_stats().record("new_order", code, sent - intended, sent)
+        if code == 200:
+            try:
+                code = Payment(buyer, order_id).run()
+            except Exception:
+                code = CONNECTION_ERROR
+            after = time.time()
+            my_stats().record("payment", code, after - sent, after)
+
+    lag = 0.0
+    with ThreadPoolExecutor(threads) as pool:
+        start = time.time()
+        for order, offset in zip(orders, offsets):
+            intended = start + offset
+            delay = intended - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+            pool.submit(transaction, order, intended)
+    end = time.time()
+    return all_stats, start, end, lag
+
+
+async def _run_async(orders, offsets):
+    from fe.access import aio
+
+    stats = bench_stats.BenchStats(conf.Stat_Interval)
+    buyers = {}
+
+    async def transaction(buyer, order, intended):
+        try:
+            code, order_id = await buyer.new_order(order.store_id, order.book_id_and_count)
+        except Exception:
+            code, order_id = CONNECTION_ERROR, None
+        sent = time.time()
+        stats.record("new_order", code, sent - intended, sent)
+        if code == 200:
+            try:
+                code = await buyer.payment(order_id)
+            except Exception:
+                code = CONNECTION_ERROR
+            after = time.time()
+            stats.record("payment", code, after - sent, after)
+
+    lag = 0.0
+    tasks = []
+    async with aio.new_session() as http:
+        start = time.time()
+        for order, offset in zip(orders, offsets):
+            intended = start + offset
+            delay = intended - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+            buyer = async_buyer(buyers, order.buyer, http)
+            tasks.append(asyncio.ensure_future(transaction(buyer, order, intended)))
+        await asyncio.gather(*tasks)
+    end = time.time()
+    return [stats], start, end, lag
+
+
+def run_rate(wl: Workload, rate: float, seconds: float, arrival: str = "poisson",
+             processes: int = 1, mode: str = None, threads: int = None) -> dict:
+    """One open-loop run at rate, split evenly over processes; returns a summary point."""
+    kwargs = dict(seconds=seconds, arrival=arrival, mode=mode, threads=threads)
+    if processes <= 1:
+        result = run_open_loop(wl, rate, **kwargs)
+    else:
+        result = spawn(processes, wl, run_open_loop, rate=rate / processes, **kwargs)
+    report = result.pop("stats").report()
+    new_order = report["operations"].get("new_order", {})
+    elapsed = result["end"] - result["start"]
+    return {
+        "rate": rate,
+        "achieved": result["n_new_order_ok"] / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": new_order.get("p50_ms", 0.0),
+        "p99_ms": new_order.get("p99_ms", 0.0),
+        "max_ms": new_order.get("max_ms", 0.0),
+        "max_send_lag_ms": result["max_send_lag"] * 1000,
+        "result": result,
+        "report": report,
+    }
+
+
+def find_knee(points, knee_factor: float = 3.0, min_achieved: float = 0.95):
+    """(last good point, first bad point) of a sweep ordered by rate.
+
+    A point is good while its p99 is at most knee_factor times the p99 of
+    the first point and it achieved min_achieved of its target rate.
+    Either element is None if there is no such point.
+    """
+    if not points:
+        return None, None
+    baseline = points[0]["p99_ms"]
+    knee = None
+    for point in points:
+        if point["p99_ms"] > knee_factor * baseline or point["achieved"] < min_achieved * point["rate"]:
+            return knee, point
+        knee = point
+    return knee, None
+
+
+def format_sweep(points, knee, overload) -> str:
+    lines = ["{:>10} {:>10} {:>9} {:>9} {:>9} {:>9}".format(
+        "rate/s", "achieved", "p50 ms", "p99 ms", "max ms", "lag ms")]
+    for p in points:
+        lines.append("{:>10.1f} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+            p["rate"], p["achieved"], p["p50_ms"], p["p99_ms"], p["max_ms"], p["max_send_lag_ms"]))
+    if knee is None:
+        lines.append("knee: below the lowest rate")
+    elif overload is None:
+        lines.append("knee: not reached, {:g}/s is still sustained".format(knee["rate"]))
+    else:
+        lines.append("knee: {:g}/s (latency or throughput breaks down at {:g}/s)".format(
+            knee["rate"], overload["rate"]))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    rates = parser.add_mutually_exclusive_group(required=True)
+    rates.add_argument("--rate", type=float, help="orders per second")
+    rates.add_argument("--sweep", help="comma-separated rates, run in increasing order")
+    parser.add_argument("--seconds", type=float, default=30, help="duration of each rate")
+    parser.add_argument("--arrival", choices=("poisson", "fixed"), default="poisson")
+    parser.add_argument("--processes", type=int, default=conf.Process_Num)
+    parser.add_argument("--mode", choices=("thread", "asyncio"), default=conf.Client_Mode)
+    parser.add_argument("--threads", type=int, default=conf.Open_Loop_Threads,
+                        help="max in-flight requests per process in thread mode")
+    parser.add_argument("--knee-factor", type=float, default=3.0)
+    parser.add_argument("--min-achieved", type=float, default=0.95)
+    parser.add_argument("--json", help="write every rate's results here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    rate_list = [args.rate] if args.rate else sorted(float(r) for r in args.sweep.split(","))
+
+    wl = Workload()
+    wl.gen_database()
+    points = []
+    for rate in rate_list:
+        point = run_rate(wl, rate, args.seconds, args.arrival, args.processes, args.mode, args.threads)
+        logging.info("rate {:g}/s\n{}".format(rate, bench_stats.format_report(point["report"])))
+        points.append(point)
+
+    knee, overload = find_knee(points, args.knee_factor, args.min_achieved)
+    print(format_sweep(points, knee, overload))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"points": points, "knee": knee and knee["rate"],
+                       "overload": overload and overload["rate"]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Operations for the weighted workload profiles of conf.Workload_Profiles.
+
+Like NewOrder and Payment in fe/bench/workload.py, every operation picks
+its buyer, seller, store and books (and logs them in) in __init__, so that
+ProfileSession can generate them before it is timed. run(stats) sends the
+requests and records each one under the endpoint name used in the report;
+`endpoints` lists those names.
+"""
+import random
+import time
+import uuid
+from fe.bench.stats import BenchStats
+from fe.bench.workload import Workload
+
+
+def _timed(stats: BenchStats, op: str, call):
+    before = time.time()
+    result = call()
+    after = time.time()
+    code = result[0] if isinstance(result, tuple) else result
+    stats.record(op, code, after - before, after)
+    return result
+
+
+class Search:
+    endpoints = ("search",)
+
+    def __init__(self, wl: Workload):
+        self.searcher = wl.get_searcher()
+        # 与 fe/bench/search_bench.py 一样，取书名中随机的 1-4 个字
+        title = random.choice(wl.titles) if wl.titles else ""
+        size = min(len(title), random.randint(1, 4))
+        start = random.randint(0, len(title) - size)
+        self.q = title[start:start + size]
+        # 一半请求限定在某个店铺内搜索
+        self.store_id = random.choice(wl.store_ids) if random.random() < 0.5 else None
+
+    def run(self, stats: BenchStats):
+        _timed(stats, "search", lambda: self.searcher.search(self.q, self.store_id))
+
+
+class QueryOrders:
+    endpoints = ("query_orders",)
+
+    def __init__(self, wl: Workload):
+        self.buyer = wl.get_random_buyer()
+
+    def run(self, stats: BenchStats):
+        _timed(stats, "query_orders", lambda: self.buyer.query_orders(page_size=20))
+
+
+class AddFunds:
+    endpoints = ("add_funds",)
+
+    def __init__(self, wl: Workload):
+        self.buyer = wl.get_random_buyer()
+
+    def run(self, stats: BenchStats):
+        _timed(stats, "add_funds", lambda: self.buyer.add_funds(100000))
+
+
+class Order:
+    """new_order followed by payment."""
+
+    endpoints = ("new_order", "payment")
+
+    def __init__(self, wl: Workload):
+        self.new_order = wl.get_new_order()
+
+    def place(self, stats: BenchStats):
+        code, order_id = _timed(stats, "new_order", self.new_order.run)
+        if code != 200:
+            return None
+        code = _timed(stats, "payment", lambda: self.new_order.buyer.payment(order_id))
+        return order_id if code == 200 else None
+
+    def run(self, stats: BenchStats):
+        self.place(stats)
+
+
+class Checkout(Order):
+    """The full order lifecycle: new_order, payment, ship, receive."""
+
+    endpoints = ("new_order", "payment", "ship", "receive")
+
+    def __init__(self, wl: Workload):
+        super().__init__(wl)
+        self.seller = wl.get_seller(self.new_order.store_id)
+
+    def run(self, stats: BenchStats):
+        order_id = self.place(stats)
+        if order_id is None:
+            return
+        if _timed(stats, "ship", lambda: self.seller.ship_order(order_id)) == 200:
+            _timed(stats, "receive", lambda: self.new_order.buyer.receive_order(order_id))
+
+
+class Cancel(Order):
+    """new_order, then cancel it before payment."""
+
+    endpoints = ("new_order", "cancel_order")
+
+    def run(self, stats: BenchStats):
+        code, order_id = _timed(stats, "new_order", self.new_order.run)
+        if code == 200:
+            _timed(stats, "cancel_order", lambda: self.new_order.buyer.cancel_order(order_id))
+
+
+class Restock:
+    """A seller tops up the stock of up to 10 books in one of its stores."""
+
+    endpoints = ("add_stock_levels",)
+
+    def __init__(self, wl: Workload):
+        self.store_id = random.choice(wl.store_ids)
+        self.seller = wl.get_seller(self.store_id)
+        book_ids = wl.book_ids[self.store_id]
+        picked = random.sample(book_ids, min(len(book_ids), random.randint(1, 10)))
+        self.deltas = [(book_id, random.randint(1, 100)) for book_id in picked]
+
+    def run(self, stats: BenchStats):
+        _timed(stats, "add_stock_levels", lambda: self.seller.add_stock_levels(self.store_id, self.deltas))
+
+
+class Signup:
+    """A new user registers, logs in, changes the password, logs out and unregisters."""
+
+    endpoints = ("register", "login", "password", "logout", "unregister")
+
+    def __init__(self, wl: Workload):
+        self.auth = wl.get_auth()
+        self.user_id = "churn_{}".format(uuid.uuid4().hex)
+        self.password = "password_" + self.user_id
+        self.new_password = "new_" + self.password
+
+    def run(self, stats: BenchStats):
+        if _timed(stats, "register", lambda: self.auth.register(self.user_id, self.password)) != 200:
+            return
+        password = self.password
+        code, _ = _timed(stats, "login", lambda: self.auth.login(self.user_id, password, "bench"))
+        if code == 200 and _timed(
+            stats, "password", lambda: self.auth.password(self.user_id, password, self.new_password)
+        ) == 200:
+            password = self.new_password
+            # 改密码会换掉 token，用新密码重新登录后再登出
+            code, token = _timed(stats, "login", lambda: self.auth.login(self.user_id, password, "bench"))
+            if code == 200:
+                _timed(stats, "logout", lambda: self.auth.logout(self.user_id, token))
+        _timed(stats, "unregister", lambda: self.auth.unregister(self.user_id, password))
+
+
+class Onboard:
+    """A seller opens a new store, lists 2-10 books in one batch plus one more, and restocks it."""
+
+    endpoints = ("create_store", "add_books", "add_book", "add_stock_level")
+
+    def __init__(self, wl: Workload):
+        self.seller = wl.get_seller(random.choice(wl.store_ids))
+        self.store_id = "store_onboard_{}".format(uuid.uuid4().hex)
+        size = min(wl.row_count, random.randint(3, 11))
+        start = random.randint(0, wl.row_count - size)
+        self.books = list(wl.book_db.iter_books(start, size, pictures=False))
+        self.stock_level = random.randint(1, 100)
+
+    def run(self, stats: BenchStats):
+        if _timed(stats, "create_store", lambda: self.seller.create_store(self.store_id)) != 200:
+            return
+        *batch, last = self.books
+        _timed(stats, "add_books", lambda: self.seller.add_books(self.store_id, self.stock_level, batch))
+        if _timed(stats, "add_book", lambda: self.seller.add_book(self.store_id, self.stock_level, last)) == 200:
+            _timed(stats, "add_stock_level", lambda: self.seller.add_stock_level(
+                self.seller.seller_id, self.store_id, last.id, random.randint(1, 100)))
+
+
+# conf.Workload_Profiles 中的操作名 -> 操作
+OPERATIONS = {
+    "search": Search,
+    "query_orders": QueryOrders,
+    "add_funds": AddFunds,
+    "order": Order,
+    "checkout": Checkout,
+    "cancel": Cancel,
+    "restock": Restock,
+    "signup": Signup,
+    "onboard": Onboard,
+}
+
+
+def pick(profile: dict, k: int) -> list:
+    """k operation names drawn with the profile's weights."""
+    unknown = set(profile) - set(OPERATIONS)
+    if unknown:
+        raise ValueError("unknown workload operations: {}".format(", ".join(sorted(unknown))))
+    names = sorted(profile)
+    return random.choices(names, weights=[profile[n] for n in names], k=k)
@@ -1,22 +1,226 @@
+"""Order/payment benchmark against a running backend (conf.URL).
+
+    python -m fe.bench.run [--processes 4] [--sessions 8] [--mode asyncio] [--json out.json]
+    python -m fe.bench.run --profile browse
+    python -m fe.bench.run --sessions 1024 --mode asyncio --pool-size 1024 --requests 20
+
+The parent process loads sellers, stores, books and buyers once, then
+starts --processes worker processes. Each worker runs --sessions sessions
+(threads, or asyncio tasks with --mode asyncio) and sends its counters and
+latency histograms (fe/bench/stats.py) back to the parent, which merges
+them into per-operation percentiles, error codes and throughput per
+conf.Stat_Interval. A single Python process is GIL-bound long
+before the server is, so use several processes to saturate a multi-core
+backend from one machine.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import time
+from fe import conf
 from fe.bench.workload import Workload
-from fe.bench.session import Session
+from fe.bench.session import Session, AsyncSession, ProfileSession
+from fe.bench import stats as bench_stats
+from fe.bench.stats import COUNTERS
+
+
+def run_sessions(wl: Workload, mode: str = None, ready=None, sessions: int = None,
+                 profile: str = None, pool_size: int = None) -> dict:
+    """Run sessions (default wl.session) in this process; returns the summed counters.
+
+    With a profile name (a key of conf.Workload_Profiles) the sessions are
+    ProfileSessions in threads; otherwise the order/payment sessions.
+    ready (e.g. a multiprocessing.Barrier) is waited on after the sessions
+    generated their orders, so that setup is not timed. pool_size bounds
+    the connections of the shared aiohttp session (conf.HTTP_Pool_Size).
+    """
+    if mode is None:
+        mode = conf.Client_Mode
+    if sessions is None:
+        sessions = wl.session
+    if profile is not None:
+        sessions = [ProfileSession(wl, conf.Workload_Profiles[profile]) for _ in range(0, sessions)]
+    elif mode == "asyncio":
+        sessions = [AsyncSession(wl) for _ in range(0, sessions)]
+    else:
+        sessions = [Session(wl) for _ in range(0, sessions)]
+    if ready is not None:
+        ready.wait()
+
+    start = time.time()
+    if mode == "asyncio" and profile is None:
+        asyncio.run(_run_async(sessions, pool_size))
+    else:
+        for ss in sessions:
+            ss.start()
+        for ss in sessions:
+            ss.join()
+    end = time.time()
+
+    result = merge_results(ss.result() for ss in sessions)
+    result["start"], result["end"] = start, end
+    result["stats"] = bench_stats.merge(ss.stats for ss in sessions)
+    return result
+
+
+async def _run_async(sessions, pool_size: int = None):
+    from fe.access import aio
+
+    buyers = {}
+    async with aio.new_session(pool_size) as http:
+        await asyncio.gather(*(ss.run_async(http, buyers) for ss in sessions))
+
 
+def merge_results(results) -> dict:
+    merged = dict.fromkeys(COUNTERS, 0)
+    for r in results:
+        for k in COUNTERS:
+            merged[k] += r[k]
+        if "start" in r:
+            merged["start"] = min(merged.get("start", r["start"]), r["start"])
+            merged["end"] = max(merged.get("end", r["end"]), r["end"])
+        if "max_send_lag" in r:
+            merged["max_send_lag"] = max(merged.get("max_send_lag", 0), r["max_send_lag"])
+        if "stats" in r:
+            if "stats" not in merged:
+                merged["stats"] = bench_stats.BenchStats(r["stats"].interval)
+            merged["stats"].merge(r["stats"])
+    return merged
 
-def run_bench():
+
+def _worker(state, fn, kwargs, log_level, ready, results):
+    logging.basicConfig(level=log_level)
+    try:
+        wl = Workload()
+        wl.load_state(state)
+        results.put(fn(wl, ready=ready, **kwargs))
+    except BaseException:
+        ready.abort()
+        results.put(None)
+        raise
+
+
+def spawn(processes: int, wl: Workload, fn, **kwargs) -> dict:
+    """Run fn(workload, ready=barrier, **kwargs) in processes worker processes.
+
+    Each worker rebuilds the Workload from wl.state(); fn must be a
+    module-level function returning a run_sessions-style result, and the
+    results are merged with merge_results. Raises RuntimeError if a worker
+    fails or dies without a result (e.g. killed by the OOM killer).
+    """
+    # spawn：子进程不继承父进程的 HTTP 连接与 SQLite 句柄
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Barrier(processes)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(
+            target=_worker,
+            args=(wl.state(), fn, kwargs, logging.getLogger().level, ready, results),
+        )
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    collected = []
+    try:
+        while len(collected) < len(workers):
+            try:
+                collected.append(results.get(timeout=1))
+                continue
+            except queue.Empty:
+                pass
+            # 子进程被杀死时不会放入结果；结果在退出前已写入队列，所以没取到结果时才检查退出码
+            dead = [p for p in workers if p.exitcode not in (None, 0)]
+            if dead or all(p.exitcode is not None for p in workers):
+                raise RuntimeError("bench worker exited without a result: {}".format(
+                    ", ".join("pid {} code {}".format(p.pid, p.exitcode) for p in dead) or "all exited"))
+    except BaseException:
+        # 其余子进程可能还在屏障处等待或正在压测
+        ready.abort()
+        for p in workers:
+            if p.is_alive():
+                p.terminate()
+        raise
+    finally:
+        for p in workers:
+            p.join()
+    if any(r is None for r in collected):
+        raise RuntimeError("bench worker failed")
+    return merge_results(collected)
+
+
+def run_bench(processes: int = None, sessions: int = None, mode: str = None,
+              json_path: str = None, profile: str = None, requests: int = None,
+              pool_size: int = None) -> dict:
+    if processes is None:
+        processes = conf.Process_Num
+    if profile is None:
+        profile = conf.Workload_Profile
+    if profile is not None and (mode or conf.Client_Mode) == "asyncio":
+        raise ValueError("workload profiles run in thread mode only")
     wl = Workload()
+    if sessions is not None:
+        wl.session = sessions
+    if requests is not None:
+        wl.procedure_per_session = requests
     wl.gen_database()
 
-    sessions = []
-    for i in range(0, wl.session):
-        ss = Session(wl)
-        sessions.append(ss)
+    if processes <= 1:
+        result = run_sessions(wl, mode, profile=profile, pool_size=pool_size)
+    else:
+        result = spawn(processes, wl, run_sessions, mode=mode, sessions=wl.session, profile=profile,
+                       pool_size=pool_size)
+
+    result["processes"] = max(processes, 1)
+    result["sessions"] = wl.session
+    result["profile"] = profile
+    result["report"] = result.pop("stats").report()
+    report(result)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+def report(result: dict):
+    elapsed = result["end"] - result["start"]
+    logging.info(
+        "profile:{} processes:{} sessions/process:{} elapsed:{:.2f}s "
+        "new_order OK:{}/{} ({:.1f}/s) payment OK:{}/{} ({:.1f}/s)".format(
+            result["profile"] or "order",
+            result["processes"],
+            result["sessions"],
+            elapsed,
+            result["n_new_order_ok"],
+            result["n_new_order"],
+            result["n_new_order_ok"] / elapsed if elapsed > 0 else 0,
+            result["n_payment_ok"],
+            result["n_payment"],
+            result["n_payment_ok"] / elapsed if elapsed > 0 else 0,
+        )
+    )
+    logging.info("\n" + bench_stats.format_report(result["report"]))
+
 
-    for ss in sessions:
-        ss.start()
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=conf.Process_Num)
+    parser.add_argument("--sessions", type=int, default=conf.Session, help="sessions per process")
+    parser.add_argument("--mode", choices=("thread", "asyncio"), default=conf.Client_Mode)
+    parser.add_argument("--requests", type=int, default=conf.Request_Per_Session, help="requests per session")
+    parser.add_argument("--pool-size", type=int, default=conf.HTTP_Pool_Size,
+                        help="connections of the shared HTTP session (--mode asyncio)")
+    parser.add_argument("--json", help="write counters, latency percentiles and throughput here")
+    parser.add_argument("--profile", choices=sorted(conf.Workload_Profiles), default=conf.Workload_Profile,
+                        help="weighted mix of every endpoint (thread mode); default: orders and payments")
+    args = parser.parse_args()
 
-    for ss in sessions:
-        ss.join()
+    logging.basicConfig(level=logging.INFO)
+    run_bench(args.processes, args.sessions, args.mode, args.json, args.profile, args.requests, args.pool_size)
 
 
-# if __name__ == "__main__":
-#    run_bench()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Recall / latency benchmark for CJK book search.
+
+Queries are random 1-4 character substrings of book titles from
+fe/data/book.db. For each tokenizer the relevant set of a query is every
+title containing the substring, and recall is the share of relevant titles
+an index built with that tokenizer returns.
+
+    python -m fe.bench.search_bench [--queries 500] [--books 5000]
+    python -m fe.bench.search_bench --url http://127.0.0.1:5000/
+
+"simple" emulates the previous index (PostgreSQL's 'simple' parser, which
+keeps a whole CJK run as one word, queried as a prefix). With --url the
+queries are also sent to a running backend's /search/ (books loaded by
+the normal bench) and the share of queries that return their source book
+is reported with request latency.
+"""
+import argparse
+import bisect
+import random
+import re
+import sqlite3
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from be.model.tokenizer import BigramTokenizer, JiebaTokenizer
+from fe.access.book import BookDB
+
+_CJK_RUN_RE = re.compile("[㐀-䶿一-鿿]+")
+_SIMPLE_WORD_RE = re.compile(r"[^\W_]+")
+
+
+class SimpleParser:
+    name = "simple"
+
+    def index_tokens(self, text):
+        return _SIMPLE_WORD_RE.findall(text.lower())
+
+    def query_terms(self, text):
+        return [(w, True) for w in _SIMPLE_WORD_RE.findall(text.lower())]
+
+
+def load_titles(limit, large=False):
+    conn = sqlite3.connect(BookDB(large).book_db)
+    try:
+        cursor = conn.execute("SELECT id, title FROM book ORDER BY id LIMIT ?", (limit,))
+        return [(row[0], row[1] or "") for row in cursor]
+    finally:
+        conn.close()
+
+
+def make_queries(titles, n, rnd):
+    candidates = [(book_id, run) for book_id, title in titles for run in _CJK_RUN_RE.findall(title)]
+    queries = []
+    for _ in range(n):
+        book_id, run = rnd.choice(candidates)
+        size = rnd.randint(1, min(4, len(run)))
+        start = rnd.randint(0, len(run) - size)
+        queries.append((book_id, run[start:start + size]))
+    return queries
+
+
+def _match(doc_tokens, sorted_tokens, token, prefix):
+    if not prefix:
+        return token in doc_tokens
+    i = bisect.bisect_left(sorted_tokens, token)
+    return i < len(sorted_tokens) and sorted_tokens[i].startswith(token)
+
+
+def offline(tokenizer, titles, queries):
+    t0 = time.perf_counter()
+    index = [(book_id, title, set(tokenizer.index_tokens(title))) for book_id, title in titles]
+    index_time = time.perf_counter() - t0
+    index = [(book_id, title, tokens, sorted(tokens)) for book_id, title, tokens in index]
+
+    recalls = []
+    latencies = []
+    for _, q in queries:
+        relevant = {book_id for book_id, title, _, _ in index if q in title}
+        t0 = time.perf_counter()
+        terms = tokenizer.query_terms(q)
+        found = {
+            book_id for book_id, _, tokens, ordered in index
+            if terms and all(_match(tokens, ordered, t, p) for t, p in terms)
+        }
+        latencies.append(time.perf_counter() - t0)
+        recalls.append(len(found & relevant) / len(relevant))
+    vocab = len({t for _, _, tokens, _ in index for t in tokens})
+    return {
+        "tokenizer": tokenizer.name,
+        "recall": sum(recalls) / len(recalls),
+        "index_ms_per_title": index_time * 1000 / len(titles),
+        "query_ms_avg": sum(latencies) * 1000 / len(latencies),
+        "vocabulary": vocab,
+    }
+
+
+def online(url, queries, page_size):
+    latencies = []
+    hits = 0
+    errors = 0
+    search_url = urljoin(url, "search/")
+    with requests.Session() as s:
+        for book_id, q in queries:
+            t0 = time.perf_counter()
+            r = s.get(search_url, params={"q": q, "fields": "title", "page_size": page_size})
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+                continue
+            if any(b.get("id") == book_id for b in r.json().get("results", [])):
+                hits += 1
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "hit_rate": hits / len(queries),
+        "errors": errors,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--large", action="store_true", help="use book_lx.db")
+    parser.add_argument("--url", help="also query a running backend, e.g. http://127.0.0.1:5000/")
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    titles = load_titles(args.books, args.large)
+    queries = make_queries(titles, args.queries, random.Random(args.seed))
+    tokenizers = [SimpleParser(), BigramTokenizer()]
+    try:
+        tokenizers.append(JiebaTokenizer())
+    except ImportError:
+        pass
+
+    print("{} titles, {} queries".format(len(titles), len(queries)))
+    print("{:<8} {:>8} {:>14} {:>12} {:>10}".format("name", "recall", "index ms/doc", "query ms", "vocab"))
+    for tokenizer in tokenizers:
+        r = offline(tokenizer, titles, queries)
+        print("{tokenizer:<8} {recall:>8.3f} {index_ms_per_title:>14.4f} "
+              "{query_ms_avg:>12.3f} {vocabulary:>10}".format(**r))
+
+    if args.url:
+        r = online(args.url, queries, args.page_size)
+        print("backend  hit rate {hit_rate:.3f}  errors {errors}  "
+              "p50 {p50_ms:.1f} ms  p99 {p99_ms:.1f} ms  max {max_ms:.1f} ms".format(**r))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from fe.bench.workload import Workload
 from fe.bench.workload import NewOrder
 from fe.bench.workload import Payment
+from fe.bench.stats import BenchStats, counters, CONNECTION_ERROR
+from fe.bench import profiles
+from fe import conf
 import time
 import threading
 
@@ -18,24 +21,41 @@ class Session(threading.Thread):
         self.time_new_order = 0
         self.time_payment = 0
         self.thread = None
-        self.gen_procedure()
+        self.stats = BenchStats(conf.Stat_Interval)
+        # 本会话的买家共用一个 HTTP 会话，不与其他会话线程共享
+        with wl.scope():
+            self.gen_procedure()
 
     def gen_procedure(self):
         for i in range(0, self.workload.procedure_per_session):
             new_order = self.workload.get_new_order()
             self.new_order_request.append(new_order)
 
+    def result(self) -> dict:
+        return {
+            "n_new_order": self.new_order_i,
+            "n_new_order_ok": self.new_order_ok,
+            "n_payment": self.payment_i,
+            "n_payment_ok": self.payment_ok,
+            "time_new_order": self.time_new_order,
+            "time_payment": self.time_payment,
+        }
+
     def run(self):
         self.run_gut()
 
     def run_gut(self):
         for new_order in self.new_order_request:
             before = time.time()
-            ok, order_id = new_order.run()
+            try:
+                code, order_id = new_order.run()
+            except Exception:
+                code, order_id = CONNECTION_ERROR, None
             after = time.time()
+            self.stats.record("new_order", code, after - before, after)
             self.time_new_order = self.time_new_order + after - before
             self.new_order_i = self.new_order_i + 1
-            if ok:
+            if code == 200:
                 self.new_order_ok = self.new_order_ok + 1
                 payment = Payment(new_order.buyer, order_id)
                 self.payment_request.append(payment)
@@ -52,10 +72,94 @@ class Session(threading.Thread):
                 )
                 for payment in self.payment_request:
                     before = time.time()
-                    ok = payment.run()
+                    try:
+                        code = payment.run()
+                    except Exception:
+                        code = CONNECTION_ERROR
+                    after = time.time()
+                    self.stats.record("payment", code, after - before, after)
+                    self.time_payment = self.time_payment + after - before
+                    self.payment_i = self.payment_i + 1
+                    if code == 200:
+                        self.payment_ok = self.payment_ok + 1
+                self.payment_request = []
+
+
+def async_buyer(buyers: dict, buyer, http):
+    """fe.access.aio.Buyer for a logged-in sync Buyer, cached in buyers by user_id."""
+    from fe.access import aio
+
+    ab = buyers.get(buyer.user_id)
+    if ab is None:
+        ab = buyers[buyer.user_id] = aio.Buyer(
+            conf.URL, buyer.user_id, buyer.password, http, token=buyer.token
+        )
+    return ab
+
+
+class AsyncSession(Session):
+    """与 Session 相同的订单流程，以 asyncio 任务运行（conf.Client_Mode = "asyncio"）。
+
+    所有会话共用一个 aiohttp 会话，买家沿用同步客户端登录得到的 token。
+    """
+
+    async def run_async(self, http, buyers: dict):
+        for new_order in self.new_order_request:
+            buyer = async_buyer(buyers, new_order.buyer, http)
+            before = time.time()
+            try:
+                code, order_id = await buyer.new_order(new_order.store_id, new_order.book_id_and_count)
+            except Exception:
+                code, order_id = CONNECTION_ERROR, None
+            after = time.time()
+            self.stats.record("new_order", code, after - before, after)
+            self.time_new_order = self.time_new_order + after - before
+            self.new_order_i = self.new_order_i + 1
+            if code == 200:
+                self.new_order_ok = self.new_order_ok + 1
+                self.payment_request.append((buyer, order_id))
+            if self.new_order_i % 100 == 0 or self.new_order_i == len(
+                self.new_order_request
+            ):
+                self.workload.update_stat(
+                    self.new_order_i,
+                    self.payment_i,
+                    self.new_order_ok,
+                    self.payment_ok,
+                    self.time_new_order,
+                    self.time_payment,
+                )
+                for buyer, order_id in self.payment_request:
+                    before = time.time()
+                    try:
+                        code = await buyer.payment(order_id)
+                    except Exception:
+                        code = CONNECTION_ERROR
                     after = time.time()
+                    self.stats.record("payment", code, after - before, after)
                     self.time_payment = self.time_payment + after - before
                     self.payment_i = self.payment_i + 1
-                    if ok:
+                    if code == 200:
                         self.payment_ok = self.payment_ok + 1
                 self.payment_request = []
+
+
+class ProfileSession(threading.Thread):
+    """按 conf.Workload_Profiles 中某个场景的权重随机执行各类操作。"""
+
+    def __init__(self, wl: Workload, profile: dict):
+        threading.Thread.__init__(self)
+        self.workload = wl
+        self.stats = BenchStats(conf.Stat_Interval)
+        with wl.scope():
+            self.operations = [
+                profiles.OPERATIONS[name](wl)
+                for name in profiles.pick(profile, wl.procedure_per_session)
+            ]
+
+    def result(self) -> dict:
+        return counters(self.stats)
+
+    def run(self):
+        for operation in self.operations:
+            operation.run(self.stats)
@@ -0,0 +1,183 @@
+"""Latency histograms, throughput time series and status-code counts.
+
+Every Session owns one BenchStats and is its only writer, so recording
+takes no lock. Once the run is over, the parent merges the stats from all
+sessions and worker processes with merge(), then turns them into a JSON
+report (report()) and a human-readable summary (format_report()).
+"""
+import math
+import time
+from collections import Counter, defaultdict
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_BUCKETS = SUB_BUCKETS >> 1
+PERCENTILES = (50, 90, 99, 99.9)
+
+# 请求抛出异常（连接被拒、被重置、超时等）时记录的状态码
+CONNECTION_ERROR = 0
+
+# fe/bench/run.py 汇总的计数
+COUNTERS = (
+    "n_new_order",
+    "n_new_order_ok",
+    "n_payment",
+    "n_payment_ok",
+    "time_new_order",
+    "time_payment",
+)
+
+
+class Histogram:
+    """Log-linear histogram of latencies in integer microseconds.
+
+    Laid out like HdrHistogram with 7 sub-bucket bits. Values below 128 us
+    are exact. Above that, each power-of-two range is split into 64
+    buckets, so a reported value is at most about 1.6% above the true one.
+    Only non-empty buckets are stored.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return SUB_BUCKETS + (shift - 1) * HALF_BUCKETS + (value >> shift) - HALF_BUCKETS
+
+    @staticmethod
+    def highest(bucket: int) -> int:
+        """Largest value that falls into bucket."""
+        if bucket < SUB_BUCKETS:
+            return bucket
+        shift, sub = divmod(bucket - SUB_BUCKETS, HALF_BUCKETS)
+        return ((sub + HALF_BUCKETS + 1) << (shift + 1)) - 1
+
+    def record(self, seconds: float):
+        value = max(0, int(round(seconds * 1e6)))
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.highest(bucket), self.max)
+        return self.max
+
+
+class BenchStats:
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        # 操作名 -> 延迟直方图 / 状态码计数
+        self.latency = defaultdict(Histogram)
+        self.codes = defaultdict(Counter)
+        # 时间片编号（完成时刻 // interval）-> 操作名 -> 成功请求数
+        self.series = defaultdict(Counter)
+
+    def record(self, op: str, code: int, seconds: float, end: float = None):
+        if end is None:
+            end = time.time()
+        self.latency[op].record(seconds)
+        self.codes[op][code] += 1
+        if code == 200:
+            self.series[int(end // self.interval)][op] += 1
+
+    def merge(self, other: "BenchStats"):
+        for op, hist in other.latency.items():
+            self.latency[op].merge(hist)
+        for op, codes in other.codes.items():
+            self.codes[op].update(codes)
+        for slot, ops in other.series.items():
+            self.series[slot].update(ops)
+        return self
+
+    def report(self) -> dict:
+        operations = {}
+        for op in sorted(self.latency):
+            hist, codes = self.latency[op], self.codes[op]
+            entry = {
+                "count": hist.count,
+                "ok": codes.get(200, 0),
+                "errors": {str(code): n for code, n in sorted(codes.items()) if code != 200},
+                "mean_ms": hist.mean() / 1000,
+            }
+            for p in PERCENTILES:
+                entry["p{:g}_ms".format(p)] = hist.percentile(p) / 1000
+            entry["max_ms"] = hist.max / 1000
+            operations[op] = entry
+
+        throughput = []
+        if self.series:
+            first, last = min(self.series), max(self.series)
+            for slot in range(first, last + 1):
+                point = {"t": (slot - first) * self.interval}
+                for op, n in sorted(self.series.get(slot, {}).items()):
+                    point[op] = n / self.interval
+                throughput.append(point)
+        return {"interval": self.interval, "operations": operations, "throughput": throughput}
+
+
+def merge(stats) -> BenchStats:
+    merged = None
+    for s in stats:
+        if merged is None:
+            merged = BenchStats(s.interval)
+        merged.merge(s)
+    return merged if merged is not None else BenchStats()
+
+
+def counters(stats: BenchStats) -> dict:
+    """The COUNTERS of a run, derived from its recorded requests."""
+    result = dict.fromkeys(COUNTERS, 0)
+    for op in ("new_order", "payment"):
+        hist = stats.latency.get(op)
+        if hist is None:
+            continue
+        result["n_" + op] = hist.count
+        result["n_" + op + "_ok"] = stats.codes[op].get(200, 0)
+        result["time_" + op] = hist.total / 1e6
+    return result
+
+
+def format_report(report: dict) -> str:
+    columns = ["p{:g}".format(p) for p in PERCENTILES] + ["max"]
+    lines = ["{:<16} {:>8} {:>8} {:>9} ".format("operation", "count", "ok", "mean ms")
+             + " ".join("{:>9}".format(c) for c in columns)]
+    for op, e in report["operations"].items():
+        lines.append(
+            "{:<16} {:>8} {:>8} {:>9.2f} ".format(op, e["count"], e["ok"], e["mean_ms"])
+            + " ".join("{:>9.2f}".format(e[c + "_ms"]) for c in columns)
+        )
+    for op, e in report["operations"].items():
+        if e["errors"]:
+            lines.append("{} errors: {}".format(
+                op, ", ".join("{}x{}".format(code, n) for code, n in e["errors"].items())))
+    series = report["throughput"]
+    if series:
+        for op in report["operations"]:
+            rates = [point.get(op, 0) for point in series]
+            lines.append("{} ok/s per {:g}s: min {:.1f} mean {:.1f} max {:.1f}".format(
+                op, report["interval"], min(rates), sum(rates) / len(rates), max(rates)))
+    return "\n".join(lines)
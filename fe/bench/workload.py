@@ -1,4 +1,6 @@
+import contextlib
 import logging
+import itertools
 import uuid
 import random
 import threading
@@ -6,6 +8,10 @@ from fe.access import book
 from fe.access.new_seller import register_new_seller
 from fe.access.new_buyer import register_new_buyer
 from fe.access.buyer import Buyer
+from fe.access.seller import Seller
+from fe.access.search import Search
+from fe.access.auth import Auth
+from fe.access.client import new_session
 from fe import conf
 
 
@@ -15,9 +21,8 @@ class NewOrder:
         self.store_id = store_id
         self.book_id_and_count = book_id_and_count
 
-    def run(self) -> (bool, str):
-        code, order_id = self.buyer.new_order(self.store_id, self.book_id_and_count)
-        return code == 200, order_id
+    def run(self) -> (int, str):
+        return self.buyer.new_order(self.store_id, self.book_id_and_count)
 
 
 class Payment:
@@ -25,9 +30,23 @@ class Payment:
         self.buyer = buyer
         self.order_id = order_id
 
-    def run(self) -> bool:
-        code = self.buyer.payment(self.order_id)
-        return code == 200
+    def run(self) -> int:
+        return self.buyer.payment(self.order_id)
+
+
+class Clients:
+    """Buyers, Sellers, Search and Auth of one bench thread, on one requests.Session.
+
+    requests.Session is not thread-safe, so threads never share a Clients;
+    see Workload.clients() and Workload.scope().
+    """
+
+    def __init__(self):
+        self.http = new_session()
+        self.buyers = {}
+        self.sellers = {}
+        self.searcher = None
+        self.auth = None
 
 
 class Workload:
@@ -35,7 +54,14 @@ class Workload:
         self.uuid = str(uuid.uuid1())
         self.book_ids = {}
         self.buyer_ids = []
+        # user_id -> 登录 token；每个用户只登录一次，再次登录会使之前的 token 失效
+        self.tokens = {}
         self.store_ids = []
+        # store_id -> 卖家编号，发货、补货时用对应卖家登录
+        self.store_sellers = {}
+        # 搜索词取自已上架图书的书名
+        self.titles = []
+        self._local = threading.local()
         self.book_db = book.BookDB(conf.Use_Large_DB)
         self.row_count = self.book_db.get_book_count()
 
@@ -82,31 +108,118 @@ class Workload:
         for i in range(1, self.seller_num + 1):
             user_id, password = self.to_seller_id_and_password(i)
             seller = register_new_seller(user_id, password)
+            self.tokens[user_id] = seller.token
             for j in range(1, self.store_num_per_user + 1):
                 store_id = self.to_store_id(i, j)
                 code = seller.create_store(store_id)
                 assert code == 200
                 self.store_ids.append(store_id)
+                self.store_sellers[store_id] = i
                 self.book_ids[store_id] = []
-                row_no = 0
-
-                while row_no < self.book_num_per_store:
-                    books = self.book_db.get_book_info(row_no, self.batch_size)
+                # 流式读取，内存中最多保留一批图书
+                stream = self.book_db.iter_books(0, self.book_num_per_store)
+                while True:
+                    books = list(itertools.islice(stream, self.batch_size))
                     if len(books) == 0:
                         break
-                    for bk in books:
-                        code = seller.add_book(store_id, self.stock_level, bk)
-                        assert code == 200
-                        self.book_ids[store_id].append(bk.id)
-                    row_no = row_no + len(books)
+                    code, failed = seller.add_books(store_id, self.stock_level, books)
+                    assert code == 200 and not failed
+                    self.book_ids[store_id].extend(bk.id for bk in books)
+                    if len(self.titles) < 1000:
+                        self.titles.extend(bk.title for bk in books if bk.title)
         logging.info("seller data loaded.")
         for k in range(1, self.buyer_num + 1):
             user_id, password = self.to_buyer_id_and_password(k)
             buyer = register_new_buyer(user_id, password)
+            self.tokens[user_id] = buyer.token
             buyer.add_funds(self.user_funds)
             self.buyer_ids.append(user_id)
         logging.info("buyer data loaded.")
 
+    def state(self) -> dict:
+        # 压测进程只需要 gen_database 生成的各类 ID，不重新灌数据
+        return {
+            "uuid": self.uuid,
+            "store_ids": self.store_ids,
+            "book_ids": self.book_ids,
+            "buyer_ids": self.buyer_ids,
+            "store_sellers": self.store_sellers,
+            "titles": self.titles,
+            "tokens": self.tokens,
+            "procedure_per_session": self.procedure_per_session,
+        }
+
+    def load_state(self, state: dict):
+        self.uuid = state["uuid"]
+        self.store_ids = state["store_ids"]
+        self.book_ids = state["book_ids"]
+        self.buyer_ids = state["buyer_ids"]
+        self.store_sellers = state["store_sellers"]
+        self.titles = state["titles"]
+        self.tokens = state["tokens"]
+        self.procedure_per_session = state["procedure_per_session"]
+
+    def clients(self) -> Clients:
+        """The Clients of the calling thread, or of the innermost scope() in it."""
+        c = getattr(self._local, "clients", None)
+        if c is None:
+            c = self._local.clients = Clients()
+        return c
+
+    @contextlib.contextmanager
+    def scope(self):
+        """Use fresh Clients in this thread for the duration of the block.
+
+        Sessions generate their requests in the parent thread but run them in
+        their own thread; generating inside a scope gives every Session its
+        own HTTP session.
+        """
+        saved = getattr(self._local, "clients", None)
+        self._local.clients = Clients()
+        try:
+            yield self._local.clients
+        finally:
+            self._local.clients = saved
+
+    def get_buyer(self, buyer_id, buyer_password) -> Buyer:
+        # 同一线程内的订单复用该买家的 keep-alive 会话，token 在所有线程间共享
+        clients = self.clients()
+        b = clients.buyers.get(buyer_id)
+        if b is None:
+            with self.lock:
+                b = Buyer(conf.URL, buyer_id, buyer_password, clients.http, token=self.tokens.get(buyer_id))
+                self.tokens[buyer_id] = b.token
+            clients.buyers[buyer_id] = b
+        return b
+
+    def get_random_buyer(self) -> Buyer:
+        n = random.randint(1, self.buyer_num)
+        return self.get_buyer(*self.to_buyer_id_and_password(n))
+
+    def get_seller(self, store_id) -> Seller:
+        seller_no = self.store_sellers[store_id]
+        clients = self.clients()
+        s = clients.sellers.get(seller_no)
+        if s is None:
+            seller_id, password = self.to_seller_id_and_password(seller_no)
+            with self.lock:
+                s = Seller(conf.URL, seller_id, password, clients.http, token=self.tokens.get(seller_id))
+                self.tokens[seller_id] = s.token
+            clients.sellers[seller_no] = s
+        return s
+
+    def get_searcher(self) -> Search:
+        clients = self.clients()
+        if clients.searcher is None:
+            clients.searcher = Search(conf.URL, clients.http)
+        return clients.searcher
+
+    def get_auth(self) -> Auth:
+        clients = self.clients()
+        if clients.auth is None:
+            clients.auth = Auth(conf.URL, clients.http)
+        return clients.auth
+
     def get_new_order(self) -> NewOrder:
         n = random.randint(1, self.buyer_num)
         buyer_id, buyer_password = self.to_buyer_id_and_password(n)
@@ -124,8 +237,7 @@ class Workload:
                 book_temp.append(book_id)
                 count = random.randint(1, 10)
                 book_id_and_count.append((book_id, count))
-        b = Buyer(url_prefix=conf.URL, user_id=buyer_id, password=buyer_password)
-        new_ord = NewOrder(b, store_id, book_id_and_count)
+        new_ord = NewOrder(self.get_buyer(buyer_id, buyer_password), store_id, book_id_and_count)
         return new_ord
 
     def update_stat(
@@ -166,15 +278,16 @@ class Workload:
             # Thread_num:以新提交付款订单的数量作为并发数(这一次的TOTAL-上一次的TOTAL)
             # TOTAL:总付款提交订单数量
             # LATENCY:提交付款订单时间/处理付款订单笔数(只考虑该线程延迟，未考虑并发)
+            # 两次统计之间可能没有新订单或新付款，差值为 0 的一项不计入
+            busy = 0
+            if n_payment_diff:
+                busy = busy + self.time_payment / n_payment_diff
+            if n_new_order_diff:
+                busy = busy + self.time_new_order / n_new_order_diff
+            tps_c = int(self.n_new_order_ok / busy) if busy else 0
             logging.info(
                 "TPS_C={}, NO=OK:{} Thread_num:{} TOTAL:{} LATENCY:{} , P=OK:{} Thread_num:{} TOTAL:{} LATENCY:{}".format(
-                    int(
-                        self.n_new_order_ok
-                        / (
-                            self.time_payment / n_payment_diff
-                            + self.time_new_order / n_new_order_diff
-                        )
-                    ),  # 吞吐量:完成订单数/((付款所用时间+订单所用时间)/并发数)
+                    tps_c,  # 吞吐量:完成订单数/((付款所用时间+订单所用时间)/并发数)
                     self.n_new_order_ok,
                     n_new_order_diff,
                     self.n_new_order,
@@ -186,9 +299,9 @@ class Workload:
                     self.time_payment / self.n_payment,  # 付款延迟:(付款所用时间/并发数)/付款订单数
                 )
             )
-        self.lock.release()
         # 旧值更新为新值，便于下一轮计算
         self.n_new_order_past = self.n_new_order
         self.n_payment_past = self.n_payment
         self.n_new_order_ok_past = self.n_new_order_ok
         self.n_payment_ok_past = self.n_payment_ok
+        self.lock.release()
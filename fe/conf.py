@@ -3,9 +3,34 @@ Book_Num_Per_Store = 2000
 Store_Num_Per_User = 2
 Seller_Num = 2
 Buyer_Num = 10
+# 压测进程数；每个进程运行 Session 个会话
+Process_Num = 1
 Session = 1
 Request_Per_Session = 1000
 Default_Stock_Level = 1000000
 Default_User_Funds = 10000000
 Data_Batch_Size = 100
 Use_Large_DB = False
+# 吞吐量时间序列的统计间隔（秒）
+Stat_Interval = 1.0
+# 每个客户端的 HTTP 连接池大小；关闭 keep-alive 时每个请求新建 TCP 连接（用于对比）
+HTTP_Pool_Size = 32
+HTTP_Keep_Alive = True
+# 压测客户端：thread（每个会话一个线程）或 asyncio（fe/access/aio.py，需要 aiohttp）
+Client_Mode = "thread"
+# 开环压测（fe/bench/open_loop.py）线程模式下每个进程最多同时在途的请求数
+Open_Loop_Threads = 256
+# 压测场景（fe/bench/profiles.py）：操作 -> 权重。order 为下单并付款，checkout 为下单、付款、发货、收货，
+# cancel 为下单后取消，restock 为卖家批量补货，signup 为新用户注册到注销的全过程，onboard 为卖家开新店并上架、补货
+Workload_Profiles = {
+    "browse": {"search": 70, "query_orders": 20, "order": 5, "checkout": 3, "cancel": 2},
+    "checkout_rush": {"order": 45, "checkout": 25, "cancel": 10, "query_orders": 10, "search": 10},
+    "seller_restock": {"restock": 40, "checkout": 40, "query_orders": 10, "search": 10},
+    "onboarding": {"signup": 30, "onboard": 20, "search": 30, "order": 20},
+    "mixed": {
+        "search": 35, "query_orders": 15, "order": 15, "checkout": 10,
+        "cancel": 5, "restock": 10, "add_funds": 4, "signup": 4, "onboard": 2,
+    },
+}
+# 为 None 时运行原来的下单/付款会话
+Workload_Profile = None
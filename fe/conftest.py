@@ -1,3 +1,5 @@
+import json
+import os
 import requests
 import threading
 import time
@@ -5,9 +7,13 @@ import psycopg2
 import uuid
 import pytest
 from urllib.parse import urljoin
-from be import serve
-from be.model import store, db_conn
-from fe import conf
+
+# 测试服务打开 /debug/*；必须在导入 be.serve 之前设置
+os.environ.setdefault("BE_DEBUG_ENDPOINTS", "1")
+
+from be import serve  # noqa: E402
+from be.model import store, db_conn, search_cache  # noqa: E402
+from fe import conf  # noqa: E402
 
 thread: threading.Thread = None
 
@@ -43,6 +49,39 @@ def test_execution_lock():
         _test_execution_lock.release()
 
 
+class Seed:
+    """Rows written straight into the database by model-level tests.
+
+    pytest_runtest_setup has already emptied the tables; every call commits.
+    """
+
+    def __init__(self):
+        self.conn = store.get_db_conn()
+
+    def user(self, user_id, balance=0, password="p"):
+        self.conn.execute(
+            'INSERT INTO "user" (user_id, balance, password) VALUES (%s, %s, %s)',
+            (user_id, balance, password),
+        )
+        return self
+
+    def store(self, store_id, user_id):
+        self.conn.execute("INSERT INTO user_store (store_id, user_id) VALUES (%s, %s)", (store_id, user_id))
+        return self
+
+    def book(self, store_id, book_id, stock_level, price, **book_info):
+        # 写入 store 视图，由其触发器分别写入 book 与 inventory
+        self.conn.execute(
+            "INSERT INTO store (store_id, book_id, stock_level, book_info) VALUES (%s, %s, %s, %s)",
+            (store_id, book_id, stock_level, json.dumps(dict(book_info, price=price))),
+        )
+        return self
+
+
+@pytest.fixture
+def seed():
+    return Seed()
+
 
 def run_backend():
     serve.run_backend()
@@ -73,10 +112,12 @@ def _init_database():
     conn = store.get_db_conn()
     try:
         tables_to_clean = [
+            'seller_ledger',
             'new_order_detail',
             'new_order', 
+            'inventory',
+            'book',
             'user_store',
-            'store',
             '"user"'
         ]
         
@@ -100,17 +141,12 @@ def _init_database():
 
 def _force_reset_backend_connections():
     try:
-        # Clear all connections from the backend's connection pool
-        if hasattr(store.db_conn, 'conn_pool'):
-            for thread_id in list(store.db_conn.conn_pool.keys()):
-                try:
-                    conn = store.db_conn.conn_pool[thread_id]
-                    conn.close()
-                except:
-                    pass
-            store.db_conn.conn_pool.clear()
+        # Close idle pooled connections; checked-out ones are closed on checkin
+        store.db_conn.close_all()
     except Exception:
         pass
+    # Tests rewrite tables directly, bypassing the writes that invalidate cached searches
+    search_cache.cache.clear()
 
 
 def pytest_runtest_setup(item):
@@ -125,10 +161,12 @@ def pytest_runtest_setup(item):
         
         try:
             tables_to_clean = [
+                'seller_ledger',
                 'new_order_detail',
                 'new_order', 
+                'inventory',
+                'book',
                 'user_store',
-                'store',
                 '"user"'
             ]
             
@@ -0,0 +1,62 @@
+import json
+import uuid
+import pytest
+import requests
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access.new_seller import register_new_seller
+from fe.access import book
+
+
+class TestAddBooks:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_add_books_bulk_seller_id_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_add_books_bulk_store_id_{}".format(str(uuid.uuid1()))
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+        book_db = book.BookDB(conf.Use_Large_DB)
+        self.books = book_db.get_book_info(0, 20)
+        yield
+
+    def test_ok(self):
+        code, failed = self.seller.add_books(self.store_id, 5, self.books)
+        assert code == 200
+        assert failed == []
+        r = requests.get(urljoin(conf.URL, "search/"),
+                         params={"store_id": self.store_id, "page_size": 100})
+        assert r.json()["total"] == len(self.books)
+
+    def test_conflicts_reported_per_item(self):
+        assert self.seller.add_book(self.store_id, 0, self.books[0]) == 200
+        books = self.books[:5] + [self.books[1]]
+        code, failed = self.seller.add_books(self.store_id, 0, books)
+        assert code == 200
+        assert [(f["index"], f["code"]) for f in sorted(failed, key=lambda f: f["index"])] == [(0, 516), (5, 516)]
+        # 其余书籍已添加，再单本添加时冲突
+        assert self.seller.add_book(self.store_id, 0, self.books[2]) != 200
+
+    def test_error_non_exist_store_id(self):
+        code, _ = self.seller.add_books(self.store_id + "x", 0, self.books)
+        assert code != 200
+
+    def test_error_non_exist_user_id(self):
+        self.seller.seller_id = self.seller.seller_id + "_x"
+        code, _ = self.seller.add_books(self.store_id, 0, self.books)
+        assert code != 200
+
+    def test_ndjson_stream(self):
+        lines = [json.dumps({"book_info": b.to_dict(), "stock_level": 1}) for b in self.books[:3]]
+        lines.insert(1, "{not json")
+        lines.append(json.dumps({"book_info": {"title": "no id"}}))
+        r = requests.post(
+            urljoin(conf.URL, "seller/add_books"),
+            params={"user_id": self.seller_id, "store_id": self.store_id},
+            headers={"token": self.seller.token, "Content-Type": "application/x-ndjson"},
+            data=("\n".join(lines) + "\n").encode("utf-8"),
+        )
+        assert r.status_code == 200
+        body = r.json()
+        assert body["added"] == 3
+        assert sorted((f["index"], f["code"]) for f in body["failed"]) == [(1, 521), (4, 521)]
@@ -0,0 +1,52 @@
+import pytest
+
+from fe import conf
+from fe.access.new_seller import register_new_seller
+from fe.access import book
+import uuid
+
+
+class TestAddStockLevels:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.user_id = "test_add_stock_levels_user_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_add_stock_levels_store_{}".format(str(uuid.uuid1()))
+        self.seller = register_new_seller(self.user_id, self.user_id)
+        assert self.seller.create_store(self.store_id) == 200
+        book_db = book.BookDB(conf.Use_Large_DB)
+        self.books = book_db.get_book_info(0, 5)
+        code, failed = self.seller.add_books(self.store_id, 3, self.books)
+        assert code == 200 and not failed
+        yield
+
+    def test_ok(self):
+        deltas = [(b.id, i) for i, b in enumerate(self.books)]
+        code, stock_levels, failed = self.seller.add_stock_levels(self.store_id, deltas)
+        assert code == 200
+        assert failed == []
+        assert stock_levels == {b.id: 3 + i for i, b in enumerate(self.books)}
+
+    def test_repeated_book_ids_are_summed(self):
+        book_id = self.books[0].id
+        code, stock_levels, _ = self.seller.add_stock_levels(self.store_id, [(book_id, 5), (book_id, -1)])
+        assert code == 200
+        assert stock_levels == {book_id: 7}
+
+    def test_per_item_failures(self):
+        deltas = [(self.books[0].id, 1), (self.books[1].id + "_x", 1), (self.books[2].id, -4)]
+        code, stock_levels, failed = self.seller.add_stock_levels(self.store_id, deltas)
+        assert code == 200
+        assert stock_levels == {self.books[0].id: 4}
+        assert [(f["index"], f["code"]) for f in failed] == [(1, 515), (2, 517)]
+        # 库存不足的书未被调整
+        _, stock_levels, _ = self.seller.add_stock_levels(self.store_id, [(self.books[2].id, 0)])
+        assert stock_levels == {self.books[2].id: 3}
+
+    def test_error_non_exist_store_id(self):
+        code, _, _ = self.seller.add_stock_levels(self.store_id + "_x", [(self.books[0].id, 1)])
+        assert code != 200
+
+    def test_error_non_exist_user_id(self):
+        self.seller.seller_id = self.seller.seller_id + "_x"
+        code, _, _ = self.seller.add_stock_levels(self.store_id, [(self.books[0].id, 1)])
+        assert code != 200
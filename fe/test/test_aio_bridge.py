@@ -0,0 +1,44 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip("greenlet")
+from be.aio import bridge  # noqa: E402
+
+
+def _sync_sleep(seconds, value):
+    # 同步写法的代码，在 bridge.run 下等待事件循环上的协程
+    return bridge.await_only(asyncio.sleep(seconds, result=value))
+
+
+def test_run_returns_awaited_value():
+    assert asyncio.run(bridge.run(_sync_sleep, 0, "v")) == "v"
+
+
+def test_exceptions_reach_sync_code():
+    async def fail():
+        raise ValueError("boom")
+
+    def body():
+        try:
+            bridge.await_only(fail())
+        except ValueError as e:
+            return "caught {}".format(e)
+
+    assert asyncio.run(bridge.run(body)) == "caught boom"
+
+
+def test_calls_interleave_on_one_thread():
+    async def main():
+        return await asyncio.gather(*(bridge.run(_sync_sleep, 0.2, i) for i in range(200)))
+
+    start = time.monotonic()
+    assert asyncio.run(main()) == list(range(200))
+    assert time.monotonic() - start < 2
+
+
+def test_await_only_outside_bridge():
+    coro = asyncio.sleep(0)
+    with pytest.raises(RuntimeError):
+        bridge.await_only(coro)
+    coro.close()
@@ -0,0 +1,37 @@
+import random
+from collections import Counter
+
+import pytest
+
+from fe import conf
+from fe.bench import profiles
+
+ENDPOINTS = {
+    "register", "login", "logout", "password", "unregister",
+    "new_order", "payment", "add_funds", "query_orders", "cancel_order", "receive",
+    "create_store", "add_book", "add_books", "add_stock_level", "add_stock_levels", "ship",
+    "search",
+}
+
+
+def test_configured_profiles_use_known_operations():
+    for name, profile in conf.Workload_Profiles.items():
+        assert profile and all(w > 0 for w in profile.values()), name
+        profiles.pick(profile, 1)
+    used = set().union(*conf.Workload_Profiles.values())
+    assert used == set(profiles.OPERATIONS)
+    # 每个对外接口（debug 与图片除外）都至少出现在一个操作里
+    endpoints = set().union(*(profiles.OPERATIONS[name].endpoints for name in used))
+    assert endpoints == ENDPOINTS
+
+
+def test_pick_follows_weights():
+    random.seed(0)
+    picked = Counter(profiles.pick({"search": 3, "order": 1}, 4000))
+    assert set(picked) == {"search", "order"}
+    assert 2.5 < picked["search"] / picked["order"] < 3.5
+
+
+def test_pick_rejects_unknown_operation():
+    with pytest.raises(ValueError):
+        profiles.pick({"search": 1, "teleport": 1}, 1)
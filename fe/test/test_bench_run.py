@@ -0,0 +1,51 @@
+import os
+import time
+
+import pytest
+
+from fe.bench import run
+from fe.access.new_buyer import register_new_buyer
+from fe.bench.workload import Workload
+
+
+def _finish(wl, ready=None):
+    ready.wait()
+    return {"n_new_order": 1, "n_new_order_ok": 1, "n_payment": 0, "n_payment_ok": 0,
+            "time_new_order": 0.1, "time_payment": 0}
+
+
+def _one_dies(wl, ready=None, marker=None):
+    # 第一个创建 marker 的进程模拟被 OOM killer 杀死：不放入结果，也不中止屏障；
+    # 另一个一直等在屏障处
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return _finish(wl, ready)
+    os._exit(9)
+
+
+def test_spawn_merges_worker_results():
+    result = run.spawn(2, Workload(), _finish)
+    assert (result["n_new_order"], result["n_new_order_ok"]) == (2, 2)
+
+
+def test_spawn_fails_fast_when_a_worker_dies(tmp_path):
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        run.spawn(2, Workload(), _one_dies, marker=str(tmp_path / "died"))
+    assert time.monotonic() - start < 30
+
+
+def test_sessions_get_own_http_session_and_share_token():
+    wl = Workload()
+    buyer_id, password = wl.to_buyer_id_and_password(1)
+    register_new_buyer(buyer_id, password)
+    with wl.scope():
+        a = wl.get_buyer(buyer_id, password)
+        assert wl.get_buyer(buyer_id, password) is a
+    with wl.scope():
+        b = wl.get_buyer(buyer_id, password)
+    assert a.session is not b.session
+    # 只登录一次，两个会话的 token 都有效
+    assert a.token == b.token
+    assert (a.add_funds(1), b.add_funds(1)) == (200, 200)
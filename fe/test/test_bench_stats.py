@@ -0,0 +1,47 @@
+import json
+from fe.bench.stats import BenchStats, Histogram, format_report, merge
+
+
+def test_histogram_buckets_bound_relative_error():
+    for v in (0, 1, 127, 128, 129, 255, 256, 1000, 123456, 10 ** 8):
+        b = Histogram.bucket(v)
+        assert Histogram.highest(b) >= v
+        assert Histogram.highest(b) - v <= max(1, v // 64)
+        if b > 0:
+            assert Histogram.highest(b - 1) < v
+
+
+def test_percentiles_and_merge():
+    a, b = Histogram(), Histogram()
+    for ms in range(1, 1001):
+        (a if ms % 2 else b).record(ms / 1000)
+    a.merge(b)
+    assert a.count == 1000
+    assert abs(a.percentile(50) - 500_000) <= 500_000 / 64
+    assert abs(a.percentile(99) - 990_000) <= 990_000 / 64
+    assert a.percentile(100) == a.max == 1_000_000
+
+
+def test_session_stats_merge_into_report():
+    s1, s2 = BenchStats(interval=1.0), BenchStats(interval=1.0)
+    s1.record("new_order", 200, 0.010, end=100.2)
+    s1.record("new_order", 517, 0.002, end=100.5)
+    s2.record("new_order", 200, 0.030, end=102.1)
+    s2.record("payment", 528, 0.050, end=102.3)
+    report = merge([s1, s2]).report()
+
+    new_order = report["operations"]["new_order"]
+    assert (new_order["count"], new_order["ok"]) == (3, 2)
+    assert new_order["errors"] == {"517": 1}
+    assert report["operations"]["payment"]["errors"] == {"528": 1}
+    assert new_order["max_ms"] == 30.0
+    # 没有成功请求的时间片也保留，吞吐量为 0
+    assert [p.get("new_order", 0) for p in report["throughput"]] == [1, 0, 1]
+    json.dumps(report)
+    assert "p99.9" in format_report(report)
+
+
+def test_empty_stats():
+    report = merge([]).report()
+    assert report["operations"] == {} and report["throughput"] == []
+    format_report(report)
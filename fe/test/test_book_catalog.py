@@ -0,0 +1,100 @@
+import json
+import pytest
+from be.model.buyer import Buyer
+from be.model.seller import Seller
+from be.model import search, search_cache
+from be.model import store as model_store
+
+
+@pytest.fixture(autouse=True)
+def _stores(seed):
+    seed.user("bc_seller").user("bc_buyer", 1000)
+    for store_id in ("bc_store_1", "bc_store_2"):
+        seed.store(store_id, "bc_seller")
+
+
+def _scalar(sql, params=()):
+    conn = model_store.get_db_conn()
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def test_book_document_stored_once_across_stores():
+    seller = Seller()
+    info = {"id": "bc_book", "title": "Shared Book", "price": 30, "pictures": ["aGVsbG8="]}
+    assert seller.add_book("bc_seller", "bc_store_1", "bc_book", json.dumps(info), 5) == (200, "ok")
+    info["price"] = 40
+    assert seller.add_book("bc_seller", "bc_store_2", "bc_book", json.dumps(info), 7) == (200, "ok")
+
+    assert _scalar("SELECT count(*) FROM book WHERE book_id = %s", ("bc_book",)) == 1
+    assert _scalar("SELECT count(*) FROM inventory WHERE book_id = %s", ("bc_book",)) == 2
+    # 每个店铺保留自己的价格与库存
+    assert _scalar("SELECT price FROM inventory WHERE store_id = %s", ("bc_store_2",)) == 40
+    assert _scalar("SELECT stock_level FROM inventory WHERE store_id = %s", ("bc_store_1",)) == 5
+
+
+def test_order_uses_store_price():
+    seller = Seller()
+    info = {"id": "bc_book", "title": "Shared Book", "price": 30}
+    seller.add_book("bc_seller", "bc_store_1", "bc_book", json.dumps(info), 5)
+    info["price"] = 40
+    seller.add_book("bc_seller", "bc_store_2", "bc_book", json.dumps(info), 5)
+
+    code, _, order_id = Buyer().new_order("bc_buyer", "bc_store_2", [("bc_book", 2)])
+    assert code == 200
+    assert _scalar("SELECT total_price FROM new_order WHERE order_id = %s", (order_id,)) == 80
+    assert _scalar("SELECT stock_level FROM inventory WHERE store_id = %s", ("bc_store_2",)) == 3
+    assert _scalar("SELECT stock_level FROM inventory WHERE store_id = %s", ("bc_store_1",)) == 5
+
+
+def test_store_view_accepts_legacy_writes():
+    conn = model_store.get_db_conn()
+    conn.execute(
+        "INSERT INTO store (store_id, book_id, stock_level, book_info) VALUES (%s, %s, %s, %s)",
+        ("bc_store_1", "bc_legacy", 3, json.dumps({"title": "Legacy", "price": 12})),
+    )
+    conn.execute("UPDATE store SET stock_level = 9 WHERE store_id = %s AND book_id = %s", ("bc_store_1", "bc_legacy"))
+    conn.commit()
+    assert _scalar("SELECT price FROM inventory WHERE book_id = %s", ("bc_legacy",)) == 12
+    assert _scalar("SELECT stock_level FROM store WHERE book_id = %s", ("bc_legacy",)) == 9
+    assert _scalar("SELECT book_info->>'title' FROM store WHERE book_id = %s", ("bc_legacy",)) == "Legacy"
+
+    conn.execute("DELETE FROM store WHERE book_id = %s", ("bc_legacy",))
+    conn.commit()
+    assert _scalar("SELECT count(*) FROM inventory WHERE book_id = %s", ("bc_legacy",)) == 0
+
+
+def test_sql_written_books_indexed_with_tokenizer():
+    conn = model_store.get_db_conn()
+    conn.execute(
+        "INSERT INTO store (store_id, book_id, stock_level, book_info) VALUES (%s, %s, %s, %s)",
+        ("bc_store_1", "bc_sql", 1, json.dumps({"title": "美丽心灵", "price": 12})),
+    )
+    conn.commit()
+    # 触发器只标记待补建，不生成向量
+    assert _scalar("SELECT search_vector IS NULL FROM book WHERE book_id = %s", ("bc_sql",))
+
+    search.ensure_search_index()
+    code, _, results, total = search.search_books("心灵", store_id="bc_store_1")
+    assert (code, total) == (200, 1)
+
+    conn.execute("UPDATE book SET book_info = book_info || %s WHERE book_id = %s",
+                 (json.dumps({"title": "数学之美"}), "bc_sql"))
+    conn.commit()
+    assert _scalar("SELECT search_vector IS NULL FROM book WHERE book_id = %s", ("bc_sql",))
+    search.ensure_search_index()
+    # 直接写 SQL 不会使搜索缓存失效
+    search_cache.cache.clear()
+    assert search.search_books("数学", store_id="bc_store_1")[3] == 1
+    assert search.search_books("心灵", store_id="bc_store_1")[3] == 0
+
+
+def test_typed_columns_derived_from_book_info():
+    seller = Seller()
+    info = {"id": "bc_typed", "title": "Typed", "author": "A. Writer", "isbn": "978-7-111",
+            "pub_year": "2008-1", "tags": ["小说", "经典"], "price": 25}
+    assert seller.add_book("bc_seller", "bc_store_1", "bc_typed", json.dumps(info), 1) == (200, "ok")
+    conn = model_store.get_db_conn()
+    row = conn.execute(
+        "SELECT title, author, isbn, pub_year, tags FROM book WHERE book_id = %s", ("bc_typed",)
+    ).fetchone()
+    assert tuple(row) == ("Typed", "A. Writer", "978-7-111", 2008, ["小说", "经典"])
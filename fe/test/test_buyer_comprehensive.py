@@ -5,6 +5,7 @@ import uuid
 from be.model.buyer import Buyer
 from be.model.seller import Seller
 from be.model import store as model_store
+from be.model import pagination
 
 
 def setup_function(fn):
@@ -443,3 +444,60 @@ class TestAutoCancelUnpaid:
         # Verify order was deleted
         cursor = conn.execute("SELECT order_id FROM new_order WHERE order_id = %s", ("old_order",))
         assert cursor.fetchone() is None
+
+
+class TestQueryOrdersPagination:
+
+    def _insert_orders(self, n):
+        conn = model_store.get_db_conn()
+        conn.execute("INSERT INTO \"user\" (user_id, balance, password) VALUES (%s, %s, %s)",
+                     ("page_buyer", 1000, "p"))
+        for i in range(n):
+            conn.execute("INSERT INTO new_order (order_id, store_id, user_id, status, create_time) VALUES (%s, %s, %s, %s, %s)",
+                         (f"page_order_{i:02d}", "store_p", "page_buyer", "paid" if i % 2 else "created", 1000 + i))
+            conn.execute("INSERT INTO new_order_detail (order_id, book_id, count, price) VALUES (%s, %s, %s, %s)",
+                         (f"page_order_{i:02d}", "book_a", 1, 10))
+            conn.execute("INSERT INTO new_order_detail (order_id, book_id, count, price) VALUES (%s, %s, %s, %s)",
+                         (f"page_order_{i:02d}", "book_b", 2, 20))
+        conn.commit()
+
+    def test_keyset_pages_cover_all_orders(self):
+        self._insert_orders(7)
+        buyer = Buyer()
+        seen = []
+        cursor = None
+        while True:
+            code, msg, orders, cursor = buyer.query_orders_page("page_buyer", cursor=cursor, limit=3)
+            assert code == 200
+            seen.extend(o["order_id"] for o in orders)
+            if cursor is None:
+                break
+        assert seen == [f"page_order_{i:02d}" for i in range(6, -1, -1)]
+
+    def test_details_loaded_in_same_query(self):
+        self._insert_orders(1)
+        code, msg, orders = Buyer().query_orders("page_buyer")
+        assert code == 200
+        assert orders[0]["details"] == [
+            {"book_id": "book_a", "count": 1, "price": 10},
+            {"book_id": "book_b", "count": 2, "price": 20},
+        ]
+
+    def test_status_and_time_filters(self):
+        self._insert_orders(6)
+        code, msg, orders = Buyer().query_orders("page_buyer", status="paid", start_time=1002, end_time=1005)
+        assert code == 200
+        assert [o["order_id"] for o in orders] == ["page_order_03"]
+
+    def test_invalid_cursor(self):
+        code, msg, orders, cursor = Buyer().query_orders_page("page_buyer", cursor="not-a-cursor", limit=3)
+        assert code == 520
+
+    @pytest.mark.parametrize("key", [[1, {}], ["x", 5], [True, "a"], [1, "a", "b"], [1e300, "a"], [1, "a\x00"]])
+    def test_forged_cursor(self, key):
+        self._insert_orders(3)
+        code, msg, orders, cursor = Buyer().query_orders_page(
+            "page_buyer", cursor=pagination.encode_cursor(key), limit=3
+        )
+        assert code == 520
+        assert orders == []
@@ -0,0 +1,58 @@
+import sqlite3
+import pytest
+from be.model import catalog_import
+from be.model import store as model_store
+
+COLUMNS = ", ".join(catalog_import.COLUMNS)
+
+
+def _scalar(sql, params=None):
+    return model_store.get_db_conn().execute(sql, params).fetchone()[0]
+
+
+def _make_db(path, n):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE book (id TEXT PRIMARY KEY, title TEXT, author TEXT, publisher TEXT, "
+        "original_title TEXT, translator TEXT, pub_year TEXT, pages INTEGER, price INTEGER, "
+        "currency_unit TEXT, binding TEXT, isbn TEXT, author_intro TEXT, book_intro TEXT, "
+        "content TEXT, tags TEXT, picture BLOB)"
+    )
+    for i in range(n):
+        conn.execute(
+            "INSERT INTO book (id, title, author, price, tags, picture) VALUES (?, ?, ?, ?, ?, ?)",
+            ("ci_book_{:03d}".format(i), "导入测试 {}".format(i), "Importer", 100 + i,
+             "小说\n\n经典\n", b"\x89PNG\r\n\x1a\n" + bytes([i]) if i % 2 else None),
+        )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(autouse=True)
+def _store(seed):
+    seed.user("ci_seller").store("ci_store", "ci_seller")
+
+
+def test_import_into_catalog_and_store(tmp_path):
+    path = str(tmp_path / "books.db")
+    _make_db(path, 25)
+    result = catalog_import.import_catalog(path, workers=2, connections=2, batch_size=4,
+                                           store_id="ci_store", stock_level=7, restart=True)
+    assert (result["rows"], result["inserted"], result["last_id"]) == (25, 25, "ci_book_024")
+    assert _scalar("SELECT count(*) FROM book WHERE book_id LIKE 'ci_book_%'") == 25
+    assert _scalar("SELECT sum(stock_level) FROM inventory WHERE store_id = 'ci_store'") == 25 * 7
+    assert _scalar("SELECT tags FROM book WHERE book_id = 'ci_book_003'") == ["小说", "经典"]
+    assert len(_scalar("SELECT book_info->'pictures'->>0 FROM book WHERE book_id = 'ci_book_003'")) == 64
+    assert _scalar("SELECT search_vector IS NOT NULL FROM book WHERE book_id = 'ci_book_000'")
+
+
+def test_import_resumes_after_saved_progress(tmp_path):
+    path = str(tmp_path / "books.db")
+    _make_db(path, 10)
+    first = catalog_import.import_catalog(path, workers=1, connections=1, batch_size=3, restart=True, limit=4)
+    assert (first["rows"], first["last_id"]) == (4, "ci_book_003")
+
+    second = catalog_import.import_catalog(path, workers=1, connections=1, batch_size=3)
+    assert (second["rows"], second["inserted"]) == (6, 6)
+    assert _scalar("SELECT count(*) FROM book WHERE book_id LIKE 'ci_book_%'") == 10
+    assert _scalar("SELECT imported FROM catalog_import WHERE source = %s", (path,)) == 10
@@ -0,0 +1,87 @@
+import random
+import threading
+import pytest
+from be.model.buyer import Buyer
+from be.model import store as model_store
+
+BOOK_NUM = 8
+INITIAL_STOCK = 100000
+THREAD_NUM = 12
+ORDERS_PER_THREAD = 25
+
+
+@pytest.fixture(autouse=True)
+def _store(seed):
+    seed.user("cc_seller").store("cc_store", "cc_seller")
+    for i in range(THREAD_NUM):
+        seed.user(f"cc_buyer_{i}")
+    for i in range(BOOK_NUM):
+        seed.book("cc_store", f"cc_book_{i}", INITIAL_STOCK, 1)
+
+
+def _total_stock():
+    conn = model_store.get_db_conn()
+    cursor = conn.execute("SELECT SUM(stock_level) FROM store WHERE store_id = %s", ("cc_store",))
+    return cursor.fetchone()[0]
+
+
+def test_overlapping_baskets_do_not_deadlock():
+    codes = []
+    ordered = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREAD_NUM)
+
+    def worker(no):
+        rnd = random.Random(no)
+        buyer = Buyer()
+        user_id = f"cc_buyer_{no}"
+        start.wait()
+        for _ in range(ORDERS_PER_THREAD):
+            # every basket overlaps with the others, in a shuffled order
+            books = [f"cc_book_{i}" for i in range(BOOK_NUM)]
+            rnd.shuffle(books)
+            basket = [(b, rnd.randint(1, 3)) for b in books[: rnd.randint(BOOK_NUM // 2, BOOK_NUM)]]
+            code, msg, order_id = buyer.new_order(user_id, "cc_store", basket)
+            kept = code == 200
+            if kept and rnd.random() < 0.3:
+                cancel_code, _ = buyer.cancel_order(user_id, order_id)
+                with lock:
+                    codes.append(cancel_code)
+                kept = cancel_code != 200
+            with lock:
+                codes.append(code)
+                if kept:
+                    ordered.append(sum(c for _, c in basket))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREAD_NUM)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert 528 not in codes
+    assert set(codes) == {200}
+    assert _total_stock() == BOOK_NUM * INITIAL_STOCK - sum(ordered)
+
+
+def test_auto_cancel_concurrent_with_new_orders():
+    buyer = Buyer()
+    for i in range(20):
+        code, _, _ = buyer.new_order("cc_buyer_0", "cc_store", [(f"cc_book_{i % BOOK_NUM}", 1), ("cc_book_0", 1)])
+        assert code == 200
+    codes = []
+
+    def ordering():
+        b = Buyer()
+        for i in range(20):
+            books = [f"cc_book_{(i + k) % BOOK_NUM}" for k in range(BOOK_NUM - 1, -1, -1)]
+            code, _, _ = b.new_order("cc_buyer_1", "cc_store", [(bk, 1) for bk in books])
+            codes.append(code)
+
+    t = threading.Thread(target=ordering)
+    t.start()
+    code, msg, cancelled = Buyer().auto_cancel_unpaid(-1)
+    t.join()
+    assert code == 200
+    assert cancelled >= 20
+    assert 528 not in codes
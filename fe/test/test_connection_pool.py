@@ -0,0 +1,120 @@
+import threading
+import pytest
+from be.model import store as model_store
+
+
+def make_pool(**kwargs):
+    conn = model_store.get_db_conn()
+    return model_store.ConnectionPool(conn._connect, **kwargs)
+
+
+class TestConnectionPool:
+    def test_checkout_checkin_reuses_connection(self):
+        pool = make_pool(min_size=0, max_size=2)
+        try:
+            c1 = pool.getconn()
+            pool.putconn(c1)
+            c2 = pool.getconn()
+            assert c2 is c1
+            pool.putconn(c2)
+            stats = pool.stats()
+            assert stats["created"] == 1
+            assert stats["checkouts"] == 2
+            assert stats["in_use"] == 0
+            assert stats["idle"] == 1
+        finally:
+            pool.close()
+
+    def test_exhausted_pool_times_out(self):
+        pool = make_pool(min_size=0, max_size=1, timeout=0.2)
+        try:
+            c1 = pool.getconn()
+            with pytest.raises(model_store.PoolTimeout):
+                pool.getconn()
+            assert pool.stats()["timeouts"] == 1
+            pool.putconn(c1)
+        finally:
+            pool.close()
+
+    def test_waiter_gets_returned_connection(self):
+        pool = make_pool(min_size=0, max_size=1, timeout=5)
+        try:
+            c1 = pool.getconn()
+            got = []
+
+            def waiter():
+                got.append(pool.getconn())
+
+            t = threading.Thread(target=waiter)
+            t.start()
+            threading.Event().wait(0.1)
+            pool.putconn(c1)
+            t.join(timeout=5)
+            assert got == [c1]
+            stats = pool.stats()
+            assert stats["wait_count"] == 1
+            assert stats["wait_time_total"] > 0
+            pool.putconn(got[0])
+        finally:
+            pool.close()
+
+    def test_dead_connection_is_replaced(self):
+        pool = make_pool(min_size=0, max_size=1, probe_interval=0)
+        try:
+            c1 = pool.getconn()
+            pool.putconn(c1)
+            c1.close()
+            c2 = pool.getconn()
+            assert c2 is not c1
+            assert not c2.closed
+            pool.putconn(c2)
+            assert pool.stats()["discarded"] == 1
+        finally:
+            pool.close()
+
+    def test_reap_keeps_min_size(self):
+        pool = make_pool(min_size=1, max_size=3, idle_timeout=0)
+        try:
+            conns = [pool.getconn() for _ in range(3)]
+            for c in conns:
+                pool.putconn(c)
+            assert pool.reap() == 2
+            stats = pool.stats()
+            assert stats["size"] == 1
+            assert stats["reaped"] == 2
+        finally:
+            pool.close()
+
+    def test_uncommitted_transaction_rolled_back_on_checkin(self):
+        pool = make_pool(min_size=0, max_size=1)
+        try:
+            c1 = pool.getconn()
+            cursor = c1.cursor()
+            cursor.execute("SELECT 1")
+            pool.putconn(c1)
+            c2 = pool.getconn()
+            assert c2.get_transaction_status() == 0
+            pool.putconn(c2)
+        finally:
+            pool.close()
+
+    def test_many_threads_stay_within_max_size(self):
+        conn = model_store.get_db_conn()
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(5):
+                    conn.execute("SELECT 1").fetchone()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+        stats = conn.pool_stats()
+        assert stats["size"] <= stats["max_size"]
+        assert stats["in_use"] == 0
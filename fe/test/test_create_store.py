@@ -20,3 +20,16 @@ class TestCreateStore:
         code = self.seller.create_store(self.store_id)
         assert code == 200
 
+    def test_error_exist_store_id(self):
+        self.seller = register_new_seller(self.user_id, self.password)
+        assert self.seller.create_store(self.store_id) == 200
+        assert self.seller.create_store(self.store_id) == 514
+
+    def test_concurrent_create_same_store(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from be.model.seller import Seller
+
+        register_new_seller(self.user_id, self.password)
+        with ThreadPoolExecutor(8) as pool:
+            codes = list(pool.map(lambda _: Seller().create_store(self.user_id, self.store_id)[0], range(8)))
+        assert sorted(codes) == [200] + [514] * 7
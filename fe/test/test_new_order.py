@@ -0,0 +1,69 @@
+import pytest
+from be.model.buyer import Buyer
+from be.model import store as model_store
+
+
+@pytest.fixture(autouse=True)
+def _store(seed):
+    seed.user("no_buyer", 10000).user("no_seller").store("no_store", "no_seller")
+
+
+def _prepare_store(seed, books):
+    for book_id, price, stock_level in books:
+        seed.book("no_store", book_id, stock_level, price, id=book_id)
+
+
+def _stock(book_id):
+    conn = model_store.get_db_conn()
+    cursor = conn.execute(
+        "SELECT stock_level FROM store WHERE store_id = %s AND book_id = %s", ("no_store", book_id)
+    )
+    return cursor.fetchone()[0]
+
+
+def _details(order_id):
+    conn = model_store.get_db_conn()
+    cursor = conn.execute(
+        "SELECT book_id, count, price FROM new_order_detail WHERE order_id = %s ORDER BY book_id",
+        (order_id,),
+    )
+    return [tuple(r) for r in cursor.fetchall()]
+
+
+class TestSetBasedNewOrder:
+    def test_multi_line_order(self, seed):
+        _prepare_store(seed, [("b1", 10, 5), ("b2", 20, 5), ("b3", 30, 5)])
+        code, msg, order_id = Buyer().new_order("no_buyer", "no_store", [("b1", 1), ("b2", 2), ("b3", 3)])
+        assert code == 200
+        assert _details(order_id) == [("b1", 1, 10), ("b2", 2, 20), ("b3", 3, 30)]
+        assert (_stock("b1"), _stock("b2"), _stock("b3")) == (4, 3, 2)
+
+    def test_low_stock_line_leaves_other_lines_untouched(self, seed):
+        _prepare_store(seed, [("b1", 10, 5), ("b2", 20, 1)])
+        code, msg, order_id = Buyer().new_order("no_buyer", "no_store", [("b1", 2), ("b2", 2)])
+        assert code == 517
+        assert order_id == ""
+        assert (_stock("b1"), _stock("b2")) == (5, 1)
+
+    def test_missing_book_reported_in_request_order(self, seed):
+        _prepare_store(seed, [("b1", 10, 5)])
+        code, msg, order_id = Buyer().new_order("no_buyer", "no_store", [("b1", 9), ("missing", 1)])
+        assert code == 517
+        code, msg, order_id = Buyer().new_order("no_buyer", "no_store", [("missing", 1), ("b1", 9)])
+        assert code == 515
+        assert _stock("b1") == 5
+
+    def test_duplicate_lines_are_merged(self, seed):
+        _prepare_store(seed, [("b1", 10, 5)])
+        code, msg, order_id = Buyer().new_order("no_buyer", "no_store", [("b1", 1), ("b1", 2)])
+        assert code == 200
+        assert _details(order_id) == [("b1", 3, 10)]
+        assert _stock("b1") == 2
+
+    def test_total_and_seller_recorded_on_order(self, seed):
+        _prepare_store(seed, [("b1", 10, 5), ("b2", 20, 5)])
+        code, msg, order_id = Buyer().new_order("no_buyer", "no_store", [("b1", 2), ("b2", 1)])
+        assert code == 200
+        conn = model_store.get_db_conn()
+        cursor = conn.execute("SELECT total_price, seller_id FROM new_order WHERE order_id = %s", (order_id,))
+        assert tuple(cursor.fetchone()) == (40, "no_seller")
@@ -0,0 +1,36 @@
+import random
+from fe.bench.open_loop import arrivals, find_knee
+
+
+def test_fixed_arrivals_are_evenly_spaced():
+    offsets = arrivals(10, 1, "fixed")
+    assert len(offsets) == 10 and offsets[0] == 0
+    assert all(abs(b - a - 0.1) < 1e-9 for a, b in zip(offsets, offsets[1:]))
+
+
+def test_poisson_arrivals_match_rate():
+    offsets = arrivals(1000, 10, "poisson", random.Random(1))
+    assert 9500 < len(offsets) < 10500
+    assert offsets == sorted(offsets) and offsets[-1] < 10
+
+
+def _point(rate, achieved, p99):
+    return {"rate": rate, "achieved": achieved, "p99_ms": p99}
+
+
+def test_knee_is_last_rate_before_latency_or_throughput_breaks():
+    points = [_point(100, 100, 5), _point(200, 199, 6), _point(400, 398, 9), _point(800, 600, 40)]
+    knee, overload = find_knee(points)
+    assert (knee["rate"], overload["rate"]) == (400, 800)
+
+    points[2]["p99_ms"] = 16
+    knee, overload = find_knee(points)
+    assert (knee["rate"], overload["rate"]) == (200, 400)
+
+
+def test_knee_not_reached_or_below_lowest_rate():
+    knee, overload = find_knee([_point(100, 100, 5), _point(200, 200, 6)])
+    assert knee["rate"] == 200 and overload is None
+    knee, overload = find_knee([_point(100, 50, 5)])
+    assert knee is None and overload["rate"] == 100
+    assert find_knee([]) == (None, None)
@@ -0,0 +1,117 @@
+import time
+import pytest
+from be.model.buyer import Buyer
+from be.model.ledger import SellerLedger
+from be.model import store as model_store
+
+
+@pytest.fixture(autouse=True)
+def _store(seed):
+    seed.user("ps_buyer", 100).user("ps_seller").store("ps_store", "ps_seller")
+    seed.book("ps_store", "ps_book", 10, 30)
+
+
+def _balance(user_id):
+    return SellerLedger().balance(user_id)
+
+
+def _status(order_id):
+    conn = model_store.get_db_conn()
+    cursor = conn.execute("SELECT status FROM new_order WHERE order_id = %s", (order_id,))
+    return cursor.fetchone()[0]
+
+
+class TestPaymentStatement:
+    def test_payment_transfers_order_total(self):
+        buyer = Buyer()
+        code, _, order_id = buyer.new_order("ps_buyer", "ps_store", [("ps_book", 3)])
+        assert code == 200
+        assert buyer.payment("ps_buyer", "p", order_id) == (200, "ok")
+        assert _balance("ps_buyer") == 10
+        assert _balance("ps_seller") == 90
+        assert _status(order_id) == "paid"
+
+    def test_second_payment_rejected_without_debit(self):
+        buyer = Buyer()
+        code, _, order_id = buyer.new_order("ps_buyer", "ps_store", [("ps_book", 1)])
+        assert buyer.payment("ps_buyer", "p", order_id)[0] == 200
+        code, _ = buyer.payment("ps_buyer", "p", order_id)
+        assert code != 200
+        assert _balance("ps_buyer") == 70
+
+    def test_failed_checks_leave_balances_untouched(self):
+        buyer = Buyer()
+        code, _, order_id = buyer.new_order("ps_buyer", "ps_store", [("ps_book", 4)])
+        assert buyer.payment("ps_buyer", "p", order_id)[0] == 519
+        assert buyer.payment("ps_buyer", "wrong", order_id)[0] == 401
+        assert buyer.payment("ps_seller", "p", order_id)[0] == 401
+        assert buyer.payment("ps_buyer", "p", "no_such_order")[0] == 518
+        assert (_balance("ps_buyer"), _balance("ps_seller")) == (100, 0)
+        assert _status(order_id) == "created"
+
+    def test_legacy_order_without_total(self):
+        conn = model_store.get_db_conn()
+        conn.execute(
+            "INSERT INTO new_order(order_id, store_id, user_id, status, create_time) VALUES (%s, %s, %s, %s, %s)",
+            ("ps_legacy", "ps_store", "ps_buyer", "created", int(time.time())),
+        )
+        conn.execute(
+            "INSERT INTO new_order_detail(order_id, book_id, count, price) VALUES (%s, %s, %s, %s)",
+            ("ps_legacy", "ps_book", 2, 30),
+        )
+        conn.commit()
+        assert Buyer().payment("ps_buyer", "p", "ps_legacy") == (200, "ok")
+        assert (_balance("ps_buyer"), _balance("ps_seller")) == (40, 60)
+
+
+class TestSellerLedger:
+    def test_payment_appends_ledger_entry_and_fold_moves_it(self):
+        buyer = Buyer()
+        ledger = SellerLedger()
+        code, _, order_id = buyer.new_order("ps_buyer", "ps_store", [("ps_book", 2)])
+        assert buyer.payment("ps_buyer", "p", order_id)[0] == 200
+        conn = model_store.get_db_conn()
+        cursor = conn.execute("SELECT user_id, amount FROM seller_ledger WHERE order_id = %s", (order_id,))
+        assert [tuple(r) for r in cursor.fetchall()] == [("ps_seller", 60)]
+
+        ledger.fold()
+        cursor = conn.execute('SELECT balance, ledger_folded FROM "user" WHERE user_id = %s', ("ps_seller",))
+        assert tuple(cursor.fetchone()) == (60, 60)
+        assert ledger.balance("ps_seller") == 60
+        ok, problems = ledger.check_consistency()
+        assert ok, problems
+
+    def test_concurrent_payments_to_one_seller(self, seed):
+        import threading
+        for i in range(10):
+            seed.user(f"ps_b{i}", 1000)
+        buyer = Buyer()
+        orders = []
+        for i in range(10):
+            code, _, order_id = buyer.new_order(f"ps_b{i}", "ps_store", [("ps_book", 1)])
+            orders.append((f"ps_b{i}", order_id))
+        codes = []
+
+        def pay(user_id, order_id):
+            codes.append(Buyer().payment(user_id, "p", order_id)[0])
+
+        threads = [threading.Thread(target=pay, args=o) for o in orders]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert codes == [200] * 10
+        assert SellerLedger().balance("ps_seller") == 300
+        ok, problems = SellerLedger().check_consistency()
+        assert ok, problems
+
+    def test_consistency_check_reports_tampering(self):
+        conn = model_store.get_db_conn()
+        conn.execute(
+            "INSERT INTO seller_ledger(user_id, order_id, amount, folded) VALUES (%s, %s, %s, %s)",
+            ("ps_seller", "ps_no_such_order", 5, True),
+        )
+        conn.commit()
+        ok, problems = SellerLedger().check_consistency()
+        assert not ok
+        assert {p["type"] for p in problems} == {"folded_total_mismatch", "entry_order_mismatch"}
@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import uuid
+import pytest
+import requests
+from urllib.parse import urljoin
+
+from fe import conf
+from fe.access.new_seller import register_new_seller
+from fe.access import book
+
+PICTURE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+class TestPicture:
+    @pytest.fixture(autouse=True)
+    def pre_run_initialization(self):
+        self.seller_id = "test_picture_seller_id_{}".format(str(uuid.uuid1()))
+        self.store_id = "test_picture_store_id_{}".format(str(uuid.uuid1()))
+        self.seller = register_new_seller(self.seller_id, self.seller_id)
+        assert self.seller.create_store(self.store_id) == 200
+
+        b = book.Book()
+        b.id = "test_picture_book_{}".format(str(uuid.uuid1()))
+        b.title = "Picture Book"
+        b.price = 100
+        encoded = base64.b64encode(PICTURE).decode("utf-8")
+        b.pictures = [encoded, encoded, encoded]
+        assert self.seller.add_book(self.store_id, 1, b) == 200
+        self.picture_id = hashlib.sha256(PICTURE).hexdigest()
+        self.url = urljoin(conf.URL, "picture/{}".format(self.picture_id))
+        yield
+
+    def test_book_record_references_picture_id(self):
+        r = requests.get(urljoin(conf.URL, "search/"), params={"store_id": self.store_id})
+        assert r.status_code == 200
+        assert r.json()["results"][0]["pictures"] == [self.picture_id] * 3
+
+    def test_get_picture(self):
+        r = requests.get(self.url)
+        assert r.status_code == 200
+        assert r.content == PICTURE
+        assert r.headers["Content-Type"] == "image/png"
+        assert r.headers["ETag"].strip('"') == self.picture_id
+
+    def test_conditional_get(self):
+        r = requests.get(self.url, headers={"If-None-Match": '"{}"'.format(self.picture_id)})
+        assert r.status_code == 304
+        assert r.content == b""
+
+    def test_range(self):
+        r = requests.get(self.url, headers={"Range": "bytes=8-15"})
+        assert r.status_code == 206
+        assert r.content == PICTURE[8:16]
+        assert r.headers["Content-Range"] == "bytes 8-15/{}".format(len(PICTURE))
+
+    def test_unknown_picture(self):
+        r = requests.get(urljoin(conf.URL, "picture/{}".format("0" * 64)))
+        assert r.status_code == 404
+        r = requests.get(urljoin(conf.URL, "picture/not-an-id"))
+        assert r.status_code == 404
+
+    def test_invalid_base64_rejected(self):
+        b = book.Book()
+        b.id = "test_picture_bad_{}".format(str(uuid.uuid1()))
+        b.price = 1
+        b.pictures = ["not base64!"]
+        assert self.seller.add_book(self.store_id, 1, b) == 521
+
+    def test_unknown_picture_id_rejected(self):
+        b = book.Book()
+        b.id = "test_picture_unknown_{}".format(str(uuid.uuid1()))
+        b.price = 1
+        b.pictures = ["ab" * 32]
+        assert self.seller.add_book(self.store_id, 1, b) == 521
+
+
+def test_range_response_found_for_sendfile(tmp_path):
+    # be/prefork.py 依赖 werkzeug 的私有 _RangeWrapper 找到 Range 响应对应的文件区间；升级 Werkzeug 后这里会失败
+    from flask import Flask, send_file
+    from werkzeug.test import EnvironBuilder
+    from be import prefork
+
+    path = tmp_path / "picture"
+    path.write_bytes(PICTURE)
+    app = Flask(__name__)
+
+    @app.route("/picture")
+    def get():
+        return send_file(str(path), conditional=True)
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = status, headers
+
+    environ = EnvironBuilder(path="/picture", headers={"Range": "bytes=8-15"}).get_environ()
+    app_iter = app.wsgi_app(environ, start_response)
+    try:
+        assert started["status"].startswith("206")
+        found = prefork._file_range(app_iter, started["headers"])
+        assert found is not None
+        assert found[1:] == (8, 8)
+    finally:
+        app_iter.close()
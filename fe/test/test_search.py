@@ -5,6 +5,7 @@ import uuid
 from urllib.parse import urljoin
 from fe import conf
 from fe.access import auth, seller, book
+from be.model.pagination import encode_cursor
 
 
 class TestSearchModel:
@@ -162,3 +163,138 @@ class TestSearchModel:
         assert data["message"] == "ok"
         # Total should be greater than or equal to returned results
         assert data["total"] >= len(data["results"])
+
+    def test_search_fields_restrict_match(self):
+        url = urljoin(conf.URL, "search/")
+
+        # "Doe" only appears in the author field
+        r = requests.get(url, params={"q": "Doe", "fields": "title", "store_id": self.store_id})
+        assert r.status_code == 200
+        assert len(r.json()["results"]) == 0
+
+        r = requests.get(url, params={"q": "Doe", "fields": "author,title", "store_id": self.store_id})
+        assert r.status_code == 200
+        titles = [b.get("title") for b in r.json()["results"]]
+        assert titles == ["Python Programming"]
+
+    def test_search_ranks_title_matches_first(self):
+        url = urljoin(conf.URL, "search/")
+        seller_obj = seller.Seller(conf.URL, self.seller_id, self.seller_password)
+        b = book.Book()
+        b.id = f"book_about_java_{uuid.uuid4()}"
+        b.title = "Coffee Brewing"
+        b.author = "Java Lover"
+        b.price = 100
+        assert seller_obj.add_book(self.store_id, 10, b) == 200
+
+        r = requests.get(url, params={"q": "java", "store_id": self.store_id})
+        assert r.status_code == 200
+        titles = [b.get("title") for b in r.json()["results"]]
+        assert titles == ["Java Advanced", "Coffee Brewing"]
+
+    def test_search_chinese_substring(self):
+        url = urljoin(conf.URL, "search/")
+        seller_obj = seller.Seller(conf.URL, self.seller_id, self.seller_password)
+        b = book.Book()
+        b.id = f"book_cn_{uuid.uuid4()}"
+        b.title = "美丽心灵"
+        b.author = "西尔维娅·娜萨"
+        b.tags = ["传记", "数学"]
+        b.price = 100
+        assert seller_obj.add_book(self.store_id, 10, b) == 200
+
+        for q in ["心灵", "美丽心", "灵", "娜萨", "数学"]:
+            r = requests.get(url, params={"q": q, "store_id": self.store_id})
+            assert r.status_code == 200
+            titles = [x.get("title") for x in r.json()["results"]]
+            assert titles == ["美丽心灵"], q
+
+        r = requests.get(url, params={"q": "心灵", "fields": "author", "store_id": self.store_id})
+        assert r.status_code == 200
+        assert r.json()["results"] == []
+
+    def test_search_cursor_walks_all_results(self):
+        url = urljoin(conf.URL, "search/")
+        seen = []
+        params = {"q": "", "store_id": self.store_id, "page_size": 1}
+        while True:
+            r = requests.get(url, params=params)
+            assert r.status_code == 200
+            data = r.json()
+            seen.extend(b["id"] for b in data["results"])
+            if not data["has_more"]:
+                assert data["next_cursor"] is None
+                break
+            params["cursor"] = data["next_cursor"]
+        assert sorted(seen) == sorted(b["id"] for b in self.books)
+
+    def test_search_cursor_keeps_rank_order(self):
+        url = urljoin(conf.URL, "search/")
+        seller_obj = seller.Seller(conf.URL, self.seller_id, self.seller_password)
+        b = book.Book()
+        b.id = f"book_about_java_{uuid.uuid4()}"
+        b.title = "Coffee Brewing"
+        b.author = "Java Lover"
+        b.price = 100
+        assert seller_obj.add_book(self.store_id, 10, b) == 200
+
+        r = requests.get(url, params={"q": "java", "store_id": self.store_id, "page_size": 1})
+        first = r.json()
+        assert [x["title"] for x in first["results"]] == ["Java Advanced"]
+        assert first["has_more"] is True
+        r = requests.get(url, params={"q": "java", "store_id": self.store_id, "page_size": 1,
+                                      "cursor": first["next_cursor"]})
+        second = r.json()
+        assert [x["title"] for x in second["results"]] == ["Coffee Brewing"]
+        assert second["has_more"] is False
+        assert second["total"] == 2
+        assert second["total_is_estimate"] is False
+
+    def test_search_estimated_total(self):
+        url = urljoin(conf.URL, "search/")
+        r = requests.get(url, params={"q": "", "store_id": self.store_id, "total": "estimate"})
+        assert r.status_code == 200
+        data = r.json()
+        assert data["total"] == len(self.books)
+        assert data["total_is_estimate"] is False
+
+        r = requests.get(url, params={"q": "", "total": "none"})
+        assert r.status_code == 200
+        assert r.json()["total"] is None
+
+    def test_search_invalid_cursor(self):
+        url = urljoin(conf.URL, "search/")
+        r = requests.get(url, params={"q": "", "cursor": "not-a-cursor"})
+        assert r.status_code == 520
+
+    @pytest.mark.parametrize("key", [[1, {}, "b"], ["x", "s", "b"], [None, 5, "b"], [0.5, "s"], [1e300, "s", "b"]])
+    def test_search_forged_cursor(self, key):
+        url = urljoin(conf.URL, "search/")
+        r = requests.get(url, params={"q": "Python", "cursor": encode_cursor(key)})
+        assert r.status_code == 520
+
+    def test_search_price_range_filter(self):
+        url = urljoin(conf.URL, "search/")
+        r = requests.get(url, params={"store_id": self.store_id, "min_price": 2500, "max_price": 3999})
+        assert r.status_code == 200
+        titles = sorted(b.get("title") for b in r.json()["results"])
+        assert titles == ["Java Advanced", "Python Programming"]
+
+    def test_search_tag_and_isbn_filters(self):
+        url = urljoin(conf.URL, "search/")
+        seller_obj = seller.Seller(conf.URL, self.seller_id, self.seller_password)
+        for title, tags in (("Tagged One", ["编程", "入门"]), ("Tagged Two", ["编程"])):
+            b = book.Book()
+            b.id = f"book_tagged_{uuid.uuid4()}"
+            b.title = title
+            b.tags = tags
+            b.price = 100
+            assert seller_obj.add_book(self.store_id, 10, b) == 200
+
+        r = requests.get(url, params={"store_id": self.store_id, "tags": "编程,入门"})
+        assert [b.get("title") for b in r.json()["results"]] == ["Tagged One"]
+        r = requests.get(url, params={"store_id": self.store_id, "tags": "编程"})
+        assert r.json()["total"] == 2
+
+        r = requests.get(url, params={"store_id": self.store_id, "isbn": "978-0-98-765432-1"})
+        assert [b.get("title") for b in r.json()["results"]] == ["Java Advanced"]
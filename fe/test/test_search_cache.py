@@ -0,0 +1,110 @@
+import threading
+import time
+from be.model.search_cache import SearchCache, make_key
+
+
+def _key(q, store_id=None, page=1):
+    return make_key(q, None, store_id, page, 10)
+
+
+def test_key_is_normalized():
+    assert make_key("  Python  Book", ["title", "author"], "s", 1, 10) == \
+        make_key("python book", ["author", "title"], "s", 1, 10)
+    assert make_key("python", None, "s", 1, 10, cursor="abc") != make_key("python", None, "s", 1, 10)
+
+
+def test_hit_miss_and_lru_eviction():
+    cache = SearchCache(max_entries=2, ttl=60)
+    calls = []
+
+    def compute(v):
+        return lambda: calls.append(v) or v
+
+    assert cache.get_or_compute(_key("a"), compute("A")) == "A"
+    assert cache.get_or_compute(_key("a"), compute("X")) == "A"
+    cache.get_or_compute(_key("b"), compute("B"))
+    cache.get_or_compute(_key("a"), compute("X"))
+    cache.get_or_compute(_key("c"), compute("C"))  # evicts b, the least recently used
+    assert cache.get_or_compute(_key("b"), compute("B2")) == "B2"
+    assert calls == ["A", "B", "C", "B2"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 4, 2)
+
+
+def test_byte_bound_and_ttl():
+    cache = SearchCache(max_entries=100, max_bytes=30, ttl=0.05)
+    cache.get_or_compute(_key("a"), lambda: "x" * 20)
+    cache.get_or_compute(_key("b"), lambda: "y" * 20)
+    assert cache.stats()["entries"] == 1
+    time.sleep(0.06)
+    assert cache.get_or_compute(_key("b"), lambda: "fresh") == "fresh"
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_store_and_global_entries():
+    cache = SearchCache(ttl=60)
+    cache.get_or_compute(_key("a", "s1"), lambda: 1)
+    cache.get_or_compute(_key("a", "s2"), lambda: 2)
+    cache.get_or_compute(_key("a"), lambda: 3)
+    cache.invalidate("s1")
+    assert cache.get_or_compute(_key("a", "s1"), lambda: 10) == 10
+    assert cache.get_or_compute(_key("a", "s2"), lambda: 20) == 2
+    assert cache.get_or_compute(_key("a"), lambda: 30) == 30
+
+
+def test_write_during_query_is_not_cached():
+    cache = SearchCache(ttl=60)
+
+    def compute():
+        cache.invalidate("s1")
+        return "stale"
+
+    assert cache.get_or_compute(_key("a", "s1"), compute) == "stale"
+    assert cache.get_or_compute(_key("a", "s1"), lambda: "fresh") == "fresh"
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = SearchCache(ttl=60)
+    calls = []
+    release = threading.Event()
+    results = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "v"
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(_key("a"), compute)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == ["v"] * 8
+
+
+def test_errors_are_not_cached():
+    cache = SearchCache(ttl=60)
+    assert cache.get_or_compute(_key("a"), lambda: (528, "boom"), cacheable=lambda r: r[0] == 200) == (528, "boom")
+    assert cache.get_or_compute(_key("a"), lambda: (200, "ok"), cacheable=lambda r: r[0] == 200) == (200, "ok")
+
+
+def test_coalescing_can_be_disabled():
+    cache = SearchCache(ttl=60, coalesce=False)
+    calls = []
+
+    def compute():
+        # 关闭合并后，计算期间的同 key 请求各自计算，不会等待
+        if not calls:
+            calls.append("inner")
+            assert cache.get_or_compute(_key("a"), lambda: "inner") == "inner"
+        calls.append("outer")
+        return "outer"
+
+    assert cache.get_or_compute(_key("a"), compute) == "outer"
+    assert calls == ["inner", "outer"]
+    assert cache.stats()["coalesced"] == 0
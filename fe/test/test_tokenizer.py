@@ -0,0 +1,38 @@
+import pytest
+from be.model.tokenizer import BigramTokenizer, Tokenizer
+from be.model.search import build_search_vector, build_tsquery
+
+
+def test_bigram_index_tokens():
+    t = BigramTokenizer()
+    assert t.index_tokens("美丽心灵") == ["美丽", "丽心", "心灵", "灵"]
+    assert t.index_tokens("Python编程 入门") == ["python", "编程", "程", "入门", "门"]
+    assert t.index_tokens("书") == ["书"]
+    assert t.index_tokens("") == []
+
+
+def test_bigram_query_terms():
+    t = BigramTokenizer()
+    assert t.query_terms("心灵") == [("心灵", False)]
+    assert t.query_terms("美丽心") == [("美丽", False), ("丽心", False)]
+    assert t.query_terms("灵 Java") == [("灵", True), ("java", True)]
+
+
+def test_tokenizer_requires_both_methods():
+    class IndexOnly(Tokenizer):
+        def index_tokens(self, text):
+            return text.split()
+
+    with pytest.raises(TypeError):
+        IndexOnly()
+
+
+def test_search_vector_weights_fields():
+    vector = build_search_vector({"title": "心灵", "author": "Doe", "tags": ["数学"]})
+    assert vector == "'心灵':1A '灵':2A 'doe':3B '数学':4C '学':5C"
+
+
+def test_tsquery_restricted_to_fields():
+    assert build_tsquery("美丽心 doe", ["title", "author"]) == "'美丽':AB & '丽心':AB & 'doe':*AB"
+    assert build_tsquery("灵") == "'灵':*"
+    assert build_tsquery("  ") == ""